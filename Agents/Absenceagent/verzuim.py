@@ -1,7 +1,7 @@
 """Functies voor het behandelen van verzuimcasuïstiek en vragen."""
 from typing import Optional
 
-from utils import text_matches, format_payload
+from utils import TRIGGER_INDEX, format_payload
 
 # Kernwoorden die semantisch gerelateerd zijn aan verzuim. Worden gebruikt om
 # te bepalen of deze module relevant is voor een binnengekomen vraag.
@@ -16,10 +16,12 @@ TRIGGERS = {
     "arbeidsongeschiktheid",
 }
 
+TRIGGER_INDEX.register("absence", TRIGGERS)
+
 
 def match_terms(text: str) -> bool:
     """Return ``True`` if the text is gerelateerd aan verzuim."""
-    return text_matches(text, TRIGGERS)
+    return TRIGGER_INDEX.match(text, "absence")
 
 
 def beantwoord_vraag(vraag: str, dossier: Optional[str] = None) -> str:
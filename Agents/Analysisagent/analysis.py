@@ -1,11 +1,19 @@
 from fastapi import UploadFile
 from typing import Iterable, List, Tuple, Optional, Dict
-from utils import text_matches, format_payload
-import pandas as pd
-from io import BytesIO, StringIO
+from utils import TRIGGER_INDEX, format_payload
+from utils.lazy import lazy_import
+from utils.formats import read_table
+from utils.extraction import read_upload
+from utils.metrics import stage
+from io import BytesIO
 from datetime import datetime
 import random
-from utils.file_utils import append_row, LOG_FILE
+from utils.file_utils import log_row, LOG_FILE
+from utils.rendering import PDF_RENDERER
+from utils.charts import CHART_RENDERER, bar_figure
+from . import spp
+
+pd = lazy_import("pandas")
 
 # Disclaimer voor gebruikers van analysetools
 ANALYSE_DISCLAIMER = (
@@ -27,24 +35,17 @@ TRIGGERS = {
     "risicoanalyse",
 }
 
+TRIGGER_INDEX.register("analysis", TRIGGERS)
+
 
 def match_terms(text: str) -> bool:
     """Return ``True`` if the text lijkt te gaan over data- of dossieranalyse."""
-    return text_matches(text, TRIGGERS)
+    return TRIGGER_INDEX.match(text, "analysis")
 
 
 def _safe_read(file: UploadFile) -> bytes:
     """Return the contents of an ``UploadFile`` and reset the pointer."""
-    try:
-        data = file.file.read()
-    except Exception:
-        data = b""
-    finally:
-        try:
-            file.file.seek(0)
-        except Exception:
-            pass
-    return data or b""
+    return read_upload(file)
 
 
 RISK_LEVELS = ["laag", "matig", "verhoogd", "hoog"]
@@ -82,7 +83,7 @@ def genereer_rapport(data: dict, formaat: str = "json") -> Tuple[str, bytes]:
 
 
 def log_gebruik(user: str, actie: str):
-    append_row(LOG_FILE, [user, actie])
+    log_row(LOG_FILE, [user, actie])
 
 
 def get_latest_cbs_quarter() -> str:
@@ -127,9 +128,10 @@ def genereer_aanbevelingen(risico: str) -> str:
         "Onderzoek aanvullende ondersteuning zoals arbeidsdeskundig advies",
     ]
 
-    random.seed(risico)
+    # Eigen generator per aanroep: de globale ``random`` wordt gedeeld door
+    # alle workerthreads, en ``seed`` + ``sample`` zijn samen niet atomair.
     keuzes = opties_matig if risico == "matig" else opties_hoog
-    adviezen = "; ".join(random.sample(keuzes, k=2))
+    adviezen = "; ".join(random.Random(risico).sample(keuzes, k=2))
     return f"Mogelijke vervolgstappen: {adviezen}"
 
 
@@ -214,29 +216,37 @@ def patroon_analyse(files: Iterable[Tuple[str, bytes]]) -> dict:
 
 
 def genereer_pdf(markdown: str) -> bytes:
-    """Render markdown to PDF and return the binary data."""
+    """Render markdown to PDF and return the binary data.
+
+    Het renderen gebeurt in de voorverwarmde renderpool; identieke rapporten
+    komen uit de cache.
+    """
+
+    with stage("genereer_pdf", "render"):
+        return PDF_RENDERER.render(markdown)
 
-    from weasyprint import HTML
 
-    html = HTML(string=markdown.replace("\n", "<br>"))
-    return html.write_pdf()
+def _grafiek_waarden(data: dict) -> List[float]:
+    return [
+        data.get("verzuimpercentage", 0),
+        data.get("branche_benchmark", {}).get("waarde", 0),
+    ]
 
 
 def genereer_grafiek(data: dict):
-    """Create a simple bar chart comparing internal data with a benchmark."""
+    """Create a simple bar chart comparing internal data with a benchmark.
 
-    import matplotlib.pyplot as plt
+    De ``Figure`` wordt zonder pyplot aangemaakt en blijft dus niet in een
+    globaal register hangen.
+    """
 
-    fig, ax = plt.subplots()
-    ax.bar(
-        ["Intern", "Benchmark"],
-        [
-            data.get("verzuimpercentage", 0),
-            data.get("branche_benchmark", {}).get("waarde", 0),
-        ],
-    )
-    ax.set_title("Verzuim vs Benchmark")
-    return fig
+    return bar_figure(_grafiek_waarden(data))
+
+
+def genereer_grafiek_png(data: dict) -> bytes:
+    """Render the benchmark chart as PNG via the shared, cached renderer."""
+
+    return CHART_RENDERER.render(_grafiek_waarden(data))
 
 
 CATEGORY_LABELS = {
@@ -253,18 +263,19 @@ CATEGORY_LABELS = {
 
 
 def analyse_spp(file: Optional[UploadFile] = None, text: Optional[str] = None) -> Dict:
-    """Analyseer SPP-data uit een bestand of tekst en geef een 9-box grid terug."""
+    """Analyseer SPP-data uit een bestand of tekst en geef een 9-box grid terug.
+
+    Bevat de data per medewerker een prestatie- en potentieelkolom, dan wordt
+    iedere rij geplaatst en bevat het resultaat ook ``leden`` per cel; anders
+    worden vooraf getelde 9-box kolommen opgeteld.
+    """
 
     if file is not None:
-        contents = _safe_read(file)
-        buf = BytesIO(contents)
-        try:
-            df = pd.read_excel(buf)
-        except Exception:
-            buf.seek(0)
-            df = pd.read_csv(buf)
+        with stage("analyse_spp", "inlezen"):
+            df = read_table(_safe_read(file), file.filename or "")
     elif text is not None:
-        df = pd.read_csv(StringIO(text))
+        with stage("analyse_spp", "inlezen"):
+            df = read_table(text.encode(), fmt="csv")
     else:
         return {
             "status": "geen input",
@@ -275,40 +286,17 @@ def analyse_spp(file: Optional[UploadFile] = None, text: Optional[str] = None) -
             "disclaimer": ANALYSE_DISCLAIMER,
         }
 
-    grid_keys = [
-        "laag_potentieel_lage_prestatie",
-        "laag_potentieel_midden_prestatie",
-        "laag_potentieel_hoge_prestatie",
-        "midden_potentieel_lage_prestatie",
-        "midden_potentieel_midden_prestatie",
-        "midden_potentieel_hoge_prestatie",
-        "hoog_potentieel_lage_prestatie",
-        "hoog_potentieel_midden_prestatie",
-        "hoog_potentieel_hoge_prestatie",
-    ]
-
-    grid = {k: 0 for k in grid_keys}
-
-    def _norm(col: str) -> str:
-        col = col.strip().lower()
-        col = col.replace(",", "").replace("-", " ")
-        col = col.replace("normaal", "midden")
-        col = col.replace("normale", "midden")
-        col = col.replace("hoger", "hoog")
-        col = "_".join(col.split())
-        return col
-
+    grid = {k: 0 for k in spp.GRID_KEYS}
+    leden = None
+    ongeclassificeerd = 0
     if not df.empty:
-        norm_cols = {_norm(c): c for c in df.columns}
-        for key in grid_keys:
-            if key in norm_cols:
-                grid[key] = int(df[norm_cols[key]].sum())
-
-        if all(v == 0 for v in grid.values()):
-            numeric = df.select_dtypes(include="number").values.flatten()
-            for i, key in enumerate(grid_keys):
-                if i < len(numeric):
-                    grid[key] = int(numeric[i])
+        with stage("analyse_spp", "classificatie"):
+            mapping = spp.kolom_mapping(tuple(str(c) for c in df.columns))
+            df.columns = [str(c) for c in df.columns]
+            if mapping["modus"] == "rij":
+                grid, leden, ongeclassificeerd = spp.classificeer_rijen(df, mapping)
+            else:
+                grid = spp.tel_grid(df, mapping)
 
     named_grid = {CATEGORY_LABELS[k]: v for k, v in grid.items()}
 
@@ -321,7 +309,7 @@ def analyse_spp(file: Optional[UploadFile] = None, text: Optional[str] = None) -
 
     acties = ["Voer ontwikkelgesprekken", "Bekijk herplaatsingsmogelijkheden"]
     adviezen = ["Rapporteer periodiek aan management", "Stem af met HR over opvolging"]
-    return {
+    resultaat = {
         "grid": named_grid,
         "risico": risico,
         "acties": acties,
@@ -329,6 +317,10 @@ def analyse_spp(file: Optional[UploadFile] = None, text: Optional[str] = None) -
         "niveaus": advies_niveaus(risico),
         "disclaimer": ANALYSE_DISCLAIMER,
     }
+    if leden is not None:
+        resultaat["leden"] = {CATEGORY_LABELS[k]: v for k, v in leden.items()}
+        resultaat["ongeclassificeerd"] = ongeclassificeerd
+    return resultaat
 
 
 def genereer_spp_rapport(data: Dict, formaat: str = "excel") -> BytesIO:
@@ -343,7 +335,7 @@ def genereer_spp_rapport(data: Dict, formaat: str = "excel") -> BytesIO:
 
 
 def log_spp(user: str, actie: str):
-    append_row(LOG_FILE, [user, actie])
+    log_row(LOG_FILE, [user, actie])
 
 
 def n8n_payload(data: Dict) -> Dict:
@@ -0,0 +1,155 @@
+"""Gevectoriseerde 9-box (SPP) classificatie op rij- of gridniveau."""
+from __future__ import annotations
+
+import os
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from utils.lazy import lazy_import
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+POTENTIEEL_NIVEAUS = ["laag", "midden", "hoog"]
+PRESTATIE_NIVEAUS = ["lage", "midden", "hoge"]
+
+# Volgorde: potentieel (laag -> hoog) x prestatie (laag -> hoog), zodat cel
+# ``potentieel * 3 + prestatie`` direct de index in deze lijst is.
+GRID_KEYS = [
+    f"{pot}_potentieel_{perf}_prestatie"
+    for pot in POTENTIEEL_NIVEAUS
+    for perf in PRESTATIE_NIVEAUS
+]
+
+LABEL_NIVEAUS = {
+    **dict.fromkeys(["laag", "lage", "low", "l", "onder"], 0),
+    **dict.fromkeys(
+        ["midden", "middel", "normaal", "normale", "gemiddeld", "medium", "mid", "m"], 1
+    ),
+    **dict.fromkeys(["hoog", "hoge", "hoger", "high", "h", "boven"], 2),
+}
+
+MEDEWERKER_KOLOMMEN = ("medewerker", "werknemer", "naam", "employee", "name", "personeelsnummer")
+PRESTATIE_KOLOMMEN = ("prestatie", "performance", "presteren")
+POTENTIEEL_KOLOMMEN = ("potentieel", "potential")
+
+_NORM_VERVANGINGEN = (
+    (",", ""),
+    ("-", " "),
+    ("normale", "midden"),
+    ("normaal", "midden"),
+    ("hoger", "hoog"),
+)
+
+
+def normaliseer_kolom(col: str) -> str:
+    col = str(col).strip().lower()
+    for oud, nieuw in _NORM_VERVANGINGEN:
+        col = col.replace(oud, nieuw)
+    return "_".join(col.split())
+
+
+def _zoek_kolom(norm_cols: Dict[str, str], namen: Tuple[str, ...]) -> Optional[str]:
+    for norm, original in norm_cols.items():
+        if norm in GRID_KEYS:
+            continue
+        if any(naam in norm for naam in namen):
+            return original
+    return None
+
+
+@lru_cache(maxsize=256)
+def kolom_mapping(columns: Tuple[str, ...]) -> Dict[str, object]:
+    """Return the column mapping for a header, cached per header signature.
+
+    ``modus`` is ``"rij"`` wanneer er per medewerker een prestatie- en
+    potentieelkolom is, anders ``"grid"`` met per 9-box cel de kolom die de
+    (vooraf getelde) aantallen bevat.
+    """
+    norm_cols: Dict[str, str] = {}
+    for col in columns:
+        norm_cols.setdefault(normaliseer_kolom(col), col)
+    prestatie = _zoek_kolom(norm_cols, PRESTATIE_KOLOMMEN)
+    potentieel = _zoek_kolom(norm_cols, POTENTIEEL_KOLOMMEN)
+    if prestatie is not None and potentieel is not None and prestatie != potentieel:
+        return {
+            "modus": "rij",
+            "medewerker": _zoek_kolom(norm_cols, MEDEWERKER_KOLOMMEN),
+            "prestatie": prestatie,
+            "potentieel": potentieel,
+        }
+    return {
+        "modus": "grid",
+        "grid": {key: norm_cols[key] for key in GRID_KEYS if key in norm_cols},
+    }
+
+
+def _parse_grenzen(spec: str) -> Tuple[float, float]:
+    """Parse ``"2.5,3.5"`` into the two boundaries laag|midden and midden|hoog."""
+    try:
+        onder, boven = (float(part) for part in spec.split(","))
+    except ValueError:
+        return (2.5, 3.5)
+    return (onder, boven) if onder <= boven else (boven, onder)
+
+
+# Vaste grenzen voor numerieke scores, standaard voor een schaal van 1 t/m 5:
+# lager dan 2.5 is laag, vanaf 3.5 hoog. Zo hangt de cel van een medewerker
+# alleen af van de eigen score en niet van de andere rijen in het bestand.
+# Voor een andere schaal, bijv. 1-10: ``HRCOPILOT_SPP_GRENZEN=4.5,7.5``.
+SCORE_GRENZEN = _parse_grenzen(os.environ.get("HRCOPILOT_SPP_GRENZEN", "2.5,3.5"))
+
+
+def niveaus(series, grenzen: Optional[Tuple[float, float]] = None) -> "pd.Series":
+    """Map labels (laag/midden/hoog) or numeric scores to levels 0, 1, 2.
+
+    Scores worden ingedeeld met ``grenzen`` (standaard :data:`SCORE_GRENZEN`).
+    """
+    labels = series.astype(str).str.strip().str.lower().map(LABEL_NIVEAUS)
+    getallen = pd.to_numeric(series, errors="coerce")
+    if getallen.notna().any():
+        grenzen = list(grenzen or SCORE_GRENZEN)
+        numeriek = pd.Series(np.digitize(getallen.fillna(0), grenzen), index=series.index)
+        labels = labels.where(labels.notna(), numeriek.where(getallen.notna()))
+    return labels
+
+
+def classificeer_rijen(df, mapping: Dict[str, object]) -> Tuple[Dict[str, int], Dict[str, List[str]], int]:
+    """Place every employee in the 9-box in one vectorized pass.
+
+    Geeft de aantallen per cel, de medewerkers per cel en het aantal rijen
+    dat niet geclassificeerd kon worden.
+    """
+    prestatie = niveaus(df[mapping["prestatie"]])
+    potentieel = niveaus(df[mapping["potentieel"]])
+    geldig = prestatie.notna() & potentieel.notna()
+    cellen = (potentieel[geldig] * 3 + prestatie[geldig]).astype(int).to_numpy()
+
+    aantallen = np.bincount(cellen, minlength=9)
+    grid = {key: int(aantallen[i]) for i, key in enumerate(GRID_KEYS)}
+
+    if mapping.get("medewerker") is not None:
+        namen = df.loc[geldig, mapping["medewerker"]].astype(str)
+    else:
+        namen = pd.Series(df.index[geldig] + 1, index=df.index[geldig]).astype(str)
+    per_cel = pd.Series(namen.to_numpy()).groupby(cellen).agg(list)
+    leden = {key: per_cel.get(i, []) for i, key in enumerate(GRID_KEYS)}
+    return grid, leden, int((~geldig).sum())
+
+
+def tel_grid(df, mapping: Dict[str, object]) -> Dict[str, int]:
+    """Sum pre-aggregated 9-box columns (grid mode)."""
+    grid = {key: 0 for key in GRID_KEYS}
+    kolommen: Dict[str, str] = mapping["grid"]
+    if kolommen:
+        sommen = df[list(kolommen.values())].sum(numeric_only=True)
+        for key, col in kolommen.items():
+            if col in sommen:
+                grid[key] = int(sommen[col])
+
+    if all(v == 0 for v in grid.values()):
+        numeric = df.select_dtypes(include="number").values.flatten()
+        for i, key in enumerate(GRID_KEYS):
+            if i < len(numeric):
+                grid[key] = int(numeric[i])
+    return grid
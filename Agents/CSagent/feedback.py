@@ -1,5 +1,5 @@
-from utils.file_utils import append_row, FEEDBACK_FILE
-from utils import text_matches
+from utils.file_utils import log_row, FEEDBACK_FILE
+from utils import TRIGGER_INDEX
 
 # Termen die gebruikt kunnen worden om feedback- of logfunctionaliteit op te roepen.
 TRIGGERS = {
@@ -11,12 +11,14 @@ TRIGGERS = {
     "gebruik",
 }
 
+TRIGGER_INDEX.register("feedback", TRIGGERS)
+
 
 def match_terms(text: str) -> bool:
     """Return ``True`` if the text lijkt betrekking te hebben op feedback of logging."""
-    return text_matches(text, TRIGGERS)
+    return TRIGGER_INDEX.match(text, "feedback")
 
 
 def store_feedback(user: str, feedback: str):
-    append_row(FEEDBACK_FILE, [user, feedback])
+    log_row(FEEDBACK_FILE, [user, feedback])
     return {"status": "opgeslagen"}
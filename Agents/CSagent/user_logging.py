@@ -1,13 +1,15 @@
-from utils.file_utils import append_row, LOG_FILE
-from utils import text_matches
+from utils.file_utils import log_row, LOG_FILE
+from utils import TRIGGER_INDEX
 
 TRIGGERS = {"gebruik", "log", "logging", "audit"}
 
+TRIGGER_INDEX.register("logging", TRIGGERS)
+
 
 def match_terms(text: str) -> bool:
-    return text_matches(text, TRIGGERS)
+    return TRIGGER_INDEX.match(text, "logging")
 
 
 def registreer_gebruik(user: str, actie: str):
-    append_row(LOG_FILE, [user, actie])
+    log_row(LOG_FILE, [user, actie])
     return {"status": "gelogd"}
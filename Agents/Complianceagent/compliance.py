@@ -1,13 +1,14 @@
 from fastapi import UploadFile
-from typing import Optional
-from utils import text_matches, format_payload
-from io import BytesIO
-import pandas as pd
-import extract_msg
-from pptx import Presentation
-import re
-import tempfile
-import os
+from typing import Iterable, Iterator, Optional
+from utils import TRIGGER_INDEX, format_payload
+from utils.extraction import extract_upload, iter_upload
+from utils.metrics import stage, timed_blocks
+from utils.scanner import ScanSession, TermScanner
+from .pii import PIIDetector, detect_pii_details, chunks, CATEGORIES
+
+# Maximaal aantal unieke PII-bevindingen per document; daarna stopt de scan
+# (ook het parsen van de rest van het document).
+MAX_PII_FINDINGS = 500
 
 # Triggers that indicate compliance related questions
 TRIGGERS = {
@@ -24,56 +25,37 @@ TRIGGERS = {
     "data protection",
 }
 
+TRIGGER_INDEX.register("compliance", TRIGGERS)
+TERM_SCANNER = TermScanner(TRIGGERS, count_words=False)
+
 
 def match_terms(text: str) -> bool:
     """Return True if compliance gerelateerde termen voorkomen in ``text``."""
-    return text_matches(text, TRIGGERS)
+    return TRIGGER_INDEX.match(text, "compliance")
 
 
 def extract_text(file: Optional[UploadFile] = None, text: Optional[str] = None) -> str:
     if text:
         return text
-    if not file:
-        return ""
-    fname = file.filename.lower()
-    try:
-        if fname.endswith((".pdf", ".docx", ".doc", ".txt", ".eml")):
-            return file.file.read().decode("utf-8", errors="ignore")
-        if fname.endswith(".msg"):
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".msg") as tmp:
-                tmp.write(file.file.read())
-                tmp.flush()
-                msg = extract_msg.Message(tmp.name)
-                text = f"{msg.subject}\n{msg.body}" if msg.body else msg.subject
-            os.unlink(tmp.name)
-            return text or ""
-        if fname.endswith((".xlsx", ".xls", ".csv")):
-            buf = BytesIO(file.file.read())
-            buf.seek(0)
-            try:
-                df = pd.read_excel(buf)
-            except Exception:
-                buf.seek(0)
-                df = pd.read_csv(buf)
-            return " ".join(df.astype(str).stack().tolist())
-        if fname.endswith((".ppt", ".pptx")):
-            buf = BytesIO(file.file.read())
-            prs = Presentation(buf)
-            slides_text = []
-            for slide in prs.slides:
-                for shape in slide.shapes:
-                    if hasattr(shape, "text"):
-                        slides_text.append(shape.text)
-            return "\n".join(slides_text)
-        return file.file.read().decode("utf-8", errors="ignore")
-    except Exception:
-        return ""
-
-
-def detect_pii(text: str) -> list[str]:
-    emails = re.findall(r"[\w.-]+@[\w.-]+", text)
-    numbers = re.findall(r"\b\d{8,}\b", text)
-    return list(set(emails + numbers))
+    return extract_upload(file)
+
+
+def iter_content(file: Optional[UploadFile] = None, text: Optional[str] = None) -> Iterator[str]:
+    """Yield de te controleren tekst in blokken; uploads worden gestreamd."""
+    if text:
+        return chunks(text)
+    return iter_upload(file)
+
+
+def _feed(blocks: Iterable[str], session: ScanSession) -> Iterator[str]:
+    for block in blocks:
+        session.feed(block)
+        yield block
+
+
+def detect_pii(text: str, max_findings: Optional[int] = MAX_PII_FINDINGS) -> list[str]:
+    details = detect_pii_details(text, max_findings=max_findings)
+    return [value for kind in CATEGORIES for value in details[kind]]
 
 
 def advies_niveaus(status: str) -> dict:
@@ -87,18 +69,27 @@ def advies_niveaus(status: str) -> dict:
 
 
 def compliance_check(file: Optional[UploadFile] = None, text: Optional[str] = None) -> dict:
-    content = extract_text(file=file, text=text)
-    if not content:
+    # Eén doorloop over de blokken voedt zowel de termenscan als de
+    # PII-detectie; de volledige tekst wordt nooit opgebouwd.
+    scan = TERM_SCANNER.session()
+    blocks = timed_blocks(iter_content(file=file, text=text), "compliance", "extractie")
+    with stage("compliance", "scan", exclude=blocks):
+        details = PIIDetector(max_findings=MAX_PII_FINDINGS).scan(_feed(blocks, scan))
+        # Stopt de PII-scan vroeg, dan worden de resterende pagina's ook niet
+        # meer geparsed (en de termen daarin dus niet meer gezocht).
+        blocks.close()
+        scan.finish()
+    if not scan.length:
         return {"status": "geen input", "issues": []}
-    lc = content.lower()
-    hits = [kw for kw in TRIGGERS if kw in lc]
-    pii = detect_pii(content)
+    hits = [kw for kw in TRIGGERS if scan.found(kw)]
+    pii = [value for kind in CATEGORIES for value in details[kind]]
     advies = "Controleer document op naleving van privacy- en beveiligingsrichtlijnen."
     status = "ok" if hits or pii else "geen bijzonderheden"
     return {
         "status": status,
         "gevonden_termen": hits,
         "gevonden_pii": pii,
+        "pii_categorieen": {kind: values for kind, values in details.items() if values},
         "advies": advies,
         "niveaus": advies_niveaus(status),
     }
@@ -0,0 +1,115 @@
+"""Stroomsgewijze detectie van persoonsgegevens (PII) in grote teksten."""
+from __future__ import annotations
+
+import re
+from typing import Dict, Iterable, Iterator, List, Optional
+
+CHUNK_SIZE = 64 * 1024
+# Langste mogelijke match; zoveel tekst blijft tussen twee stukken bewaard.
+OVERLAP = 512
+MAX_UNIQUE = 10_000
+
+PII_PATTERN = re.compile(
+    r"(?P<email>[\w.-]{1,64}@[\w.-]{1,255})"
+    r"|(?P<iban>\b[A-Z]{2}\d{2}(?: ?[A-Z0-9]{4}){2,7}(?: ?[A-Z0-9]{1,3})?\b)"
+    r"|(?P<telefoon>(?<![\w+])(?:\+31|0031|0)[ -]?[1-9](?:[ -]?\d){8}(?!\d))"
+    r"|(?P<nummer>\b\d{8,32}\b)"
+)
+
+CATEGORIES = ("email", "iban", "bsn", "telefoon", "nummer")
+
+
+def elfproef(number: str) -> bool:
+    """Return ``True`` if a 9-digit number passes the BSN eleven test."""
+    if len(number) != 9 or not number.isdigit():
+        return False
+    total = sum(int(d) * w for d, w in zip(number[:8], range(9, 1, -1)))
+    total -= int(number[8])
+    return total % 11 == 0
+
+
+def iban_geldig(iban: str) -> bool:
+    """Validate an IBAN with the ISO 13616 mod-97 check."""
+    compact = iban.replace(" ", "")
+    if not 15 <= len(compact) <= 34:
+        return False
+    rearranged = compact[4:] + compact[:4]
+    try:
+        digits = "".join(str(int(c, 36)) for c in rearranged)
+    except ValueError:
+        return False
+    return int(digits) % 97 == 1
+
+
+def chunks(text: str, size: int = CHUNK_SIZE) -> Iterator[str]:
+    for start in range(0, len(text), size):
+        yield text[start:start + size]
+
+
+class PIIDetector:
+    """Scan text chunks for e-mail addresses, IBANs, BSNs, phone numbers and
+    long numbers with one precompiled pattern.
+
+    Tussen opeenvolgende stukken blijft een overlap bewaard zodat een match
+    op de grens niet verloren gaat of dubbel telt. Unieke waarden worden
+    bijgehouden in een begrensde set; met ``max_findings`` stopt de scan zodra
+    dat aantal unieke bevindingen bereikt is.
+    """
+
+    def __init__(self, max_findings: Optional[int] = None, max_unique: int = MAX_UNIQUE):
+        self.max_findings = max_findings
+        self.max_unique = max_unique
+
+    def _classify(self, match: re.Match) -> Optional[str]:
+        kind = match.lastgroup
+        value = match.group()
+        if kind == "iban":
+            return "iban" if iban_geldig(value) else None
+        if kind == "nummer" and elfproef(value):
+            return "bsn"
+        return kind
+
+    def scan(self, stream: Iterable[str]) -> Dict[str, List[str]]:
+        """Return unique findings per category for a stream of text chunks."""
+        found: Dict[str, List[str]] = {c: [] for c in CATEGORIES}
+        seen: set = set()
+        limit = min(self.max_findings or self.max_unique, self.max_unique)
+        carry = ""
+        carry_pos = 0
+        stream = iter(stream)
+        chunk = next(stream, None)
+        while chunk is not None:
+            following = next(stream, None)
+            final = following is None
+            buf = carry + chunk
+            pos = carry_pos
+            safe = len(buf) if final else len(buf) - OVERLAP
+            resume = None
+            for match in PII_PATTERN.finditer(buf, pos):
+                if match.end() > safe:
+                    resume = match.start()
+                    break
+                pos = match.end()
+                kind = self._classify(match)
+                value = match.group()
+                if kind is None or value in seen:
+                    continue
+                seen.add(value)
+                found[kind].append(value)
+                if len(seen) >= limit:
+                    return found
+            if final:
+                break
+            tail = len(buf) - OVERLAP
+            start = max(pos, tail if resume is None else min(resume, tail))
+            # Eén teken vóór ``start`` blijft bewaard als context voor \b en
+            # de lookbehind; het zoeken begint pas daarna.
+            carry = buf[max(start - 1, 0):]
+            carry_pos = 1 if start else 0
+            chunk = following
+        return found
+
+
+def detect_pii_details(text: str, max_findings: Optional[int] = None) -> Dict[str, List[str]]:
+    """Return unique PII values in ``text`` grouped per category."""
+    return PIIDetector(max_findings=max_findings).scan(chunks(text))
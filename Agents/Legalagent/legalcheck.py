@@ -1,13 +1,10 @@
 
 from fastapi import UploadFile
-from typing import List, Optional, Tuple
-from utils import text_matches, format_payload
-import tempfile
-import os
-import extract_msg
-from io import BytesIO
-import pandas as pd
-from pptx import Presentation
+from typing import Iterator, List, Optional, Tuple
+from utils import TRIGGER_INDEX, format_payload
+from utils.extraction import extract_upload, iter_upload
+from utils.metrics import stage, timed_blocks
+from utils.scanner import TermScanner, ScanSession
 
 # Disclaimer voor juridische adviezen
 LEGAL_DISCLAIMER = (
@@ -31,10 +28,12 @@ TRIGGERS = {
     "rechtsvraag",
 }
 
+TRIGGER_INDEX.register("legal", TRIGGERS)
+
 
 def match_terms(text: str) -> bool:
     """Return ``True`` if juridische thema's vermoed worden in ``text``."""
-    return text_matches(text, TRIGGERS)
+    return TRIGGER_INDEX.match(text, "legal")
 
 KEYWORDS = [
     "ontslag", "verzuim", "vso", "vaststellingsovereenkomst", "brief",
@@ -85,49 +84,44 @@ def extract_text_from_input(
 ) -> str:
     if input_text and len(input_text) > 20:
         return input_text
-    if file:
-        fname = file.filename.lower()
-        try:
-            if fname.endswith((".pdf", ".docx", ".doc", ".txt", ".eml")):
-                return file.file.read().decode("utf-8", errors="ignore")
-
-            if fname.endswith(".msg"):
-                with tempfile.NamedTemporaryFile(delete=False, suffix=".msg") as tmp:
-                    tmp.write(file.file.read())
-                    tmp.flush()
-                    msg = extract_msg.Message(tmp.name)
-                    text = f"{msg.subject}\n{msg.body}" if msg.body else msg.subject
-                os.unlink(tmp.name)
-                return text or ""
-
-            if fname.endswith((".xlsx", ".xls", ".csv")):
-                buf = BytesIO(file.file.read())
-                buf.seek(0)
-                try:
-                    df = pd.read_excel(buf)
-                except Exception:
-                    buf.seek(0)
-                    df = pd.read_csv(buf)
-                return " ".join(df.astype(str).stack().tolist())
-
-            if fname.endswith((".ppt", ".pptx")):
-                buf = BytesIO(file.file.read())
-                prs = Presentation(buf)
-                slides_text = []
-                for slide in prs.slides:
-                    for shape in slide.shapes:
-                        if hasattr(shape, "text"):
-                            slides_text.append(shape.text)
-                return "\n".join(slides_text)
-
-            return file.file.read().decode("utf-8", errors="ignore")
-        except Exception:
-            return ""
-    return ""
-
-def flexibele_begrippenherkenning(text: str) -> Tuple[list, list]:
-    gevonden_kernwoorden = [word for word in KEYWORDS if word.lower() in text.lower()]
-    gevonden_juridische = [begrip for begrip in ALGEMENE_JURIDISCHE_BEGRIPPEN if begrip.lower() in text.lower()]
+    return extract_upload(file)
+
+
+def iter_input(
+    file: Optional[UploadFile] = None,
+    input_text: Optional[str] = None
+) -> Iterator[str]:
+    """Yield de invoer in blokken; grote uploads worden gestreamd gelezen."""
+    if input_text and len(input_text) > 20:
+        yield input_text
+        return
+    yield from iter_upload(file)
+
+# Signaalwoorden die ``bronnen_check`` gebruikt om bronnen te selecteren.
+BRON_SIGNALEN = ["verzuim", "ziekte", "ontslag", "be\u00ebindiging"]
+
+SCANNER = TermScanner(KEYWORDS + ALGEMENE_JURIDISCHE_BEGRIPPEN + BRON_SIGNALEN)
+
+
+def scan_tekst(text: str) -> ScanSession:
+    """Scan ``text`` in één keer op kernwoorden, begrippen en woordfrequentie."""
+    return SCANNER.scan(text)
+
+
+def scan_blokken(blocks: Iterator[str]) -> ScanSession:
+    """Scan een stroom tekstblokken zonder de volledige tekst op te bouwen."""
+    session = SCANNER.session()
+    for block in blocks:
+        session.feed(block)
+    return session.finish()
+
+
+def flexibele_begrippenherkenning(
+    text: str, scan: Optional[ScanSession] = None
+) -> Tuple[list, list]:
+    scan = scan or scan_tekst(text)
+    gevonden_kernwoorden = [word for word in KEYWORDS if scan.found(word)]
+    gevonden_juridische = [begrip for begrip in ALGEMENE_JURIDISCHE_BEGRIPPEN if scan.found(begrip)]
     return gevonden_kernwoorden, gevonden_juridische
 
 def casus_complexiteit_score(keywords: list, juridische_begrippen: list) -> str:
@@ -140,11 +134,18 @@ def casus_complexiteit_score(keywords: list, juridische_begrippen: list) -> str:
         return "complex"
 
 def risico_inschatting(
-    text: str, complexiteit: str, keywords: list, juridische_begrippen: list
+    text: str,
+    complexiteit: str,
+    keywords: list,
+    juridische_begrippen: list,
+    lengte: Optional[int] = None,
 ) -> str:
-    """Bepaal het risiconiveau op een flexibele manier."""
+    """Bepaal het risiconiveau op een flexibele manier.
 
-    score = len(text) / 300
+    ``lengte`` vervangt ``len(text)`` wanneer de tekst gestreamd is gelezen.
+    """
+
+    score = (len(text) if lengte is None else lengte) / 300
     score += len(juridische_begrippen)
     # Weeg complexiteit zwaarder mee dan eventuele kernwoorden
     score += {"eenvoudig": 0, "middelmatig": 1.5, "complex": 3}[complexiteit]
@@ -157,14 +158,16 @@ def risico_inschatting(
         return "matig"
     return "laag"
 
-def bronnen_check(text: str, juridische_begrippen: list, complexiteit: str) -> dict:
+def bronnen_check(
+    text: str,
+    juridische_begrippen: list,
+    complexiteit: str,
+    scan: Optional[ScanSession] = None,
+) -> dict:
     """Selecteer relevante bronnen en geef omschrijving en link terug."""
 
-    import re
-    from collections import Counter
-
-    woorden = re.findall(r"[a-zA-Z]{4,}", text.lower())
-    onderwerp = Counter(woorden).most_common(1)[0][0] if woorden else "algemeen"
+    scan = scan or scan_tekst(text)
+    onderwerp = scan.most_common_word()
     artikel = f"art-{abs(hash(onderwerp)) % 100}"
 
     bronnen: dict[str, list[tuple[str, str]]] = {}
@@ -172,13 +175,11 @@ def bronnen_check(text: str, juridische_begrippen: list, complexiteit: str) -> d
     info = BRONNEN_INFO["wetten.nl"]
     bronnen["wetten.nl"] = [(f"{info['url']}/{artikel}", info["omschrijving"])]
 
-    lc = text.lower()
-
-    if "verzuim" in lc or "ziekte" in lc or complexiteit != "eenvoudig":
+    if scan.found("verzuim") or scan.found("ziekte") or complexiteit != "eenvoudig":
         info = BRONNEN_INFO["uwv.nl"]
         bronnen["uwv.nl"] = [(f"{info['url']}/{artikel}", info["omschrijving"])]
 
-    if "ontslag" in lc or "be\u00ebindiging" in lc:
+    if scan.found("ontslag") or scan.found("be\u00ebindiging"):
         info = BRONNEN_INFO["ontslag.nl"]
         bronnen["ontslag.nl"] = [(f"{info['url']}/{artikel}", info["omschrijving"])]
 
@@ -211,7 +212,8 @@ def generate_legal_advice(
     bronnen: dict,
     complexiteit: str,
     input_text: str,
-    intern_beleid: Optional[str] = None
+    intern_beleid: Optional[str] = None,
+    lengte: Optional[int] = None,
 ) -> Tuple[str, str, List[str], str]:
     # Flexibele GPT-stijl adviezen
     if not kernwoorden and not juridische_begrippen:
@@ -255,7 +257,9 @@ def generate_legal_advice(
     stappen.append("• Evalueer de situatie regelmatig en pas het plan waar nodig aan.")
 
     actieplan += "\n".join(stappen)
-    risico = risico_inschatting(input_text, complexiteit, kernwoorden, juridische_begrippen)
+    risico = risico_inschatting(
+        input_text, complexiteit, kernwoorden, juridische_begrippen, lengte
+    )
     vragen = genereer_vragen(kernwoorden, juridische_begrippen)
     return advies, actieplan, vragen, risico
 
@@ -278,19 +282,30 @@ def legalcheck(
     input_text: Optional[str] = None,
     intern_beleid: Optional[str] = None
 ) -> dict:
-    text = extract_text_from_input(file=file, input_text=input_text)
+    # De invoer wordt blok voor blok gescand; de volledige tekst is alleen
+    # nodig bij een (korte) beperkte analyse.
+    # De tijd in de bron (extractie) wordt los van het scannen gemeten.
+    blocks = timed_blocks(iter_input(file=file, input_text=input_text), "legalcheck", "extractie")
+    with stage("legalcheck", "scan", exclude=blocks):
+        scan = scan_blokken(blocks)
+    text = ""
     status = "ok"
-    if not text or len(text) < 20:
+    if scan.length < 20:
         # Voer een beknopte analyse uit in plaats van direct te stoppen
         status = "beperkte analyse"
-        text = text or (input_text or "casus")
-
-    kernwoorden, juridische_begrippen = flexibele_begrippenherkenning(text)
-    complexiteit = casus_complexiteit_score(kernwoorden, juridische_begrippen)
-    bronnen = bronnen_check(text, juridische_begrippen, complexiteit)
-    advies, actieplan, vragen, risico = generate_legal_advice(
-        kernwoorden, juridische_begrippen, bronnen, complexiteit, text, intern_beleid
-    )
+        with stage("legalcheck", "beperkte_analyse"):
+            text = extract_text_from_input(file=file, input_text=input_text)
+            text = text or (input_text or "casus")
+            scan = scan_tekst(text)
+
+    with stage("legalcheck", "advies"):
+        kernwoorden, juridische_begrippen = flexibele_begrippenherkenning(text, scan)
+        complexiteit = casus_complexiteit_score(kernwoorden, juridische_begrippen)
+        bronnen = bronnen_check(text, juridische_begrippen, complexiteit, scan)
+        advies, actieplan, vragen, risico = generate_legal_advice(
+            kernwoorden, juridische_begrippen, bronnen, complexiteit, text, intern_beleid,
+            lengte=scan.length,
+        )
 
     markdown = f"""## Juridische Analyse
 **Herkenbare kernwoorden:** {', '.join(kernwoorden) or 'Geen'}
@@ -1,20 +1,18 @@
-class BaseAgent:
-    """Simple base class for all agents."""
-
-    name: str = "base"
-
-    def __init__(self, orchestrator=None):
-        self.orchestrator = orchestrator
-
-    def handle(self, *args, **kwargs):
-        """Handle a generic request and return a result."""
-        raise NotImplementedError
-
-
+import asyncio
+import contextlib
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from fastapi import UploadFile
-from typing import List, Optional, Tuple
+from typing import Any, Awaitable, Callable, Iterator, List, Optional, Tuple
 from pathlib import Path
-from utils import Memory
+from utils import Memory, TRIGGER_INDEX
+from utils.executor import bounded_map
+from utils.cache import content_hash, file_hash
+from utils.results import RESULT_CACHE, result_key
+from utils.extraction import read_upload
+from utils.uploads import SharedUpload
+from utils.metrics import AGENT_SECONDS, AGENT_TIMEOUTS
 from Agents.Analysisagent import analysis as analysis_mod
 from Agents.Analysisagent.analysis import TRIGGERS as ANALYSIS_TRIGGERS, match_terms as analysis_match
 from Agents.Legalagent.legalcheck import (
@@ -43,11 +41,68 @@ from Agents.Complianceagent.compliance import (
     match_terms as compliance_match,
 )
 
+# Standaard maximale looptijd per agent in ``auto_route`` (0 = onbeperkt).
+AGENT_TIMEOUT = float(os.environ.get("HRCOPILOT_AGENT_TIMEOUT", 30))
+TIMEOUT_STATUS = "timeout"
+
+
+def _timed_out(result: Any) -> bool:
+    return isinstance(result, dict) and result.get("status") == TIMEOUT_STATUS
+
+
+def _consume(future: "asyncio.Future") -> None:
+    # Een agent na zijn timeout wordt niet meer afgewacht; haal een eventuele
+    # fout op zodat asyncio hem niet als "never retrieved" logt.
+    if not future.cancelled():
+        future.exception()
+
+
+class BaseAgent:
+    """Simple base class for all agents."""
+
+    name: str = "base"
+    # Namen van de groepen in ``TRIGGER_INDEX`` die deze agent activeren.
+    trigger_groups: frozenset = frozenset()
+    # Agents waarvan het resultaat in ``context`` nodig is; ``auto_route``
+    # start deze agent pas als zij klaar zijn.
+    depends_on: frozenset = frozenset()
+    # Maximale looptijd in ``auto_route`` (seconden); ``None`` = standaard.
+    timeout: Optional[float] = None
+
+    def __init__(self, orchestrator=None):
+        self.orchestrator = orchestrator
+
+    def handle(self, *args, **kwargs):
+        """Handle a generic request and return a result."""
+        raise NotImplementedError
+
+    def remember(self, user: Optional[str], entry: dict, pending: Optional[list] = None) -> None:
+        """Bewaar ``entry`` in het geheugen van de orchestrator.
+
+        Vanuit ``auto_route`` komt ``pending`` mee: de entry wordt dan alleen
+        verzameld en pas weggeschreven als de agent binnen zijn timeout klaar
+        is.
+        """
+        if pending is not None:
+            pending.append((user, entry))
+        elif self.orchestrator:
+            self.orchestrator.memory.add(user, entry)
+
+
+def upload_fingerprint(file: Optional[UploadFile]) -> Optional[dict]:
+    """Bestandsnaam en inhoudshash van een upload, als deel van een cachesleutel."""
+    if file is None:
+        return None
+    if isinstance(file, SharedUpload):
+        return {"filename": file.filename, "sha256": file.sha256}
+    return {"filename": file.filename, "sha256": file_hash(file.file)}
+
 
 class AbsenceAgent(BaseAgent):
     """Agent voor verzuimgerelateerde acties."""
 
     name = "absence"
+    trigger_groups = frozenset({"absence"})
     TRIGGERS = ABSENCE_TRIGGERS
 
     def __init__(self, orchestrator=None):
@@ -62,6 +117,7 @@ class AbsenceAgent(BaseAgent):
         file: Optional[UploadFile] = None,
         text: Optional[str] = None,
         periode: Optional[str] = None,
+        use_cache: bool = True,
     ) -> dict:
         """Analyseer een verzuimdocument of tekst."""
 
@@ -72,23 +128,58 @@ class AbsenceAgent(BaseAgent):
             }
 
         if file is not None:
-            contents = file.file.read()
-            file.file.seek(0)
+            contents = read_upload(file)
             filename = file.filename
         else:
             contents = text.encode()
             filename = "tekst-input"
-        return analysis_mod.analyse_verzuim(filename, contents, periode=periode)
-
-    def analyse_batch(self, files: List[UploadFile], periode: Optional[str] = None) -> List[dict]:
-        items: List[Tuple[str, bytes]] = []
-        for f in files:
-            data = f.file.read()
-            f.file.seek(0)
-            items.append((f.filename, data))
-        if periode is None:
-            return analysis_mod.analyse_meerdere(items)
-        return [analysis_mod.analyse_verzuim(n, c, periode=periode) for n, c in items]
+        return self._verzuim(filename, contents, periode, use_cache)
+
+    def _verzuim(
+        self, filename: str, contents: bytes, periode: Optional[str], use_cache: bool = True
+    ) -> dict:
+        # De periode wordt vooraf ingevuld zodat een nieuw kwartaal een nieuwe
+        # cachesleutel oplevert.
+        periode = periode or analysis_mod.get_latest_cbs_quarter()
+        key = result_key(
+            self.name,
+            {"filename": filename, "sha256": content_hash(contents), "periode": periode},
+        )
+        return RESULT_CACHE.get_or_compute(
+            key,
+            lambda: analysis_mod.analyse_verzuim(filename, contents, periode=periode),
+            bypass=not use_cache,
+        )
+
+    def iter_batch(
+        self,
+        files: List[UploadFile],
+        periode: Optional[str] = None,
+        ordered: bool = False,
+        use_cache: bool = True,
+    ) -> Iterator[dict]:
+        """Analyseer ``files`` parallel en lever elk resultaat zodra het klaar is.
+
+        Elk bestand wordt pas in de worker ingelezen, dus er staan nooit meer
+        bestanden tegelijk in het geheugen dan er workers zijn. Lege bestanden
+        worden zonder ``periode`` overgeslagen, net als bij
+        ``analyse_meerdere``.
+        """
+
+        def run(f: UploadFile) -> Optional[dict]:
+            data = read_upload(f)
+            if not data and periode is None:
+                return None
+            return self._verzuim(f.filename, data, periode, use_cache)
+
+        for result in bounded_map(run, files, ordered=ordered):
+            if result is not None:
+                yield result
+
+    def analyse_batch(
+        self, files: List[UploadFile], periode: Optional[str] = None, use_cache: bool = True
+    ) -> List[dict]:
+        return list(self.iter_batch(files, periode, ordered=True, use_cache=use_cache))
 
     def pdf(self, markdown: str) -> bytes:
         return analysis_mod.genereer_pdf(markdown)
@@ -96,16 +187,18 @@ class AbsenceAgent(BaseAgent):
     def chart(self, data: dict):
         return analysis_mod.genereer_grafiek(data)
 
+    def chart_png(self, data: dict) -> bytes:
+        return analysis_mod.genereer_grafiek_png(data)
+
     def handle(self, *, file=None, text=None, periode=None, context=None, **kw):
         if file is None and not text:
             return {"status": "geen input"}
-        result = self.analyse(file=file, text=text, periode=periode)
+        result = self.analyse(
+            file=file, text=text, periode=periode, use_cache=kw.get("use_cache", True)
+        )
         if context is not None:
             context["absence"] = result
-        if self.orchestrator:
-            self.orchestrator.memory.add(
-                kw.get("user", "anon"), {"absence_result": result}
-            )
+        self.remember(kw.get("user", "anon"), {"absence_result": result}, kw.get("pending_memory"))
         return result
 
 
@@ -113,6 +206,9 @@ class LegalAgent(BaseAgent):
     """Agent voor juridische controles."""
 
     name = "legal"
+    trigger_groups = frozenset({"legal"})
+    # ``handle`` voegt het verzuimresultaat toe als dat er is.
+    depends_on = frozenset({"absence"})
     TRIGGERS = LEGAL_TRIGGERS
 
     def __init__(self, orchestrator=None):
@@ -122,17 +218,31 @@ class LegalAgent(BaseAgent):
     def match_terms(cls, text: str) -> bool:
         return legal_match(text)
 
-    def analyse(self, file: Optional[UploadFile] = None, text: Optional[str] = None, intern_beleid: Optional[str] = None) -> dict:
-        return legalcheck(file=file, input_text=text, intern_beleid=intern_beleid)
+    def analyse(
+        self,
+        file: Optional[UploadFile] = None,
+        text: Optional[str] = None,
+        intern_beleid: Optional[str] = None,
+        use_cache: bool = True,
+    ) -> dict:
+        key = result_key(
+            self.name,
+            {"file": upload_fingerprint(file), "text": text, "intern_beleid": intern_beleid},
+        )
+        return RESULT_CACHE.get_or_compute(
+            key,
+            lambda: legalcheck(file=file, input_text=text, intern_beleid=intern_beleid),
+            bypass=not use_cache,
+        )
 
     def handle(self, *, file=None, text=None, intern_beleid=None, context=None, **kw):
-        result = self.analyse(file=file, text=text, intern_beleid=intern_beleid)
+        result = self.analyse(
+            file=file, text=text, intern_beleid=intern_beleid,
+            use_cache=kw.get("use_cache", True),
+        )
         if context and "absence" in context:
             result["verzuim"] = context["absence"]
-        if self.orchestrator:
-            self.orchestrator.memory.add(
-                kw.get("user", "anon"), {"legal_result": result}
-            )
+        self.remember(kw.get("user", "anon"), {"legal_result": result}, kw.get("pending_memory"))
         return result
 
 
@@ -140,6 +250,7 @@ class AnalysisAgent(BaseAgent):
     """Agent voor algemene data-analyse."""
 
     name = "analysis"
+    trigger_groups = frozenset({"analysis"})
     TRIGGERS = ANALYSIS_TRIGGERS
 
     def __init__(self, orchestrator=None):
@@ -149,8 +260,13 @@ class AnalysisAgent(BaseAgent):
     def match_terms(cls, text: str) -> bool:
         return analysis_match(text)
 
-    def analyse(self, file: UploadFile, vraag: str, formaat: str) -> Tuple[str, bytes, dict]:
-        result = analysis_mod.analyse_bestand(file, vraag)
+    def analyse(
+        self, file: UploadFile, vraag: str, formaat: str, use_cache: bool = True
+    ) -> Tuple[str, bytes, dict]:
+        key = result_key(self.name, {"file": upload_fingerprint(file), "vraag": vraag})
+        result = RESULT_CACHE.get_or_compute(
+            key, lambda: analysis_mod.analyse_bestand(file, vraag), bypass=not use_cache
+        )
         analysis_mod.log_gebruik("user", "analyse")
         mime, data = analysis_mod.genereer_rapport(result, formaat)
         return mime, data, result
@@ -170,11 +286,10 @@ class AnalysisAgent(BaseAgent):
     def handle(self, *, file=None, text=None, vraag="", formaat="json", context=None, **kw):
         if file is None:
             return {"status": "geen bestand"}
-        mime, data, result = self.analyse(file, vraag, formaat)
-        if self.orchestrator:
-            self.orchestrator.memory.add(
-                kw.get("user", "anon"), {"analysis_result": result}
-            )
+        mime, data, result = self.analyse(
+            file, vraag, formaat, use_cache=kw.get("use_cache", True)
+        )
+        self.remember(kw.get("user", "anon"), {"analysis_result": result}, kw.get("pending_memory"))
         return {"mime": mime, "result": result}
 
 
@@ -182,6 +297,7 @@ class ComplianceAgent(BaseAgent):
     """Agent voor compliancecontroles."""
 
     name = "compliance"
+    trigger_groups = frozenset({"compliance"})
     TRIGGERS = COMPLIANCE_TRIGGERS
 
     def __init__(self, orchestrator=None):
@@ -191,15 +307,20 @@ class ComplianceAgent(BaseAgent):
     def match_terms(cls, text: str) -> bool:
         return compliance_match(text)
 
-    def analyse(self, file: Optional[UploadFile] = None, text: Optional[str] = None) -> dict:
-        return compliance_check(file=file, text=text)
+    def analyse(
+        self,
+        file: Optional[UploadFile] = None,
+        text: Optional[str] = None,
+        use_cache: bool = True,
+    ) -> dict:
+        key = result_key(self.name, {"file": upload_fingerprint(file), "text": text})
+        return RESULT_CACHE.get_or_compute(
+            key, lambda: compliance_check(file=file, text=text), bypass=not use_cache
+        )
 
     def handle(self, *, file=None, text=None, context=None, **kw):
-        result = self.analyse(file=file, text=text)
-        if self.orchestrator:
-            self.orchestrator.memory.add(
-                kw.get("user", "anon"), {"compliance_result": result}
-            )
+        result = self.analyse(file=file, text=text, use_cache=kw.get("use_cache", True))
+        self.remember(kw.get("user", "anon"), {"compliance_result": result}, kw.get("pending_memory"))
         return result
 
 
@@ -209,6 +330,7 @@ class FeedbackAgent(BaseAgent):
     """Agent voor feedback en logging."""
 
     name = "feedback"
+    trigger_groups = frozenset({"feedback", "logging"})
     TRIGGERS = FEEDBACK_TRIGGERS | LOG_TRIGGERS
 
     def __init__(self, orchestrator=None):
@@ -227,13 +349,11 @@ class FeedbackAgent(BaseAgent):
     def handle(self, *, gebruiker=None, bericht=None, actie=None, context=None, **kw):
         if bericht is not None:
             result = self.store(gebruiker or "anon", bericht)
-            if self.orchestrator:
-                self.orchestrator.memory.add(gebruiker or "anon", {"feedback": bericht})
+            self.remember(gebruiker or "anon", {"feedback": bericht}, kw.get("pending_memory"))
             return result
         if actie is not None:
             result = self.log(gebruiker or "anon", actie)
-            if self.orchestrator:
-                self.orchestrator.memory.add(gebruiker or "anon", {"log": actie})
+            self.remember(gebruiker or "anon", {"log": actie}, kw.get("pending_memory"))
             return result
         return {"status": "geen feedback"}
 
@@ -242,7 +362,9 @@ class MainAgent:
     """Orchestrator die automatisch de juiste agent(en) aanroept."""
 
     def __init__(self, memory_path: Optional[Path] = None):
-        self.memory = Memory(memory_path)
+        self.memory_path = memory_path
+        self._memory: Optional[Memory] = None
+        self._agent_pool: Optional[ThreadPoolExecutor] = None
         self.absence = AbsenceAgent(self)
         self.legal = LegalAgent(self)
         self.analysis = AnalysisAgent(self)
@@ -256,24 +378,169 @@ class MainAgent:
             self.feedback,
         ]
 
+    @property
+    def memory(self) -> Memory:
+        """Het geheugen wordt pas bij het eerste gebruik geopend."""
+        if self._memory is None:
+            self._memory = Memory(self.memory_path)
+        return self._memory
+
+    def memory_bytes(self) -> int:
+        """Grootte van het geheugenbestand; 0 zolang het nog niet geopend is."""
+        return self._memory.size_bytes() if self._memory is not None else 0
+
+    def memory_stats(self) -> dict:
+        """Bewaarstatistieken van het geheugen; leeg zolang het niet geopend is."""
+        return self._memory.retention_stats() if self._memory is not None else {}
+
+    def warm_up(self) -> None:
+        """Laad parsers, grafiek- en renderwerkers en het geheugen alvast in."""
+        from utils import extraction
+        from utils.rendering import PDF_RENDERER
+
+        self.memory
+        extraction.preload()
+        analysis_mod.CHART_RENDERER.render([0, 0])
+        PDF_RENDERER.warm_up()
+
+    def matching_agents(self, text: str) -> List[BaseAgent]:
+        """Return alle agents waarvan een trigger in ``text`` voorkomt."""
+        groups = TRIGGER_INDEX.matches(text)
+        return [agent for agent in self.agents if agent.trigger_groups & groups]
+
     def detect_agent(self, text: str) -> Optional[BaseAgent]:
         """Kies een agent op basis van semantische triggers."""
-        for agent in self.agents:
-            if agent.match_terms(text):
-                return agent
-        return None
+        matches = self.matching_agents(text)
+        return matches[0] if matches else None
+
+    @staticmethod
+    def execution_order(agents: List[BaseAgent]) -> List[BaseAgent]:
+        """Sorteer ``agents`` zodat afhankelijkheden vóór hun afnemers komen.
+
+        Alleen afhankelijkheden binnen ``agents`` tellen mee; bij een cyclus
+        blijft de oorspronkelijke volgorde voor de resterende agents staan.
+        """
+        pending = list(agents)
+        names = {agent.name for agent in agents}
+        done: set = set()
+        ordered: List[BaseAgent] = []
+        while pending:
+            ready = [a for a in pending if (a.depends_on & names) <= done] or pending[:1]
+            for agent in ready:
+                pending.remove(agent)
+                ordered.append(agent)
+                done.add(agent.name)
+        return ordered
+
+    async def auto_route_async(
+        self,
+        text: str,
+        user: str | None = None,
+        run: Optional[Callable[[Callable[[], Any]], Awaitable[Any]]] = None,
+        **kwargs,
+    ) -> dict:
+        """Voer alle passende agents gelijktijdig uit op basis van ``text``.
+
+        Een agent start zodra de agents in ``depends_on`` klaar zijn en krijgt
+        hun resultaten in ``context`` mee. ``run`` voert een blokkerende
+        aanroep uit buiten de event loop (standaard in een threadpool). Een
+        agent die langer duurt dan zijn ``timeout`` levert een
+        ``{"status": "timeout"}``-resultaat op; de overige resultaten komen
+        gewoon terug. De timeout telt vanaf het moment dat de agent echt
+        start, en een agent die te laat is schrijft niets naar het geheugen.
+        """
+        loop = asyncio.get_running_loop()
+        if run is None:
+
+            def run(call):
+                return loop.run_in_executor(self._executor(), call)
+
+        # De upload wordt één keer uit de spool gelezen; alle agents delen
+        # daarna dezelfde onveranderlijke buffer.
+        file = kwargs.pop("file", None)
+        if file is not None:
+            file = await run(partial(SharedUpload.from_upload, file))
+        results: dict = {}
+        tasks: dict = {}
+        # Geheugenentries van agents die op tijd klaar waren.
+        writes: list = []
+
+        async def run_agent(agent: BaseAgent) -> Any:
+            deps = [tasks[name] for name in agent.depends_on if name in tasks]
+            if deps:
+                await asyncio.wait(deps)
+            # Iedere agent krijgt een eigen context, zodat een agent die na
+            # zijn timeout doorloopt niets meer aan het antwoord kan wijzigen.
+            context = {
+                name: results[name]
+                for name in agent.depends_on
+                if name in results and not _timed_out(results[name])
+            }
 
-    def auto_route(self, text: str, user: str | None = None, **kwargs) -> dict:
-        """Voer automatisch alle passende agents uit op basis van ``text``."""
-        context = {}
-        for agent in self.agents:
-            if agent.match_terms(text):
-                context[agent.name] = agent.handle(
-                    text=text, **kwargs, context=context, user=user
-                )
+            started = asyncio.Event()
+            pending: list = []
+
+            def call():
+                with contextlib.suppress(RuntimeError):  # loop al gesloten
+                    loop.call_soon_threadsafe(started.set)
+                with AGENT_SECONDS.time(agent.name):
+                    return agent.handle(
+                        text=text, file=file, **kwargs, context=context, user=user,
+                        pending_memory=pending,
+                    )
+
+            # De timeout telt vanaf de start in de worker, niet de wachttijd
+            # in de pool. Na een timeout loopt de taak door tot de thread klaar
+            # is, zodat hij zijn plek in de pool (``max_queue`` en routelimiet)
+            # tot dan vasthoudt.
+            job = asyncio.ensure_future(run(call))
+            job.add_done_callback(_consume)
+            waiter = asyncio.ensure_future(started.wait())
+            await asyncio.wait({job, waiter}, return_when=asyncio.FIRST_COMPLETED)
+            waiter.cancel()
+            timeout = agent.timeout if agent.timeout is not None else AGENT_TIMEOUT
+            try:
+                result = await asyncio.wait_for(asyncio.shield(job), timeout or None)
+            except asyncio.TimeoutError:
+                AGENT_TIMEOUTS.inc(agent.name)
+                result = {"status": TIMEOUT_STATUS, "timeout": timeout}
+            else:
+                writes.extend(pending)
+            results[agent.name] = result
+            return result
+
+        matches = self.matching_agents(text)
+        for agent in self.execution_order(matches):
+            tasks[agent.name] = asyncio.ensure_future(run_agent(agent))
+        if tasks:
+            await asyncio.gather(*tasks.values())
+
+        context = {agent.name: results[agent.name] for agent in matches}
+        timeouts = [name for name, result in context.items() if _timed_out(result)]
+        if timeouts:
+            context["timeouts"] = timeouts
         if not context:
             context["status"] = "geen match"
         if user:
-            self.memory.add(user, {"input": text, "output": context})
+            writes.append((user, {"input": text, "output": context}))
+        if writes:
+            await run(partial(self._write_memory, writes))
         return context
 
+    def _write_memory(self, writes: List[Tuple[Optional[str], dict]]) -> None:
+        for user, entry in writes:
+            self.memory.add(user, entry)
+
+    def auto_route(self, text: str, user: str | None = None, **kwargs) -> dict:
+        """Synchrone variant van :meth:`auto_route_async`."""
+        return asyncio.run(self.auto_route_async(text, user=user, **kwargs))
+
+    def _executor(self) -> ThreadPoolExecutor:
+        # Gedeeld en blijvend: een agent die na zijn timeout doorloopt mag het
+        # afsluiten van de event loop niet ophouden.
+        if self._agent_pool is None:
+            self._agent_pool = ThreadPoolExecutor(
+                max_workers=len(self.agents) * 4, thread_name_prefix="hrcopilot-agent"
+            )
+        return self._agent_pool
+
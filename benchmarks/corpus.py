@@ -0,0 +1,140 @@
+"""Synthetische HR-invoer voor de benchmarks.
+
+Alle generatoren zijn deterministisch (vaste ``seed``) en bouwen invoer die
+lijkt op wat de routes in productie krijgen: juridische brieven met
+ontslag- en verzuimtermen, beleidsteksten met persoonsgegevens,
+personeelsexports als CSV/xlsx en presentaties als pptx.
+
+Een ``.msg``-bestand kan niet zonder Outlook of een CFB-schrijver worden
+aangemaakt; :func:`msg_samples` laadt daarom echte voorbeeldbestanden als
+die worden meegegeven.
+"""
+from __future__ import annotations
+
+import random
+from io import BytesIO
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+# Omvang per grootteklasse: woorden (tekst), rijen (exports), dia's (pptx)
+# en aantal bestanden (batch).
+SIZES: Dict[str, Dict[str, int]] = {
+    "klein": {"woorden": 300, "rijen": 100, "dias": 5, "bestanden": 5},
+    "middel": {"woorden": 3_000, "rijen": 5_000, "dias": 30, "bestanden": 25},
+    "groot": {"woorden": 30_000, "rijen": 50_000, "dias": 120, "bestanden": 100},
+}
+
+AANHEF = ["Geachte heer Jansen,", "Geachte mevrouw De Vries,", "Beste collega,"]
+ZINNEN = [
+    "Naar aanleiding van ons gesprek bevestigen wij het voornemen tot ontslag.",
+    "De arbeidsovereenkomst eindigt met inachtneming van de opzegtermijn.",
+    "Er is een vaststellingsovereenkomst opgesteld op basis van wederzijds goedvinden.",
+    "U heeft recht op een transitievergoeding conform artikel 7:673 BW.",
+    "Het concurrentiebeding blijft gedurende twaalf maanden van kracht.",
+    "Wij wijzen u op de mogelijkheid van herplaatsing binnen de organisatie.",
+    "Het verzuim is gemeld bij de arbodienst en de poortwachter-termijnen lopen.",
+    "De re-integratie verloopt volgens het plan van aanpak.",
+    "Tijdens de proeftijd kan de overeenkomst door beide partijen worden beëindigd.",
+    "Bij een reorganisatie wordt het afspiegelingsbeginsel toegepast.",
+    "Het getuigschrift wordt na afloop van het dienstverband verstrekt.",
+    "Wij verzoeken u de bijgevoegde documenten binnen veertien dagen te retourneren.",
+]
+PII = [
+    "Contact via {naam}@voorbeeld.nl of 06-12345678.",
+    "Salaris wordt overgemaakt naar NL91 ABNA 0417 1643 00.",
+    "BSN van de werknemer: 111222333.",
+    "Personeelsnummer 2024{nummer:06d} is gekoppeld aan het dossier.",
+]
+AFDELINGEN = ["HR", "Finance", "Sales", "IT", "Operations", "Legal", "Support"]
+LABELS = ["laag", "midden", "hoog"]
+
+
+def juridische_brief(woorden: int, seed: int = 1, pii: bool = False) -> str:
+    """Een Nederlandse brief van ongeveer ``woorden`` woorden."""
+    rng = random.Random(seed)
+    regels = [rng.choice(AANHEF), ""]
+    count = 0
+    while count < woorden:
+        zin = rng.choice(ZINNEN)
+        if pii and rng.random() < 0.2:
+            zin = rng.choice(PII).format(naam=f"mw{rng.randrange(999)}", nummer=rng.randrange(10**6))
+        regels.append(zin)
+        count += len(zin.split())
+    regels += ["", "Met vriendelijke groet,", "Afdeling HR"]
+    return "\n".join(regels)
+
+
+def _export_rows(rijen: int, seed: int) -> List[Tuple]:
+    rng = random.Random(seed)
+    return [
+        (
+            f"mw{i:06d}",
+            rng.choice(AFDELINGEN),
+            rng.choice(LABELS),
+            rng.choice(LABELS),
+            rng.randrange(0, 40),
+            round(rng.uniform(0, 12), 1),
+        )
+        for i in range(rijen)
+    ]
+
+
+EXPORT_KOLOMMEN = ("medewerker", "afdeling", "prestatie", "potentieel", "verzuimdagen", "verzuimpercentage")
+
+
+def personeelsexport_csv(rijen: int, seed: int = 2) -> bytes:
+    lines = [",".join(EXPORT_KOLOMMEN)]
+    lines += [",".join(str(v) for v in row) for row in _export_rows(rijen, seed)]
+    return ("\n".join(lines) + "\n").encode()
+
+
+def personeelsexport_xlsx(rijen: int, seed: int = 2) -> bytes:
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Personeel")
+    ws.append(EXPORT_KOLOMMEN)
+    for row in _export_rows(rijen, seed):
+        ws.append(row)
+    buf = BytesIO()
+    wb.save(buf)
+    return buf.getvalue()
+
+
+def presentatie_pptx(dias: int, seed: int = 3) -> bytes:
+    from pptx import Presentation
+
+    rng = random.Random(seed)
+    prs = Presentation()
+    layout = prs.slide_layouts[1]
+    for i in range(dias):
+        slide = prs.slides.add_slide(layout)
+        slide.shapes.title.text = f"Reorganisatie fase {i + 1}"
+        body = slide.placeholders[1].text_frame
+        body.text = rng.choice(ZINNEN)
+        for _ in range(4):
+            body.add_paragraph().text = rng.choice(ZINNEN)
+    buf = BytesIO()
+    prs.save(buf)
+    return buf.getvalue()
+
+
+def msg_samples(path: str | None) -> List[Tuple[str, bytes]]:
+    """Echte ``.msg``-bestanden uit ``path`` (bestand of map), indien opgegeven."""
+    if not path:
+        return []
+    source = Path(path)
+    files = sorted(source.glob("*.msg")) if source.is_dir() else [source]
+    return [(f.name, f.read_bytes()) for f in files if f.is_file()]
+
+
+def corpus(grootte: str) -> Dict[str, Tuple[str, bytes]]:
+    """Alle invoerbestanden voor één grootteklasse als ``naam -> (bestandsnaam, bytes)``."""
+    size = SIZES[grootte]
+    return {
+        "brief": ("brief.txt", juridische_brief(size["woorden"]).encode()),
+        "beleid": ("beleid.txt", juridische_brief(size["woorden"], seed=4, pii=True).encode()),
+        "csv": ("personeel.csv", personeelsexport_csv(size["rijen"])),
+        "xlsx": ("personeel.xlsx", personeelsexport_xlsx(size["rijen"])),
+        "pptx": ("presentatie.pptx", presentatie_pptx(size["dias"])),
+    }
@@ -0,0 +1,273 @@
+"""Belastingstest: ``/auto/`` onder uvicorn bij oplopende gelijktijdigheid.
+
+Gebruik::
+
+    python -m benchmarks.load [--levels 1,2,4,8,16,32] [--duration 10]
+        [--workers 1] [--thread-workers N] [--upload-ratio 0.3] [--warm]
+        [--url http://127.0.0.1:8000] [--output load.json] [--plot curve.png]
+
+Start de app in een eigen uvicorn-proces (of gebruik een draaiende server
+met ``--url``) en belast ``/auto/`` in een gesloten lus: per niveau sturen
+``C`` clients ieder hun volgende request zodra het vorige antwoord binnen is,
+gedurende ``--duration`` seconden. De requests wisselen tussen teksten die
+één of meerdere agents activeren, deels met een upload uit het
+benchmarkcorpus.
+
+Per niveau worden doorvoer, p50/p95/p99, foutpercentage (``503`` apart) en
+de vertraging van de event loop gerapporteerd. Die laatste komt uit
+``hrcopilot_event_loop_lag_seconds`` in ``/metrics`` (verschil vóór en na het
+niveau); met meerdere uvicorn-workers is dat de meting van één worker.
+``verzadiging`` is het eerste niveau waarbij de doorvoer minder dan
+``--knee-gain`` toeneemt: daar stopt ``auto_route`` met schalen. Standaard
+staat de resultaatcache uit (``HRCOPILOT_RESULT_CACHE=0``), zodat iedere
+request echt rekent; ``--warm`` laat hem aan.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+from benchmarks import corpus as corpus_mod
+from benchmarks.routes import percentile
+
+TEXTS = [
+    "Het ziekteverzuim neemt toe",
+    "Mogelijk ontslag wegens disfunctioneren en een vaststellingsovereenkomst",
+    "Verzuim en ontslag: welke opzegtermijn geldt?",
+    "Controleer het privacybeleid volgens de AVG",
+    "Privacy van medewerkers bij re-integratie en ontslag",
+    "Data-analyse van het verzuim per afdeling",
+    "geen relevantie",
+]
+LAG_METRIC = "hrcopilot_event_loop_lag_seconds"
+_SAMPLE = re.compile(r'^(?P<name>[a-z_]+)(?:\{(?P<labels>[^}]*)\})? (?P<value>\S+)$')
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(port: int, workers: int, env: Dict[str, str]) -> subprocess.Popen:
+    cmd = [
+        sys.executable, "-m", "uvicorn", "main:app",
+        "--host", "127.0.0.1", "--port", str(port),
+        "--workers", str(workers), "--log-level", "warning",
+    ]
+    return subprocess.Popen(cmd, env={**os.environ, **env})
+
+
+def wait_ready(url: str, timeout: float = 30.0) -> None:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if httpx.get(f"{url}/metrics", timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"server op {url} niet bereikbaar")
+
+
+def loop_lag(text: str) -> Tuple[Dict[float, float], float, float]:
+    """Buckets (``le`` -> telling), som en aantal van de lag-histogram."""
+    buckets: Dict[float, float] = {}
+    total = count = 0.0
+    for line in text.splitlines():
+        match = _SAMPLE.match(line)
+        if not match or not match["name"].startswith(LAG_METRIC):
+            continue
+        value = float(match["value"])
+        if match["name"] == f"{LAG_METRIC}_bucket":
+            bound = re.search(r'le="([^"]+)"', match["labels"] or "")[1]
+            buckets[float("inf") if bound == "+Inf" else float(bound)] = value
+        elif match["name"] == f"{LAG_METRIC}_sum":
+            total = value
+        elif match["name"] == f"{LAG_METRIC}_count":
+            count = value
+    return buckets, total, count
+
+
+def lag_delta(before: str, after: str) -> dict:
+    """Gemiddelde en p99-bovengrens van de lag tussen twee scrapes (ms)."""
+    b_buckets, b_sum, b_count = loop_lag(before)
+    a_buckets, a_sum, a_count = loop_lag(after)
+    count = a_count - b_count
+    if count <= 0:
+        return {"lag_gem_ms": None, "lag_p99_ms": None}
+    p99 = None
+    for bound in sorted(a_buckets):
+        if a_buckets[bound] - b_buckets.get(bound, 0) >= 0.99 * count:
+            p99 = bound
+            break
+    return {
+        "lag_gem_ms": round((a_sum - b_sum) / count * 1000, 3),
+        "lag_p99_ms": None if p99 in (None, float("inf")) else round(p99 * 1000, 3),
+    }
+
+
+def payloads(upload_ratio: float, seed: int = 7) -> List[dict]:
+    """Vaste mix van tekst- en uploadrequests voor ``/auto/``."""
+    rng = random.Random(seed)
+    files = corpus_mod.corpus("klein")
+    uploads = [files["brief"], files["beleid"], files["csv"]]
+    mix = []
+    for i in range(200):
+        request = {"data": {"text": TEXTS[i % len(TEXTS)]}}
+        if rng.random() < upload_ratio:
+            name, data = rng.choice(uploads)
+            request["files"] = {"file": (name, data, "application/octet-stream")}
+        mix.append(request)
+    return mix
+
+
+async def run_level(
+    client: httpx.AsyncClient, concurrency: int, duration: float, mix: List[dict]
+) -> dict:
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+    deadline = time.perf_counter() + duration
+
+    async def worker(offset: int) -> None:
+        i = offset
+        while time.perf_counter() < deadline:
+            request = mix[i % len(mix)]
+            i += concurrency
+            start = time.perf_counter()
+            try:
+                response = await client.post("/auto/", **request)
+                status = str(response.status_code)
+            except httpx.HTTPError as exc:
+                status = type(exc).__name__
+            latencies.append((time.perf_counter() - start) * 1000)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    before = (await client.get("/metrics")).text
+    wall = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    wall = time.perf_counter() - wall
+    after = (await client.get("/metrics")).text
+
+    total = len(latencies)
+    errors = sum(n for status, n in statuses.items() if status != "200")
+    return {
+        "gelijktijdig": concurrency,
+        "requests": total,
+        "doorvoer_rps": round(total / wall, 2),
+        "p50_ms": round(percentile(latencies, 50), 3) if latencies else None,
+        "p95_ms": round(percentile(latencies, 95), 3) if latencies else None,
+        "p99_ms": round(percentile(latencies, 99), 3) if latencies else None,
+        "foutpercentage": round(errors / total * 100, 2) if total else None,
+        "bezet_503": statuses.get("503", 0),
+        "statussen": statuses,
+        **lag_delta(before, after),
+    }
+
+
+def saturation(curve: List[dict], knee_gain: float = 0.1) -> Optional[int]:
+    """Eerste gelijktijdigheid waarbij de doorvoer < ``knee_gain`` groeit."""
+    for previous, current in zip(curve, curve[1:]):
+        if previous["doorvoer_rps"] and (
+            current["doorvoer_rps"] < previous["doorvoer_rps"] * (1 + knee_gain)
+        ):
+            return previous["gelijktijdig"]
+    return None
+
+
+def plot(curve: List[dict], path: str) -> None:
+    """Doorvoer en p95 tegen gelijktijdigheid als PNG."""
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    levels = [point["gelijktijdig"] for point in curve]
+    fig = Figure(figsize=(7, 4))
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot(111)
+    ax.plot(levels, [p["doorvoer_rps"] for p in curve], marker="o", color="tab:blue")
+    ax.set_xscale("log", base=2)
+    ax.set_xlabel("gelijktijdige clients")
+    ax.set_ylabel("doorvoer (req/s)", color="tab:blue")
+    latency = ax.twinx()
+    latency.plot(levels, [p["p95_ms"] for p in curve], marker="s", color="tab:red")
+    latency.set_ylabel("p95 (ms)", color="tab:red")
+    ax.set_title("/auto/ verzadigingscurve")
+    fig.tight_layout()
+    fig.savefig(path)
+
+
+async def sweep(url: str, levels: List[int], duration: float, mix: List[dict]) -> List[dict]:
+    limits = httpx.Limits(max_connections=max(levels) + 1, max_keepalive_connections=max(levels) + 1)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=120) as client:
+        await client.post("/auto/", **mix[0])  # opwarmen buiten de meting
+        return [await run_level(client, level, duration, mix) for level in levels]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--levels", default="1,2,4,8,16,32")
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn-processen")
+    parser.add_argument("--thread-workers", type=int, default=None, help="HRCOPILOT_THREAD_WORKERS")
+    parser.add_argument("--upload-ratio", type=float, default=0.3)
+    parser.add_argument("--knee-gain", type=float, default=0.1)
+    parser.add_argument("--warm", action="store_true", help="resultaatcache aan laten")
+    parser.add_argument("--url", default=None, help="bestaande server i.p.v. zelf starten")
+    parser.add_argument("--output", default=None)
+    parser.add_argument("--plot", default=None, help="PNG met de verzadigingscurve")
+    args = parser.parse_args()
+
+    levels = [int(level) for level in args.levels.split(",") if level]
+    server = None
+    url = args.url
+    env = {} if args.warm else {"HRCOPILOT_RESULT_CACHE": "0"}
+    if args.thread_workers is not None:
+        env["HRCOPILOT_THREAD_WORKERS"] = str(args.thread_workers)
+    if url is None:
+        port = free_port()
+        url = f"http://127.0.0.1:{port}"
+        server = start_server(port, args.workers, env)
+    try:
+        wait_ready(url)
+        curve = asyncio.run(sweep(url, levels, args.duration, payloads(args.upload_ratio)))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+
+    report = {
+        "meta": {
+            "url": url,
+            "workers": args.workers,
+            "thread_workers": args.thread_workers,
+            "duur_s": args.duration,
+            "upload_ratio": args.upload_ratio,
+            "warm": args.warm,
+            "cpus": os.cpu_count(),
+            "tijdstip": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "curve": curve,
+        "verzadiging": saturation(curve, args.knee_gain),
+    }
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    if args.plot:
+        plot(curve, args.plot)
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,319 @@
+"""Benchmark: alle routes van ``main.py`` met synthetische HR-invoer.
+
+Gebruik::
+
+    python -m benchmarks.routes [--sizes klein,middel] [--repeat 20]
+        [--concurrency 1] [--routes /spp/,/auto/] [--msg pad/naar/msgs]
+        [--warm] [--output resultaat.json]
+        [--baseline benchmarks/baseline.json] [--max-regression 0.25]
+        [--min-delta-ms 5] [--strict]
+
+De requests gaan in-process via de ASGI-app (``httpx.ASGITransport``), dus
+zonder netwerk. Per route, invoer en grootteklasse worden p50/p95/p99
+(ms), doorvoer (requests per seconde) en de piek-RSS tijdens dat scenario
+gemeten. Standaard wordt koud gemeten: de extractiecache wordt per request
+geleegd en ``Cache-Control: no-cache`` slaat de resultaatcache over; met
+``--warm`` blijven beide caches aan.
+
+Met ``--baseline`` wordt ieder scenario vergeleken met een eerder
+opgeslagen resultaat; een p50 of p95 die meer dan ``--max-regression`` en
+meer dan ``--min-delta-ms`` trager is, telt als regressie (``--strict``
+geeft dan exitcode 1). ``benchmarks/baseline.json`` is gemeten met
+``--sizes klein,middel --repeat 10``; maak op de eigen referentiemachine een
+nieuwe met ``--output``.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import resource
+import sys
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+from benchmarks import corpus as corpus_mod
+
+RSS_INTERVAL = 0.005
+
+Request = Dict[str, object]
+Scenario = Tuple[str, str, Callable[[dict, dict], Optional[Request]]]
+
+
+def _file(item: Tuple[str, bytes], field: str = "file") -> dict:
+    name, data = item
+    return {field: (name, data, "application/octet-stream")}
+
+
+def _msg(data: dict, route: str) -> Optional[Request]:
+    if not data["msg"]:
+        return None
+    return {"url": route, "files": _file(data["msg"][0])}
+
+
+SCENARIOS: List[Scenario] = [
+    ("/upload/", "csv", lambda d, s: {"url": "/upload/", "files": _file(d["csv"])}),
+    ("/upload/", "brief", lambda d, s: {"url": "/upload/", "files": _file(d["brief"])}),
+    (
+        "/batch_upload/",
+        "brief",
+        lambda d, s: {
+            "url": "/batch_upload/",
+            "files": [
+                ("files", (f"verzuim{i}.txt", d["brief"][1], "text/plain"))
+                for i in range(s["bestanden"])
+            ],
+        },
+    ),
+    ("/legalcheck/", "brief", lambda d, s: {"url": "/legalcheck/", "files": _file(d["brief"])}),
+    ("/legalcheck/", "pptx", lambda d, s: {"url": "/legalcheck/", "files": _file(d["pptx"])}),
+    ("/legalcheck/", "msg", lambda d, s: _msg(d, "/legalcheck/")),
+    ("/compliance/", "beleid", lambda d, s: {"url": "/compliance/", "files": _file(d["beleid"])}),
+    ("/compliance/", "xlsx", lambda d, s: {"url": "/compliance/", "files": _file(d["xlsx"])}),
+    ("/compliance/", "msg", lambda d, s: _msg(d, "/compliance/")),
+    ("/analyse/", "xlsx", lambda d, s: {"url": "/analyse/", "files": _file(d["xlsx"])}),
+    ("/spp/", "csv", lambda d, s: {"url": "/spp/?formaat=json", "files": _file(d["csv"])}),
+    ("/spp/", "xlsx", lambda d, s: {"url": "/spp/?formaat=json", "files": _file(d["xlsx"])}),
+    (
+        "/auto/",
+        "brief",
+        lambda d, s: {
+            "url": "/auto/",
+            "data": {"text": "verzuim, ontslag en privacy van medewerkers"},
+            "files": _file(d["brief"]),
+        },
+    ),
+]
+
+
+def percentile(samples: List[float], p: float) -> float:
+    """Nearest-rank percentile of ``samples`` (``p`` in 0..100)."""
+    ordered = sorted(samples)
+    rank = max(1, math.ceil(p / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def current_rss() -> Optional[int]:
+    """Resident set size in bytes (Linux ``/proc``), anders ``None``."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def max_rss() -> int:
+    """Piek-RSS van het hele proces in bytes (``getrusage``)."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class RSSSampler:
+    """Samplet de RSS in een achtergrondthread en onthoudt de piek."""
+
+    def __init__(self, interval: float = RSS_INTERVAL):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self) -> None:
+        while True:
+            rss = current_rss()
+            if rss is None:
+                return
+            self.peak = max(self.peak, rss)
+            if self._stop.wait(self.interval):
+                return
+
+    def __enter__(self) -> "RSSSampler":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+        if not self.peak:
+            self.peak = max_rss()
+
+
+def _clear_caches() -> None:
+    from utils.extraction import EXTRACTION_CACHE
+
+    EXTRACTION_CACHE.clear()
+
+
+async def run_scenario(
+    client: httpx.AsyncClient, request: Request, repeat: int, concurrency: int, warm: bool
+) -> dict:
+    headers = {} if warm else {"Cache-Control": "no-cache"}
+    latencies: List[float] = []
+    errors = 0
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def one() -> None:
+        nonlocal errors
+        async with semaphore:
+            if not warm:
+                _clear_caches()
+            start = time.perf_counter()
+            response = await client.post(
+                request["url"], data=request.get("data"), files=request.get("files"), headers=headers
+            )
+            latencies.append((time.perf_counter() - start) * 1000)
+            if response.status_code >= 400:
+                errors += 1
+
+    # Eén verzoek vooraf om imports en workers buiten de meting te houden.
+    await client.post(request["url"], data=request.get("data"), files=request.get("files"))
+    with RSSSampler() as rss:
+        wall = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(repeat)))
+        wall = time.perf_counter() - wall
+    return {
+        "n": repeat,
+        "fouten": errors,
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p95_ms": round(percentile(latencies, 95), 3),
+        "p99_ms": round(percentile(latencies, 99), 3),
+        "doorvoer_rps": round(repeat / wall, 2),
+        "piek_rss_mb": round(rss.peak / 2**20, 1),
+    }
+
+
+def _bytes(request: Request) -> int:
+    files = request.get("files") or {}
+    items = files.values() if isinstance(files, dict) else [f for _, f in files]
+    return sum(len(item[1]) for item in items)
+
+
+async def run(
+    sizes: List[str],
+    repeat: int,
+    concurrency: int = 1,
+    routes: Optional[List[str]] = None,
+    msg_path: Optional[str] = None,
+    warm: bool = False,
+) -> dict:
+    from main import app
+
+    msgs = corpus_mod.msg_samples(msg_path)
+    results = []
+    skipped = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for grootte in sizes:
+            data = {**corpus_mod.corpus(grootte), "msg": msgs}
+            for route, invoer, build in SCENARIOS:
+                if routes and route not in routes:
+                    continue
+                request = build(data, corpus_mod.SIZES[grootte])
+                if request is None:
+                    skipped.append({"route": route, "invoer": invoer, "reden": "geen voorbeeldbestand"})
+                    continue
+                stats = await run_scenario(client, request, repeat, concurrency, warm)
+                results.append(
+                    {"route": route, "invoer": invoer, "grootte": grootte, "bytes": _bytes(request), **stats}
+                )
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "repeat": repeat,
+            "concurrency": concurrency,
+            "warm": warm,
+            "tijdstip": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "resultaten": results,
+        "overgeslagen": skipped,
+    }
+
+
+def _key(item: dict) -> Tuple[str, str, str]:
+    return item["route"], item["invoer"], item["grootte"]
+
+
+def compare(
+    report: dict, baseline: dict, max_regression: float = 0.25, min_delta_ms: float = 5.0
+) -> List[dict]:
+    """Voeg per scenario de verhouding t.o.v. ``baseline`` toe; geef regressies terug.
+
+    Een scenario is een regressie als p50 of p95 meer dan ``max_regression``
+    én meer dan ``min_delta_ms`` trager is; zo tellen schommelingen van een
+    paar milliseconden bij snelle routes niet mee.
+    """
+    previous = {_key(item): item for item in baseline.get("resultaten", [])}
+    regressions = []
+    for item in report["resultaten"]:
+        base = previous.get(_key(item))
+        if base is None:
+            continue
+        vergelijking = {}
+        regressie = False
+        for metric in ("p50_ms", "p95_ms"):
+            ratio = round(item[metric] / base[metric], 3) if base[metric] else None
+            vergelijking[metric] = base[metric]
+            vergelijking[metric.replace("_ms", "_ratio")] = ratio
+            if (
+                ratio is not None
+                and ratio > 1 + max_regression
+                and item[metric] - base[metric] > min_delta_ms
+            ):
+                regressie = True
+        item["baseline"] = {**vergelijking, "regressie": regressie}
+        if regressie:
+            regressions.append({"route": item["route"], "invoer": item["invoer"],
+                                "grootte": item["grootte"], **vergelijking})
+    report["regressies"] = regressions
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="klein,middel", help="bijv. klein,middel,groot")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--routes", default="", help="alleen deze routes, bijv. /spp/,/auto/")
+    parser.add_argument("--msg", default=None, help=".msg-bestand of map met voorbeelden")
+    parser.add_argument("--warm", action="store_true", help="caches niet legen")
+    parser.add_argument("--output", default=None)
+    parser.add_argument("--baseline", default=None)
+    parser.add_argument("--max-regression", type=float, default=0.25)
+    parser.add_argument("--min-delta-ms", type=float, default=5.0)
+    parser.add_argument("--strict", action="store_true")
+    args = parser.parse_args()
+
+    report = asyncio.run(
+        run(
+            [s for s in args.sizes.split(",") if s],
+            args.repeat,
+            args.concurrency,
+            [r for r in args.routes.split(",") if r] or None,
+            args.msg,
+            args.warm,
+        )
+    )
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(
+                report, json.load(f), args.max_regression, args.min_delta_ms
+            )
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    print(text)
+    if regressions and args.strict:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
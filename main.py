@@ -1,26 +1,94 @@
-from fastapi import FastAPI, File, UploadFile, Form
-from fastapi.responses import JSONResponse, StreamingResponse
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, File, UploadFile, Form, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from typing import List, Optional
 from io import BytesIO
+import asyncio
+import json
+import os
 
 from agents import MainAgent
+from utils.executor import WorkerPool, ExecutorBusy
+from utils.rendering import PDF_RENDERER
+from utils.file_utils import LOG_WRITER
+from utils.uploads import SharedUpload, UploadLimitMiddleware, configure_spooling
+from utils.jobs import JobQueue, JSON_MEDIA
+from utils.charts import CHART_RENDERER
+from utils.extraction import EXTRACTION_CACHE
+from utils.results import RESULT_CACHE
+from utils import metrics
 
 ADMIN_USER = "admin"
-app = FastAPI()
+# Met HRCOPILOT_WARMUP=1 worden parsers en workers bij het opstarten op de
+# achtergrond ingeladen, zodat de eerste request niet de koude start betaalt.
+WARMUP = os.environ.get("HRCOPILOT_WARMUP", "0") == "1"
 main_agent = MainAgent()
+pool = WorkerPool()
+jobs = JobQueue()
 
 
-@app.post("/upload/")
-async def upload_file(
-    file: UploadFile = File(None),
-    text: Optional[str] = Form(None),
-    periode: Optional[str] = None,
-    formaat: Optional[str] = "json",
-):
-    if file is None and text is None:
-        return JSONResponse(content={"status": "geen input"})
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if WARMUP:
+        asyncio.get_running_loop().run_in_executor(None, main_agent.warm_up)
+    lag_monitor = None
+    if metrics.METRICS_ENABLED and metrics.LOOP_LAG_INTERVAL:
+        lag_monitor = asyncio.create_task(metrics.monitor_loop_lag())
+    yield
+    if lag_monitor is not None:
+        lag_monitor.cancel()
+    pool.shutdown(wait=False)
+    jobs.shutdown(wait=False)
+    PDF_RENDERER.shutdown(wait=False)
+    LOG_WRITER.flush()
+
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(UploadLimitMiddleware)
+configure_spooling()
+app.add_middleware(metrics.MetricsMiddleware)
+
+metrics.register_cache("extractie", EXTRACTION_CACHE)
+metrics.register_cache("resultaat", RESULT_CACHE)
+metrics.register_cache("grafiek", CHART_RENDERER.cache)
+metrics.register_cache("pdf", PDF_RENDERER.cache)
+metrics.value_gauge("hrcopilot_executor_pending", "Tasks queued or running in the worker pool.", lambda: pool.pending)
+metrics.value_gauge("hrcopilot_executor_max_queue", "Maximum number of pending tasks.", lambda: pool.max_queue)
+metrics.value_gauge("hrcopilot_log_pending_rows", "CSV log rows waiting to be written.", LOG_WRITER.pending)
+metrics.value_gauge("hrcopilot_memory_bytes", "Size of the memory store on disk.", main_agent.memory_bytes)
+metrics.METRICS.gauge(
+    "hrcopilot_memory_evicted_entries",
+    "Memory entries removed by the retention policy, per reason.",
+    lambda: [({"reason": r}, n) for r, n in main_agent.memory_stats().get("evicted_by", {}).items()],
+)
+metrics.value_gauge("hrcopilot_jobs_queued", "Asynchronous jobs waiting for a worker.", lambda: jobs.queued)
+metrics.value_gauge("hrcopilot_jobs_running", "Asynchronous jobs currently running.", lambda: jobs.running)
 
-    result = main_agent.absence.analyse(file=file, text=text, periode=periode)
+
+@app.exception_handler(ExecutorBusy)
+async def executor_busy(request: Request, exc: ExecutorBusy):
+    return JSONResponse(status_code=503, content={"error": "server bezet, probeer later opnieuw"})
+
+
+def cache_bypass(request: Request) -> bool:
+    """``Cache-Control: no-cache`` (of ``no-store``) slaat de resultaatcache over."""
+    header = request.headers.get("cache-control", "").lower()
+    return "no-cache" in header or "no-store" in header
+
+
+def output_response(media: str, payload) -> JSONResponse | StreamingResponse:
+    if media == JSON_MEDIA:
+        return JSONResponse(content=payload)
+    return StreamingResponse(BytesIO(payload), media_type=media)
+
+
+# De rapportfuncties hieronder worden zowel door de routes als door de
+# jobs (``/jobs/...``) gebruikt en geven ``(media_type, payload)`` terug.
+
+def upload_rapport(file, text, periode, formaat, use_cache=True):
+    result = main_agent.absence.analyse(
+        file=file, text=text, periode=periode, use_cache=use_cache
+    )
     if formaat == "pdf":
         markdown = (
             f"# Verzuimrapport\n"
@@ -31,38 +99,106 @@ async def upload_file(
             f"**Risico:** {result['risico']}\n"
             f"**Advies:** {result['advies']}\n"
         )
-        pdf_data = main_agent.absence.pdf(markdown)
-        return StreamingResponse(BytesIO(pdf_data), media_type="application/pdf")
+        return "application/pdf", main_agent.absence.pdf(markdown)
     if formaat == "grafiek":
-        fig = main_agent.absence.chart(result)
-        buf = BytesIO()
-        fig.savefig(buf, format="png")
-        buf.seek(0)
-        return StreamingResponse(buf, media_type="image/png")
-    return JSONResponse(content=result)
+        return "image/png", main_agent.absence.chart_png(result)
+    return JSON_MEDIA, result
+
+
+def batch_rapport(files, periode, use_cache=True):
+    return JSON_MEDIA, main_agent.absence.analyse_batch(files, periode, use_cache=use_cache)
+
+
+def spp_rapport(file, text, formaat):
+    media, data, _ = main_agent.analysis.analyse_spp(file, text, formaat)
+    return media, data
+
+
+@app.post("/upload/")
+async def upload_file(
+    request: Request,
+    file: UploadFile = File(None),
+    text: Optional[str] = Form(None),
+    periode: Optional[str] = None,
+    formaat: Optional[str] = "json",
+):
+    if file is None and text is None:
+        return JSONResponse(content={"status": "geen input"})
+
+    media, payload = await pool.run(
+        "upload", upload_rapport, file, text, periode, formaat, not cache_bypass(request)
+    )
+    return output_response(media, payload)
 
 
 @app.post("/batch_upload/")
-async def batch_upload(files: List[UploadFile] = File(...), periode: Optional[str] = None):
-    result = main_agent.absence.analyse_batch(files, periode)
-    return JSONResponse(content=result)
+async def batch_upload(
+    request: Request,
+    files: List[UploadFile] = File(...),
+    periode: Optional[str] = None,
+    stream: bool = False,
+):
+    use_cache = not cache_bypass(request)
+    if stream:
+        items = pool.iterate(
+            "batch_upload", main_agent.absence.iter_batch(files, periode, use_cache=use_cache)
+        )
+        # Het eerste resultaat vóór de response ophalen: een volle pool geeft
+        # dan nog een ``503`` in plaats van een afgebroken stream.
+        first = await anext(items, None)
+
+        async def lines():
+            if first is None:
+                return
+            yield json.dumps(first) + "\n"
+            async for item in items:
+                yield json.dumps(item) + "\n"
+
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+    media, payload = await pool.run("batch_upload", batch_rapport, files, periode, use_cache)
+    return output_response(media, payload)
 
 
 @app.post("/legalcheck/")
-async def upload_legal(file: UploadFile = File(None), text: Optional[str] = Form(None)):
-    result = main_agent.legal.analyse(file=file, text=text)
+async def upload_legal(
+    request: Request, file: UploadFile = File(None), text: Optional[str] = Form(None)
+):
+    result = await pool.run(
+        "legalcheck",
+        main_agent.legal.analyse,
+        file=file,
+        text=text,
+        use_cache=not cache_bypass(request),
+    )
     return JSONResponse(content=result)
 
 
 @app.post("/compliance/")
-async def compliance(file: UploadFile = File(None), text: Optional[str] = Form(None)):
-    result = main_agent.compliance.analyse(file=file, text=text)
+async def compliance(
+    request: Request, file: UploadFile = File(None), text: Optional[str] = Form(None)
+):
+    result = await pool.run(
+        "compliance",
+        main_agent.compliance.analyse,
+        file=file,
+        text=text,
+        use_cache=not cache_bypass(request),
+    )
     return JSONResponse(content=result)
 
 
 @app.post("/analyse/")
-async def analyse(file: UploadFile = File(...), vraag: str = "", formaat: str = "json"):
-    mime, data, result = main_agent.analysis.analyse(file, vraag, formaat)
+async def analyse(
+    request: Request, file: UploadFile = File(...), vraag: str = "", formaat: str = "json"
+):
+    mime, data, result = await pool.run(
+        "analyse",
+        main_agent.analysis.analyse,
+        file,
+        vraag,
+        formaat,
+        use_cache=not cache_bypass(request),
+    )
     if mime != "application/json":
         return StreamingResponse(BytesIO(data), media_type=mime)
     return JSONResponse(content=result)
@@ -70,17 +206,15 @@ async def analyse(file: UploadFile = File(...), vraag: str = "", formaat: str =
 
 @app.post("/spp/")
 async def spp(file: UploadFile = File(None), text: Optional[str] = Form(None), formaat: str = "excel"):
-    media, data, data_type = main_agent.analysis.analyse_spp(file, text, formaat)
-    if media == "application/json":
-        return JSONResponse(content=data)
-    return StreamingResponse(BytesIO(data), media_type=media)
+    media, payload = await pool.run("spp", spp_rapport, file, text, formaat)
+    return output_response(media, payload)
 
 
 @app.post("/feedback/")
 async def feedback(gebruiker: str = Form(...), bericht: str = Form(...)):
     if gebruiker != ADMIN_USER:
         return JSONResponse(status_code=403, content={"error": "alleen beheerder"})
-    result = main_agent.feedback.store(gebruiker, bericht)
+    result = await pool.run("feedback", main_agent.feedback.store, gebruiker, bericht)
     return JSONResponse(content=result)
 
 
@@ -88,12 +222,13 @@ async def feedback(gebruiker: str = Form(...), bericht: str = Form(...)):
 async def log(gebruiker: str = Form(...), actie: str = Form(...)):
     if gebruiker != ADMIN_USER:
         return JSONResponse(status_code=403, content={"error": "alleen beheerder"})
-    result = main_agent.feedback.log(gebruiker, actie)
+    result = await pool.run("log", main_agent.feedback.log, gebruiker, actie)
     return JSONResponse(content=result)
 
 
 @app.post("/auto/")
 async def auto_route(
+    request: Request,
     text: str = Form(""),
     file: UploadFile | None = File(None),
     vraag: str = Form(""),
@@ -104,8 +239,10 @@ async def auto_route(
     periode: str | None = Form(None),
     formaat: str = "json",
 ):
-    result = main_agent.auto_route(
+    # De passende agents draaien gelijktijdig, elk als taak in de pool.
+    result = await main_agent.auto_route_async(
         text,
+        run=lambda call: pool.run("auto", call),
         file=file,
         vraag=vraag,
         intern_beleid=intern_beleid,
@@ -115,5 +252,105 @@ async def auto_route(
         periode=periode,
         formaat=formaat,
         user=gebruiker,
+        use_cache=not cache_bypass(request),
     )
     return JSONResponse(content=result)
+
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    return PlainTextResponse(metrics.METRICS.render(), media_type=metrics.CONTENT_TYPE)
+
+
+# -- asynchrone jobs ---------------------------------------------------------
+# Langlopende analyses worden als job in de wachtrij gezet; de client haalt
+# met ``GET /jobs/{id}`` de status en met ``GET /jobs/{id}/result`` het
+# resultaat op. Uploads worden vóór het antwoord ingelezen, omdat FastAPI ze
+# na de request sluit.
+
+async def _read_uploads(files):
+    return [await pool.run("jobs", SharedUpload.from_upload, f) for f in files]
+
+
+def _input_bytes(*uploads) -> int:
+    return sum(upload.memory_bytes for upload in uploads if upload is not None)
+
+
+def _accepted(job_id: str) -> JSONResponse:
+    return JSONResponse(status_code=202, content=jobs.status(job_id))
+
+
+@app.post("/jobs/upload/")
+async def job_upload(
+    request: Request,
+    file: UploadFile = File(None),
+    text: Optional[str] = Form(None),
+    periode: Optional[str] = None,
+    formaat: str = "json",
+    prioriteit: int = 0,
+):
+    if file is None and text is None:
+        return JSONResponse(content={"status": "geen input"})
+    shared = (await _read_uploads([file]))[0] if file is not None else None
+    job_id = jobs.submit(
+        "upload", upload_rapport, shared, text, periode, formaat, not cache_bypass(request),
+        priority=prioriteit, nbytes=_input_bytes(shared),
+    )
+    return _accepted(job_id)
+
+
+@app.post("/jobs/batch_upload/")
+async def job_batch_upload(
+    request: Request,
+    files: List[UploadFile] = File(...),
+    periode: Optional[str] = None,
+    prioriteit: int = 0,
+):
+    shared = await _read_uploads(files)
+    job_id = jobs.submit(
+        "batch_upload", batch_rapport, shared, periode, not cache_bypass(request),
+        priority=prioriteit, nbytes=_input_bytes(*shared),
+    )
+    return _accepted(job_id)
+
+
+@app.post("/jobs/spp/")
+async def job_spp(
+    file: UploadFile = File(None),
+    text: Optional[str] = Form(None),
+    formaat: str = "excel",
+    prioriteit: int = 0,
+):
+    shared = (await _read_uploads([file]))[0] if file is not None else None
+    job_id = jobs.submit(
+        "spp", spp_rapport, shared, text, formaat, priority=prioriteit, nbytes=_input_bytes(shared)
+    )
+    return _accepted(job_id)
+
+
+def _job_not_found() -> JSONResponse:
+    return JSONResponse(status_code=404, content={"error": "onbekende of verlopen job"})
+
+
+@app.get("/jobs/{job_id}")
+async def job_status(job_id: str):
+    job = jobs.status(job_id)
+    return JSONResponse(content=job) if job is not None else _job_not_found()
+
+
+@app.get("/jobs/{job_id}/result")
+async def job_result(job_id: str):
+    job = jobs.status(job_id)
+    if job is None:
+        return _job_not_found()
+    output = jobs.result(job_id)
+    if output is None:
+        return JSONResponse(status_code=409, content=job)
+    media, data = output
+    return StreamingResponse(BytesIO(data), media_type=media)
+
+
+@app.delete("/jobs/{job_id}")
+async def job_cancel(job_id: str):
+    job = jobs.cancel(job_id)
+    return JSONResponse(content=job) if job is not None else _job_not_found()
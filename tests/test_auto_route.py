@@ -26,3 +26,80 @@ def test_auto_route_compliance_agent():
     assert response.status_code == 200
     data = response.json()
     assert "compliance" in data
+
+
+def test_auto_route_runs_agents_concurrently_with_dependencies(tmp_path, monkeypatch):
+    import time
+
+    from agents import MainAgent
+
+    agent = MainAgent(memory_path=tmp_path / "memory.jsonl")
+    seen = {}
+
+    def slow(name, delay):
+        def handle(*, context=None, **kw):
+            seen[name] = dict(context or {})
+            time.sleep(delay)
+            return {"agent": name}
+        return handle
+
+    monkeypatch.setattr(agent.absence, "handle", slow("absence", 0.3))
+    monkeypatch.setattr(agent.legal, "handle", slow("legal", 0.05))
+    monkeypatch.setattr(agent.compliance, "handle", slow("compliance", 0.3))
+    monkeypatch.setattr(agent.analysis, "handle", slow("analysis", 1.5))
+    monkeypatch.setattr(agent.analysis, "timeout", 0.5)
+
+    start = time.perf_counter()
+    result = agent.auto_route("verzuim en ontslag, privacy en data-analyse")
+    elapsed = time.perf_counter() - start
+
+    assert elapsed < 1.0
+    assert seen["legal"] == {"absence": {"agent": "absence"}}
+    assert result["compliance"] == {"agent": "compliance"}
+    assert result["analysis"]["status"] == "timeout"
+    assert result["timeouts"] == ["analysis"]
+
+
+def test_agent_timeout_excludes_queueing_and_holds_pool_slot(tmp_path, monkeypatch):
+    import asyncio
+    import time
+
+    from agents import MainAgent
+    from utils.executor import WorkerPool
+
+    agent = MainAgent(memory_path=tmp_path / "memory.jsonl")
+    pool = WorkerPool(threads=2, max_queue=0)
+
+    def handle(name, delay):
+        def run(*, pending_memory=None, **kw):
+            time.sleep(delay)
+            agent.absence.remember("anna", {name: "klaar"}, pending_memory)
+            return {"agent": name}
+        return run
+
+    # Twee threads: compliance wacht ~0.3s in de pool, maar draait zelf kort.
+    monkeypatch.setattr(agent.absence, "handle", handle("absence", 0.3))
+    monkeypatch.setattr(agent.compliance, "handle", handle("compliance", 0.1))
+    monkeypatch.setattr(agent.compliance, "timeout", 0.25)
+    monkeypatch.setattr(agent.analysis, "handle", handle("analysis", 0.6))
+    monkeypatch.setattr(agent.analysis, "timeout", 0.1)
+
+    async def scenario():
+        result = await agent.auto_route_async(
+            "verzuim, privacy en data-analyse", user="anna",
+            run=lambda call: pool.run("auto", call),
+        )
+        # De te late agent houdt zijn plek tot de thread klaar is.
+        still_running = pool.pending
+        await asyncio.sleep(0.8)
+        return result, still_running, pool.pending
+
+    result, still_running, after = asyncio.run(scenario())
+    pool.shutdown()
+
+    assert result["compliance"] == {"agent": "compliance"}
+    assert result["timeouts"] == ["analysis"]
+    assert still_running == 1 and after == 0
+    written = {key for entry in agent.memory.get("anna") for key in entry}
+    assert {"absence", "compliance", "input"} <= written
+    assert "analysis" not in written
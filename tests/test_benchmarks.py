@@ -0,0 +1,64 @@
+from benchmarks import corpus
+from benchmarks.routes import compare, percentile
+from utils.extraction import extract_bytes
+from utils.formats import read_table
+
+
+def test_corpus_inputs_are_parseable():
+    data = corpus.corpus("klein")
+    assert "ontslag" in data["brief"][1].decode() or "verzuim" in data["brief"][1].decode()
+    assert len(read_table(data["xlsx"][1], "personeel.xlsx")) == corpus.SIZES["klein"]["rijen"]
+    assert len(read_table(data["csv"][1], "personeel.csv")) == corpus.SIZES["klein"]["rijen"]
+    assert "Reorganisatie" in extract_bytes("presentatie.pptx", data["pptx"][1])
+
+
+def test_percentiles_and_baseline_comparison():
+    samples = list(range(1, 101))
+    assert (percentile(samples, 50), percentile(samples, 95), percentile(samples, 99)) == (50, 95, 99)
+
+    def report(p50):
+        return {"resultaten": [{"route": "/spp/", "invoer": "csv", "grootte": "klein",
+                                "p50_ms": p50, "p95_ms": p50}]}
+
+    baseline = report(100.0)
+    assert compare(report(110.0), baseline) == []
+    assert compare(report(4.0), report(2.0)) == []  # wel 2x, maar < 5 ms verschil
+    slower = report(200.0)
+    assert compare(slower, baseline)[0]["p50_ratio"] == 2.0
+    assert slower["resultaten"][0]["baseline"]["regressie"] is True
+
+
+def test_load_lag_delta_and_saturation():
+    from benchmarks.load import lag_delta, saturation
+    from utils.metrics import Histogram
+
+    lag = Histogram("hrcopilot_event_loop_lag_seconds", "lag", buckets=(0.001, 0.01, 0.1))
+    lag.observe(0.0005)
+    before = "\n".join(lag.collect())
+    for value in (0.0005, 0.005, 0.05):
+        lag.observe(value)
+    delta = lag_delta(before, "\n".join(lag.collect()))
+    assert delta == {"lag_gem_ms": 18.5, "lag_p99_ms": 100.0}
+
+    curve = [{"gelijktijdig": c, "doorvoer_rps": r} for c, r in ((1, 10), (2, 19), (4, 30), (8, 31))]
+    assert saturation(curve) == 4
+    assert saturation(curve[:3]) is None
+
+
+def test_loop_lag_monitor_observes_blocking():
+    import asyncio
+    import time
+
+    from utils.metrics import Histogram, monitor_loop_lag
+
+    lag = Histogram("lag", "lag", buckets=(0.01, 1.0))
+
+    async def scenario():
+        task = asyncio.create_task(monitor_loop_lag(0.01, lag))
+        await asyncio.sleep(0.02)
+        time.sleep(0.1)  # blokkeert de event loop
+        await asyncio.sleep(0.03)
+        task.cancel()
+
+    asyncio.run(scenario())
+    assert lag.count() >= 1 and lag.total() >= 0.05
@@ -0,0 +1,82 @@
+import gc
+import os
+
+from Agents.Analysisagent import analysis
+from benchmarks.routes import current_rss
+from utils.cache import LRUCache
+from utils.charts import ChartRenderer
+
+# Aantal ongecachete renders in de geheugentest. Standaard een korte run;
+# ``HRCOPILOT_SLOW_TESTS=1`` draait de volledige 10.000 (enkele minuten) en
+# ``HRCOPILOT_CHART_RENDERS`` zet het aantal expliciet.
+SLOW_TESTS = os.environ.get("HRCOPILOT_SLOW_TESTS", "0") not in ("", "0")
+CHART_RENDERS = int(
+    os.environ.get("HRCOPILOT_CHART_RENDERS", 10_000 if SLOW_TESTS else 50)
+)
+
+
+def _pyplot_figures():
+    import matplotlib.pyplot as plt
+
+    return len(plt.get_fignums())
+
+
+def test_genereer_grafiek_does_not_register_pyplot_figures():
+    before = _pyplot_figures()
+    fig = analysis.genereer_grafiek({"verzuimpercentage": 3.5, "branche_benchmark": {"waarde": 4.0}})
+    assert [p.get_height() for p in fig.axes[0].patches] == [3.5, 4.0]
+    assert _pyplot_figures() == before
+
+
+def test_chart_png_memory_regression_10k():
+    # Echte renders: geen cache en allemaal verschillende waarden, zodat elke
+    # aanroep de figuur bijwerkt en een PNG schrijft.
+    renderer = ChartRenderer(cache=LRUCache(max_entries=0))
+    for i in range(10):  # fonts, buffers en de sjabloonfiguur opbouwen
+        renderer.render([i / 10, 4.0])
+    figures = _live_figures()
+    gc.collect()
+    start = current_rss()
+    pngs = set()
+    for i in range(CHART_RENDERS):
+        png = renderer.render([2 + i / 1000, 4.0])
+        if i % 1000 == 0:
+            pngs.add(png)
+    gc.collect()
+    end = current_rss()
+    assert png.startswith(b"\x89PNG")
+    assert len(pngs) == len(range(0, CHART_RENDERS, 1000))
+    assert renderer.cache.stats()["entries"] == 0
+    assert _live_figures() == figures
+    assert _pyplot_figures() == 0
+    if start is not None:
+        assert end - start < 16 * 1024 * 1024
+
+
+def test_chart_png_cache_serves_repeated_inputs():
+    # Realistische invoer: analyse_verzuim levert 8 mogelijke percentages.
+    renderer = ChartRenderer()
+    pngs = [renderer.render([2 + (i % 8) * 0.5, 4.0]) for i in range(1000)]
+    stats = renderer.cache.stats()
+    assert (stats["entries"], stats["misses"], stats["hits"]) == (8, 8, 992)
+    assert pngs[8] is pngs[0] and pngs[1] is not pngs[0]
+
+    result = {"verzuimpercentage": 3.5, "branche_benchmark": {"waarde": 4.0}}
+    assert analysis.genereer_grafiek_png(result) is analysis.genereer_grafiek_png(result)
+
+
+def _live_figures():
+    from matplotlib.figure import Figure
+
+    gc.collect()
+    return sum(isinstance(o, Figure) for o in gc.get_objects())
+
+
+def test_uncached_renders_reuse_template_figure():
+    renderer = ChartRenderer(cache=LRUCache(max_entries=0))
+    renderer.render([0, 4.0])
+    before = _live_figures()
+    pngs = {renderer.render([i, 4.0]) for i in range(1, 30)}
+    assert _live_figures() == before
+    assert len(pngs) == 29
+    assert renderer.cache.stats()["entries"] == 0
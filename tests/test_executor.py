@@ -0,0 +1,116 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from utils.executor import WorkerPool, ExecutorBusy
+
+
+def test_run_executes_off_the_event_loop():
+    pool = WorkerPool(threads=2)
+
+    async def main():
+        loop_thread = threading.get_ident()
+        worker_thread = await pool.run("test", threading.get_ident)
+        return loop_thread, worker_thread
+
+    loop_thread, worker_thread = asyncio.run(main())
+    pool.shutdown()
+    assert loop_thread != worker_thread
+
+
+def test_max_queue_rejects_excess_work():
+    pool = WorkerPool(threads=1, max_queue=1)
+
+    async def main():
+        first = asyncio.ensure_future(pool.run("test", time.sleep, 0.1))
+        await asyncio.sleep(0)
+        with pytest.raises(ExecutorBusy):
+            await pool.run("test", time.sleep, 0)
+        await first
+
+    asyncio.run(main())
+    pool.shutdown()
+    assert pool.pending == 0
+
+
+def test_route_limit_serialises_calls():
+    pool = WorkerPool(threads=4, route_limits={"pdf": 1})
+    active = []
+    peak = []
+    lock = threading.Lock()
+
+    def work():
+        with lock:
+            active.append(1)
+            peak.append(len(active))
+        time.sleep(0.02)
+        with lock:
+            active.pop()
+
+    async def main():
+        await asyncio.gather(*(pool.run("pdf", work) for _ in range(4)))
+
+    asyncio.run(main())
+    pool.shutdown()
+    assert max(peak) == 1
+
+
+def test_bounded_map_limits_inflight_items():
+    from utils.executor import bounded_map
+
+    pulled = []
+
+    def items():
+        for i in range(20):
+            pulled.append(i)
+            yield i
+
+    results = bounded_map(lambda x: x * 2, items(), width=3, ordered=True)
+    first = next(results)
+    assert first == 0
+    assert len(pulled) <= 4
+    assert [first] + list(results) == [i * 2 for i in range(20)]
+
+
+def test_iterate_holds_one_slot_until_exhausted():
+    pool = WorkerPool(threads=2, max_queue=1)
+    threads = []
+
+    def items():
+        for i in range(3):
+            threads.append(threading.get_ident())
+            yield i
+
+    async def main():
+        results = []
+        async for item in pool.iterate("batch", items()):
+            assert pool.pending == 1
+            with pytest.raises(ExecutorBusy):
+                await pool.run("batch", time.sleep, 0)
+            results.append(item)
+        return results, threading.get_ident()
+
+    results, loop_thread = asyncio.run(main())
+    pool.shutdown()
+    assert results == [0, 1, 2]
+    assert loop_thread not in threads
+    assert pool.pending == 0
+
+
+def test_recommendations_are_deterministic_across_threads():
+    import sys
+
+    from Agents.Analysisagent.analysis import genereer_aanbevelingen
+    from utils.executor import bounded_map
+
+    risicos = ["matig", "hoog"] * 500
+    expected = [genereer_aanbevelingen(r) for r in risicos]
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        results = list(bounded_map(genereer_aanbevelingen, risicos, width=8, ordered=True))
+    finally:
+        sys.setswitchinterval(interval)
+    assert results == expected
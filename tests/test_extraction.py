@@ -0,0 +1,228 @@
+from io import BytesIO
+
+import pytest
+
+from fastapi import UploadFile
+
+from Agents.Complianceagent.compliance import compliance_check
+from Agents.Legalagent.legalcheck import legalcheck
+from utils import extraction
+from utils.cache import LRUCache
+
+
+def test_document_is_parsed_once_for_all_agents(monkeypatch):
+    calls = []
+    original = extraction._EXTRACTORS["plain"]
+
+    def counting(data):
+        calls.append(data)
+        return original(data)
+
+    monkeypatch.setitem(extraction._EXTRACTORS, "plain", counting)
+    body = b"Unieke tekst over ontslag en de AVG met privacy@voorbeeld.nl als contact."
+    upload = UploadFile(file=BytesIO(body), filename="beleid.txt")
+
+    legal = legalcheck(file=upload)
+    compliance = compliance_check(file=upload)
+
+    assert len(calls) == 1
+    assert "ontslag" in legal["herkenning_kernwoorden"]
+    assert "privacy@voorbeeld.nl" in compliance["gevonden_pii"]
+
+
+def test_lru_cache_evicts_by_size_and_counts():
+    cache = LRUCache(max_entries=10, max_bytes=10)
+    cache.set("a", "12345")
+    cache.set("b", "12345")
+    assert cache.get("a") == "12345"
+    cache.set("c", "123")
+    assert "b" not in cache
+    assert cache.get("b") is None
+    stats = cache.stats()
+    assert stats["evictions"] == 1
+    assert stats["hits"] == 1 and stats["misses"] == 1
+    assert stats["bytes"] == 8
+
+
+def _pdf_bytes(pages):
+    from matplotlib.backends.backend_pdf import PdfPages
+    from matplotlib.figure import Figure
+
+    buf = BytesIO()
+    with PdfPages(buf) as pdf:
+        for text in pages:
+            fig = Figure()
+            fig.text(0.1, 0.5, text)
+            pdf.savefig(fig)
+    return buf.getvalue()
+
+
+def test_pdf_is_extracted_page_by_page_with_cap():
+    data = _pdf_bytes(["Pagina over ontslag", "Pagina over verzuim", "Slotpagina"])
+    assert list(extraction.iter_pdf(data, max_pages=2)) == [
+        "Pagina over ontslag",
+        "Pagina over verzuim",
+    ]
+    assert list(extraction.iter_pdf(data, budget=0)) == []
+    assert "Slotpagina" in extraction.extract_bytes("brief.pdf", data)
+
+
+def test_docx_paragraphs_and_streaming_cache():
+    from docx import Document
+
+    document = Document()
+    document.add_paragraph("De vaststellingsovereenkomst is getekend.")
+    document.add_paragraph("Het concurrentiebeding blijft gelden.")
+    buf = BytesIO()
+    document.save(buf)
+    data = buf.getvalue()
+
+    blocks = list(extraction.iter_text("vso.docx", data))
+    assert blocks == [
+        "De vaststellingsovereenkomst is getekend.",
+        "Het concurrentiebeding blijft gelden.",
+    ]
+    key = ("docx", extraction.content_hash(data))
+    assert extraction.EXTRACTION_CACHE.get(key) == tuple(blocks)
+
+    result = legalcheck(file=UploadFile(file=BytesIO(data), filename="vso.docx"))
+    assert "concurrentiebeding" in result["herkenning_juridische_begrippen"]
+
+
+def test_large_csv_is_streamed_in_bounded_memory(monkeypatch, tmp_path):
+    import tracemalloc
+    from tempfile import SpooledTemporaryFile
+
+    import pandas  # noqa: F401  (importkosten niet meemeten)
+
+    monkeypatch.setattr(extraction, "STREAM_MIN_BYTES", 1024)
+    monkeypatch.setattr(extraction, "read_upload", lambda f: pytest.fail("niet streamend"))
+    spooled = SpooledTemporaryFile(max_size=1024, dir=tmp_path)
+    spooled.write(b"naam;email;notitie\n")
+    for i in range(150_000):
+        spooled.write(b"mw%d;mw%d@voorbeeld.nl;verzuim en privacy besproken\n" % (i, i))
+    size = spooled.tell()
+    spooled.seek(0)
+    upload = UploadFile(file=spooled, filename="export.csv")
+
+    tracemalloc.start()
+    result = compliance_check(file=upload)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    assert result["gevonden_termen"] == ["privacy"]
+    assert "mw0@voorbeeld.nl" in result["gevonden_pii"]
+    assert peak < size / 2
+    assert spooled.tell() == 0
+
+
+def test_msg_parsed_in_memory_with_attachments(monkeypatch):
+    from types import SimpleNamespace
+
+    opened = []
+
+    def message(source):
+        opened.append(source)
+        inner = SimpleNamespace(
+            subject="Doorgestuurd",
+            body="Bijgevoegd het concurrentiebeding.",
+            attachments=[SimpleNamespace(name="diep.txt", data=b"te diep genest")],
+        )
+        return SimpleNamespace(
+            subject="Dossier",
+            body="Zie bijlagen over ontslag.",
+            attachments=[
+                SimpleNamespace(name="notitie.txt", data=b"Notitie over de proeftijd."),
+                SimpleNamespace(name="groot.txt", data=b"x" * 64),
+                SimpleNamespace(name="Doorgestuurd.msg", data=inner),
+            ],
+            close=lambda: None,
+        )
+
+    monkeypatch.setattr(extraction, "extract_msg", SimpleNamespace(Message=message))
+    monkeypatch.setattr(extraction, "MSG_MAX_DEPTH", 1)
+    monkeypatch.setattr(extraction, "MSG_MAX_ATTACHMENT_BYTES", 32)
+
+    text = extraction.extract_bytes("mail.msg", b"in-memory msg bytes")
+
+    assert isinstance(opened[0], BytesIO)
+    assert "Zie bijlagen over ontslag." in text
+    assert "[Bijlage: notitie.txt]\nNotitie over de proeftijd." in text
+    assert "concurrentiebeding" in text
+    assert "xxxx" not in text
+    assert "te diep genest" not in text
+
+
+def test_blocks_are_parsed_once_and_corrupt_pdf_is_empty(monkeypatch):
+    import threading
+
+    calls = []
+    gate = threading.Event()
+
+    def slow_pdf(data):
+        calls.append(data)
+        gate.wait(1)
+        yield "Pagina over ontslag"
+
+    monkeypatch.setitem(extraction._STREAMERS, "pdf", slow_pdf)
+    data = b"%PDF-1.4 eenmalig"
+    results = []
+    readers = [
+        threading.Thread(target=lambda: results.append(list(extraction.iter_text("a.pdf", data))))
+        for _ in range(2)
+    ]
+    for reader in readers:
+        reader.start()
+    gate.set()
+    for reader in readers:
+        reader.join()
+    assert results == [["Pagina over ontslag"]] * 2
+    assert len(calls) == 1
+    assert extraction.extract_bytes("a.pdf", data) == "Pagina over ontslag"
+
+    monkeypatch.undo()
+    corrupt = b"%PDF-1.4 ontslag \x00\xff kapot"
+    assert extraction.extract_bytes("kapot.pdf", corrupt) == ""
+    assert list(extraction.iter_text("kapot.pdf", corrupt)) == []
+
+
+def test_pii_hit_on_first_page_stops_parsing(monkeypatch):
+    from Agents.Complianceagent import compliance
+
+    parsed = []
+
+    def pages(data):
+        for number in range(1, 11):
+            parsed.append(number)
+            yield f"Pagina {number}: contact via mw{number}@voorbeeld.nl\n" + "tekst " * 200
+
+    monkeypatch.setitem(extraction._STREAMERS, "pdf", pages)
+    monkeypatch.setattr(compliance, "MAX_PII_FINDINGS", 1)
+    data = b"%PDF-1.4 vroeg stoppen"
+    upload = UploadFile(file=BytesIO(data), filename="dossier.pdf")
+
+    result = compliance_check(file=upload)
+    assert result["gevonden_pii"] == ["mw1@voorbeeld.nl"]
+    # De scan kijkt één pagina vooruit; pagina 10 wordt nooit geparsed.
+    assert parsed == [1, 2]
+    key = ("pdf", extraction.content_hash(data))
+    assert extraction.EXTRACTION_CACHE.get(key) is None
+
+    # Een volledige lezing parset alles en vult daarna pas de cache.
+    assert len(list(extraction.iter_text("dossier.pdf", data))) == 10
+    assert len(extraction.EXTRACTION_CACHE.get(key)) == 10
+
+
+def test_cache_miss_streams_first_block_before_parsing_the_rest(monkeypatch):
+    parsed = []
+
+    def pages(data):
+        for number in range(1, 4):
+            parsed.append(number)
+            yield f"Pagina {number}"
+
+    monkeypatch.setitem(extraction._STREAMERS, "pdf", pages)
+    blocks = extraction.iter_text("lang.pdf", b"%PDF-1.4 live")
+    assert next(blocks) == "Pagina 1"
+    assert parsed == [1]
+    blocks.close()
@@ -0,0 +1,79 @@
+import csv
+
+from utils.file_utils import LogWriter
+
+
+def _rows(path):
+    with path.open(newline="") as f:
+        return list(csv.reader(f))
+
+
+def test_log_writer_buffers_until_flush(tmp_path):
+    path = tmp_path / "log.csv"
+    writer = LogWriter(flush_interval=60, flush_rows=1000)
+    writer.append(path, ["admin", "actie1"])
+    writer.append(path, ["admin", "actie2"])
+    assert writer.pending() == 2
+    writer.flush()
+    rows = _rows(path)
+    assert rows[0] == ["timestamp", "col1", "col2"]
+    assert [r[1:] for r in rows[1:]] == [["admin", "actie1"], ["admin", "actie2"]]
+    writer.close()
+
+
+def test_log_writer_flushes_in_background_on_row_count(tmp_path):
+    path = tmp_path / "log.csv"
+    writer = LogWriter(flush_interval=60, flush_rows=3)
+    for i in range(3):
+        writer.append(path, ["u", str(i)])
+    for _ in range(100):
+        if path.exists() and len(_rows(path)) == 4:
+            break
+        import time
+        time.sleep(0.01)
+    assert len(_rows(path)) == 4
+    writer.close()
+
+
+def test_log_writer_rotates_by_size(tmp_path):
+    path = tmp_path / "log.csv"
+    writer = LogWriter(flush_interval=60, max_bytes=200, backups=2)
+    for i in range(30):
+        writer.append(path, ["gebruiker", f"actie {i}"])
+        writer.flush()
+    assert path.with_name("log.csv.1").exists()
+    assert path.with_name("log.csv.2").exists()
+    assert not path.with_name("log.csv.3").exists()
+    assert _rows(path)[0][0] == "timestamp"
+    assert path.stat().st_size < 300
+    writer.close()
+
+
+def test_log_writer_keeps_rows_when_writing_fails(tmp_path, monkeypatch, caplog):
+    path = tmp_path / "log.csv"
+    writer = LogWriter(flush_interval=60, flush_rows=1000)
+    real_write = writer._write
+    failures = [OSError("schijf vol")]
+
+    def flaky(p, rows):
+        if failures:
+            raise failures.pop()
+        real_write(p, rows)
+
+    monkeypatch.setattr(writer, "_write", flaky)
+    writer.append(path, ["admin", "actie1"])
+    writer.flush()
+    assert not path.exists() and writer.pending() == 1
+    writer.append(path, ["admin", "actie2"])
+    writer.flush()
+    assert [r[1:] for r in _rows(path)[1:]] == [["admin", "actie1"], ["admin", "actie2"]]
+
+    # Blijft het mislukken, dan worden de regels na de tweede poging gelogd.
+    failures.extend([OSError("geen rechten")] * 2)
+    writer.append(path, ["admin", "actie3"])
+    writer.flush()
+    writer.flush()
+    dumped = [r for r in caplog.records if r.levelname == "ERROR" and "admin,actie3" in r.getMessage()]
+    assert dumped and dumped[0].name == "utils.file_utils"
+    assert writer.pending() == 0
+    writer.close()
@@ -0,0 +1,37 @@
+from io import BytesIO
+
+import pandas as pd
+
+from utils import extraction
+from utils.formats import OLE2_MAGIC, detect_format, read_table, sniff
+
+
+def _xlsx_bytes():
+    buf = BytesIO()
+    pd.DataFrame({"naam": ["Anna"], "prestatie": [3]}).to_excel(buf, index=False)
+    return buf.getvalue()
+
+
+def test_magic_bytes_decide_spreadsheet_format():
+    xlsx = _xlsx_bytes()
+    assert sniff(xlsx) == "xlsx"
+    assert detect_format("export.xls", xlsx) == "xlsx"
+    assert detect_format("export.xlsx", b"a,b\n1,2\n") == "csv"
+    assert detect_format("oud.xls", OLE2_MAGIC + b"\x00" * 16) == "xls"
+    assert detect_format("zonder_extensie", b"%PDF-1.4 ...") == "pdf"
+    # Voor documenttypen blijft de extensie leidend.
+    assert detect_format("mail.msg", b"binary") == "msg"
+
+
+def test_read_table_picks_parser_and_delimiter():
+    df = read_table(_xlsx_bytes(), "data.bin")
+    assert list(df.columns) == ["naam", "prestatie"]
+    df = read_table(b"naam;prestatie\nAnna;3\n", "nl.csv")
+    assert df.loc[0, "prestatie"] == 3
+    df = read_table(b"naam;prestatie\nAnna;3,5\n", "nl.csv")
+    assert df.loc[0, "prestatie"] == 3.5
+
+
+def test_sheet_extraction_keeps_empty_cells_out():
+    text = extraction.extract_bytes("lijst.csv", b"naam,afdeling\nAnna,\nBram,HR\n")
+    assert text.split() == ["Anna", "Bram", "HR"]
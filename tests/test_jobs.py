@@ -0,0 +1,153 @@
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+from fastapi.testclient import TestClient
+
+from main import app
+from utils.jobs import GEANNULEERD, KLAAR, MISLUKT, WACHTEND, JobQueue
+
+client = TestClient(app)
+
+
+def _wait(queue, job_id, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = queue.status(job_id)
+        if job is None or job["status"] not in (WACHTEND, "bezig"):
+            return job
+        time.sleep(0.01)
+    raise AssertionError("job niet afgerond")
+
+
+def test_priority_cancel_failure_and_expiry(tmp_path):
+    queue = JobQueue(path=str(tmp_path / "jobs.db"), workers=1, ttl=60)
+    gate = threading.Event()
+    order = []
+
+    def work(name):
+        order.append(name)
+        return "application/json", {"naam": name}
+
+    blocker = queue.submit("demo", lambda: (gate.wait(5), work("blokkeer"))[1])
+    while queue.running == 0:
+        time.sleep(0.01)
+    low = queue.submit("demo", work, "laag", priority=0)
+    high = queue.submit("demo", work, "hoog", priority=5)
+    cancelled = queue.submit("demo", work, "geannuleerd")
+    assert queue.status(low)["positie"] == 1
+    assert queue.cancel(cancelled)["status"] == GEANNULEERD
+    gate.set()
+
+    for job_id in (blocker, low, high):
+        assert _wait(queue, job_id)["status"] == KLAAR
+    assert order == ["blokkeer", "hoog", "laag"]
+    assert queue.result(high) == ("application/json", b'{"naam": "hoog"}')
+    assert queue.result(cancelled) is None
+
+    failed = queue.submit("demo", lambda: 1 / 0)
+    job = _wait(queue, failed)
+    assert job["status"] == MISLUKT and "ZeroDivisionError" in job["error"]
+
+    queue.ttl = -1  # afgeronde jobs verlopen direct
+    expired = queue.submit("demo", work, "kort")
+    time.sleep(0.2)
+    assert queue.status(expired) is None
+    queue.shutdown()
+
+    # Een herstart markeert jobs van een beëindigd proces als mislukt; jobs
+    # van een ander, nog draaiend proces (tweede worker) blijven staan.
+    gone = subprocess.Popen([sys.executable, "-c", "pass"])
+    gone.wait()
+    host = socket.gethostname()
+    restarted = JobQueue(path=str(tmp_path / "jobs.db"), workers=1, ttl=60)
+    restarted.store.create("oud", "demo", 0, time.time(), f"{host}:{gone.pid}:x")
+    restarted.store.create("ander", "demo", 0, time.time(), f"{host}:{os.getppid()}:y")
+    restarted._store = None
+    assert restarted.status("oud")["status"] == MISLUKT
+    assert restarted.status("ander")["status"] == WACHTEND
+    restarted.shutdown()
+
+
+def test_cancel_between_dequeue_and_start_stays_cancelled(tmp_path):
+    queue = JobQueue(path=str(tmp_path / "jobs.db"), workers=1, ttl=60)
+    original = queue._next
+    calls = []
+
+    def next_then_cancel():
+        item = original()
+        if item is not None and not calls:
+            calls.append("geannuleerd")
+            queue.cancel(item[0])
+        return item
+
+    queue._next = next_then_cancel
+    job_id = queue.submit("demo", lambda: calls.append("gestart") or ("application/json", {}))
+    deadline = time.time() + 5
+    while (not calls or queue.running) and time.time() < deadline:
+        time.sleep(0.01)
+    time.sleep(0.05)
+    assert calls == ["geannuleerd"]
+    assert queue.status(job_id)["status"] == GEANNULEERD
+    queue.shutdown()
+
+
+def test_cancel_from_another_worker_and_input_byte_limit(tmp_path):
+    import pytest
+
+    from utils.executor import ExecutorBusy
+
+    # Twee queues op één bestand, zoals twee uvicorn-workers.
+    path = str(tmp_path / "jobs.db")
+    owner = JobQueue(path=path, workers=1, ttl=60, max_pending_bytes=1000)
+    other = JobQueue(path=path, workers=1, ttl=60)
+    gate = threading.Event()
+    ran = []
+
+    def work(name):
+        ran.append(name)
+        return "application/json", {"naam": name}
+
+    running = owner.submit("demo", lambda: (gate.wait(5), work("lopend"))[1])
+    while owner.running == 0:
+        time.sleep(0.01)
+    waiting = owner.submit("demo", work, "wachtend", nbytes=600)
+    later = owner.submit("demo", work, "later")
+    assert other.status(later)["positie"] == 1
+    with pytest.raises(ExecutorBusy):
+        owner.submit("demo", work, "te groot", nbytes=600)
+
+    assert other.cancel(waiting)["status"] == GEANNULEERD
+    assert other.cancel(running)["status"] == GEANNULEERD
+    assert other.status(later)["positie"] == 0
+    gate.set()
+
+    assert _wait(owner, later)["status"] == KLAAR
+    assert ran == ["lopend", "later"]
+    assert owner.status(waiting)["status"] == GEANNULEERD
+    assert owner.status(running)["status"] == GEANNULEERD
+    assert owner.result(running) is None
+    # De invoer van de geannuleerde job telt niet meer mee zodra hij start.
+    assert owner.pending_bytes == 0
+    owner.shutdown()
+    other.shutdown()
+
+
+def test_job_routes_submit_poll_and_fetch_result():
+    csv = "medewerker,prestatie,potentieel\nA,hoog,hoog\nB,laag,laag\n"
+    response = client.post("/jobs/spp/?formaat=json", data={"text": csv})
+    assert response.status_code == 202
+    job_id = response.json()["id"]
+
+    deadline = time.time() + 5
+    while client.get(f"/jobs/{job_id}").json()["status"] != KLAAR:
+        assert time.time() < deadline
+        time.sleep(0.02)
+
+    result = client.get(f"/jobs/{job_id}/result")
+    assert result.headers["content-type"] == "application/json"
+    assert result.json()["grid"]["ster"] == 1
+    assert client.get("/jobs/onbekend").status_code == 404
@@ -0,0 +1,47 @@
+import random
+import re
+from collections import Counter
+
+from Agents.Legalagent import legalcheck
+from utils.scanner import TermScanner
+
+
+def _corpus(seed, n=400):
+    rng = random.Random(seed)
+    pieces = [
+        "ontslag", "collectief ontslag", "concurrentiebeding", "beding", "OVO",
+        "ziekteverzuim", "beëindiging", "de", "werknemer", "proeftijd",
+        "op staande voet", "brief", "verzuim", ",", ".", "\n",
+    ]
+    return " ".join(rng.choice(pieces) for _ in range(n))
+
+
+def test_scanner_matches_naive_lookup():
+    text = _corpus(1)
+    kern, begrippen = legalcheck.flexibele_begrippenherkenning(text)
+    assert kern == [w for w in legalcheck.KEYWORDS if w.lower() in text.lower()]
+    assert begrippen == [
+        b for b in legalcheck.ALGEMENE_JURIDISCHE_BEGRIPPEN if b.lower() in text.lower()
+    ]
+    scan = legalcheck.scan_tekst(text)
+    woorden = re.findall(r"[a-zA-Z]{4,}", text.lower())
+    assert scan.words == Counter(woorden)
+    assert scan.positions("ontslag") == [
+        m.start() for m in re.finditer("(?=ontslag)", text.lower())
+    ]
+
+
+def test_chunked_scan_equals_single_scan():
+    text = _corpus(2)
+    scanner = TermScanner(["collectief ontslag", "ontslag", "beding", "concurrentiebeding"])
+    whole = scanner.scan(text)
+    rng = random.Random(3)
+    session = scanner.session()
+    i = 0
+    while i < len(text):
+        step = rng.randint(1, 25)
+        session.feed(text[i:i + step])
+        i += step
+    session.finish()
+    assert session.hits == whole.hits
+    assert session.words == whole.words
@@ -1,5 +1,5 @@
 from agents import MainAgent
-from utils.memory import Memory
+from utils.memory import COMPACT_MIN_BYTES, Memory
 
 
 def test_memory_persistence(tmp_path):
@@ -15,3 +15,196 @@ def test_main_agent_stores_in_memory(tmp_path):
     agent = MainAgent(memory_path=path)
     agent.auto_route("Het ziekteverzuim neemt toe", user="tester")
     assert agent.memory.get("tester")
+
+
+def test_memory_append_only_log(tmp_path):
+    path = tmp_path / "mem.jsonl"
+    mem = Memory(path)
+    mem.add("a", {"n": 1})
+    mem.add("b", {"n": 2})
+    mem.add("a", {"n": 3})
+    assert [e["n"] for e in mem.get("a")] == [1, 3]
+    assert len(path.read_bytes().splitlines()) == 3
+    with path.open("ab") as f:
+        f.write(b'{"user": "a", "ent')
+    mem2 = Memory(path)
+    mem2.add("a", {"n": 4})
+    assert [e["n"] for e in mem2.get("a")] == [1, 3, 4]
+
+
+def test_memory_compact_and_index_reload(tmp_path):
+    path = tmp_path / "mem.jsonl"
+    mem = Memory(path)
+    for i in range(5):
+        mem.add("a" if i % 2 else "b", {"n": i})
+    mem.compact()
+    mem.add("a", {"n": 5})
+    mem.close()
+    reloaded = Memory(path)
+    assert [e["n"] for e in reloaded.get("a")] == [1, 3, 5]
+    assert [e["n"] for e in reloaded.get("b")] == [0, 2, 4]
+
+
+def test_memory_migrates_legacy_json(tmp_path):
+    path = tmp_path / "mem.json"
+    path.write_text('{"user": [{"timestamp": "t", "data": 1}]}')
+    mem = Memory(path)
+    assert mem.get("user") == [{"timestamp": "t", "data": 1}]
+    mem.add("user", {"data": 2})
+    assert [e["data"] for e in Memory(path).get("user")] == [1, 2]
+
+
+def test_memory_retention_limits_ttl_and_restart(tmp_path):
+    path = tmp_path / "mem.jsonl"
+    mem = Memory(path, max_entries=3, max_bytes=0, ttl=0, sweep_interval=0)
+    for i in range(5):
+        mem.add("a", {"n": i})
+    mem.add("b", {"n": 9})
+    assert [e["n"] for e in mem.get("a")] == [2, 3, 4]
+    assert mem.retention_stats()["evicted_by"] == {"entries": 2}
+
+    line = max(len(row) for row in path.read_bytes().splitlines(keepends=True))
+    mem.max_bytes = 2 * line
+    mem.add("a", {"n": 5})
+    assert [e["n"] for e in mem.get("a")] == [4, 5]
+    mem.close()
+
+    # Na een herstart blijven verwijderde regels weg, ook zonder compactie.
+    reloaded = Memory(path, max_entries=3, max_bytes=2 * line, ttl=0, sweep_interval=0)
+    assert [e["n"] for e in reloaded.get("a")] == [4, 5]
+
+    with path.open("ab") as f:
+        f.write(Memory._encode("c", {"timestamp": "2000-01-01T00:00:00", "n": 0}))
+    old = Memory(path, ttl=60, sweep_interval=0)
+    assert old.get("c") == [] and "c" not in old.users()
+    assert old.retention_stats()["evicted_by"]["ttl"] == 1
+
+
+def test_memory_background_sweeper(tmp_path):
+    import time
+
+    mem = Memory(tmp_path / "mem.jsonl", ttl=0.2, sweep_interval=0.05)
+    mem.add("a", {"n": 1})
+    deadline = time.time() + 3
+    while mem.get("a") and time.time() < deadline:
+        time.sleep(0.05)
+    assert mem.get("a") == []
+    assert mem.retention_stats()["evicted_entries"] == 1
+    mem.close()
+
+
+def test_memory_stores_shared_results_once(tmp_path):
+    path = tmp_path / "mem.jsonl"
+    mem = Memory(path, blob_min_bytes=64, ttl=0, sweep_interval=0)
+    result = {"risico": "hoog", "advies": "Voer een gesprek. " * 20, "bronnen": [["BW", "7:669"]]}
+    mem.add("a", {"legal_result": result})
+    mem.add("a", {"input": "ontslag", "output": {"legal": result}})
+    mem.add("b", {"legal_result": result})
+
+    raw = path.read_bytes()
+    assert raw.count(b"Voer een gesprek.") == 20
+    assert mem.get("a")[1]["output"]["legal"] == result
+    assert mem.get("b")[0]["legal_result"] == result
+    assert mem.retention_stats()["blobs"] == 1
+
+    # Na verwijderen van alle verwijzingen ruimt compactie de blob op.
+    mem.max_entries = 1
+    mem.add("a", {"n": 1})
+    mem.add("b", {"n": 2})
+    mem.compact()
+    assert b"Voer een gesprek." not in path.read_bytes()
+    mem.close()
+    assert Memory(path, ttl=0, sweep_interval=0).get("a")[0]["n"] == 1
+
+
+
+def test_memory_eviction_frees_blobs_and_compacts(tmp_path):
+    path = tmp_path / "mem.jsonl"
+    mem = Memory(path, max_entries=2, ttl=0, sweep_interval=0)
+    for i in range(3000):
+        mem.add("a", {"output": {"rapport": f"{i:05d}" + "x" * 5000}})
+    stats = mem.retention_stats()
+    assert stats["entries"] == 2 and stats["live_bytes"] > 2 * 5000
+    # Alleen de blobs van de laatste entries plus hooguit een compactiedrempel
+    # aan onbruikbare regels; zonder blobtelling groeide dit tot ~15 MB.
+    assert path.stat().st_size < 3 * COMPACT_MIN_BYTES
+    assert [e["output"]["rapport"][:5] for e in mem.get("a")] == ["02998", "02999"]
+
+    # ``max_bytes`` telt de blobs mee: twee entries van ~5 KB passen niet.
+    mem.max_entries = 0
+    mem.max_bytes = 8000
+    mem.add("a", {"output": {"rapport": "y" * 5000}})
+    assert len(mem.get("a")) == 1
+    mem.compact()
+    assert path.stat().st_size < 8000
+    mem.close()
+    assert Memory(path, ttl=0, sweep_interval=0).retention_stats()["blobs"] == 1
+
+
+def test_auto_route_memory_entries_reference_agent_results(tmp_path):
+    agent = MainAgent(memory_path=tmp_path / "mem.jsonl")
+    agent.auto_route("Het ziekteverzuim neemt toe en mogelijk ontslag", user="tester")
+    history = agent.memory.get("tester")
+    auto = history[-1]
+    assert auto["output"]["legal"] == next(e["legal_result"] for e in history if "legal_result" in e)
+    raw = (tmp_path / "mem.jsonl").read_text()
+    assert raw.count('"legal_markdown"') == 1
+
+
+
+def test_memory_retention_is_off_by_default(tmp_path):
+    path = tmp_path / "mem.jsonl"
+    with path.open("ab") as f:
+        f.write(Memory._encode("a", {"timestamp": "2000-01-01T00:00:00", "n": 0}))
+    mem = Memory(path)
+    for i in range(1, 1200):
+        mem.add("a", {"n": i})
+    assert len(mem.get("a")) == 1200
+    assert mem.retention_stats()["evicted_entries"] == 0
+    mem.close()
+
+
+def test_memory_instances_share_log_across_compaction(tmp_path):
+    path = tmp_path / "mem.jsonl"
+    a = Memory(path, ttl=0, sweep_interval=0)
+    b = Memory(path, ttl=0, sweep_interval=0)
+    a.add("u", {"n": 1})
+    b.add("u", {"n": 2})
+    assert [e["n"] for e in a.get("u")] == [1, 2]
+
+    a.max_entries = 1
+    a.add("u", {"n": 3})
+    a.compact()  # vervangt het bestand; b heeft nog een handle op het oude
+    a.max_entries = 0
+    b.add("u", {"n": 4})
+    assert [e["n"] for e in a.get("u")] == [3, 4]
+    assert [e["n"] for e in b.get("u")] == [3, 4]
+    assert [e["n"] for e in Memory(path, ttl=0, sweep_interval=0).get("u")] == [3, 4]
+    a.close()
+    b.close()
+
+
+def _add_many(path, name, count):
+    mem = Memory(path, ttl=0, sweep_interval=0)
+    for i in range(count):
+        mem.add(name, {"n": i, "tekst": "x" * 200})
+        if i % 10 == 0:
+            mem.compact()
+    mem.close()
+
+
+def test_memory_concurrent_processes_with_compaction(tmp_path):
+    import multiprocessing
+
+    path = tmp_path / "mem.jsonl"
+    ctx = multiprocessing.get_context("spawn")
+    workers = [ctx.Process(target=_add_many, args=(path, f"w{i}", 40)) for i in range(3)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(60)
+        assert worker.exitcode == 0
+    mem = Memory(path, ttl=0, sweep_interval=0)
+    assert {u: [e["n"] for e in mem.get(u)] for u in mem.users()} == {
+        f"w{i}": list(range(40)) for i in range(3)
+    }
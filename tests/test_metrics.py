@@ -0,0 +1,49 @@
+import time
+
+from fastapi.testclient import TestClient
+
+from main import app
+from utils.metrics import Registry, stage, timed_blocks, STAGE_SECONDS
+
+client = TestClient(app)
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = Registry()
+    histogram = registry.histogram("demo_seconds", "Demo.", ("route",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 5):
+        histogram.observe(value, "/x/")
+    text = registry.render()
+    assert "# TYPE demo_seconds histogram" in text
+    assert 'demo_seconds_bucket{route="/x/",le="0.1"} 1' in text
+    assert 'demo_seconds_bucket{route="/x/",le="1"} 2' in text
+    assert 'demo_seconds_bucket{route="/x/",le="+Inf"} 3' in text
+    assert 'demo_seconds_count{route="/x/"} 3' in text
+
+
+def test_stage_excludes_time_spent_in_source():
+    def slow_source():
+        time.sleep(0.2)
+        yield "blok"
+
+    blocks = timed_blocks(slow_source(), "demo", "extractie")
+    with stage("demo", "scan", exclude=blocks):
+        list(blocks)
+    assert STAGE_SECONDS.total("demo", "extractie") >= 0.2
+    assert STAGE_SECONDS.total("demo", "scan") < 0.1
+
+
+def test_metrics_endpoint_reports_routes_agents_stages_and_gauges():
+    client.post("/legalcheck/", data={"text": "Ontslag op staande voet wegens verzuim"})
+    client.post("/auto/", data={"text": "Het ziekteverzuim neemt toe en mogelijk ontslag"})
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    text = response.text
+    assert 'hrcopilot_request_seconds_count{route="/legalcheck/",method="POST",status="200"}' in text
+    assert 'hrcopilot_agent_seconds_count{agent="absence"}' in text
+    assert 'hrcopilot_stage_seconds_count{component="legalcheck",stage="scan"}' in text
+    assert 'hrcopilot_cache_entries{cache="resultaat"}' in text
+    assert "hrcopilot_executor_pending 0" in text
+    assert "hrcopilot_memory_bytes " in text
@@ -0,0 +1,39 @@
+import random
+
+from Agents.Complianceagent.compliance import compliance_check
+from Agents.Complianceagent.pii import PIIDetector, chunks, detect_pii_details, elfproef
+
+
+def test_detects_categories_and_validates_bsn():
+    text = (
+        "Mail jan.jansen@example.nl of bel 06-12345678. BSN 111222333, "
+        "rekening NL91 ABNA 0417 1643 00, personeelsnummer 123456789."
+    )
+    details = detect_pii_details(text)
+    assert details["email"] == ["jan.jansen@example.nl"]
+    assert details["telefoon"] == ["06-12345678"]
+    assert details["bsn"] == ["111222333"]
+    assert details["iban"] == ["NL91 ABNA 0417 1643 00"]
+    assert details["nummer"] == ["123456789"]
+    assert elfproef("111222333") and not elfproef("123456789")
+
+
+def test_chunked_scan_matches_single_pass():
+    rng = random.Random(7)
+    parts = ["a.b@voorbeeld.nl", "0612345678", "111222333", "NL91ABNA0417164300", "tekst", "12345678"]
+    text = " ".join(rng.choice(parts) + str(rng.randint(0, 99)) for _ in range(5000))
+    whole = PIIDetector().scan([text])
+    for size in (5, 333, 4096):
+        assert PIIDetector().scan(chunks(text, size)) == whole
+
+
+def test_max_findings_stops_early():
+    text = " ".join(f"persoon{i}@voorbeeld.nl" for i in range(1000))
+    details = PIIDetector(max_findings=10).scan(chunks(text, 100))
+    assert sum(len(v) for v in details.values()) == 10
+
+
+def test_compliance_check_reports_pii_categories():
+    result = compliance_check(text="Privacy: stuur naar hr@voorbeeld.nl, BSN 111222333")
+    assert result["pii_categorieen"] == {"email": ["hr@voorbeeld.nl"], "bsn": ["111222333"]}
+    assert "privacy" in result["gevonden_termen"]
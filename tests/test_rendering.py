@@ -0,0 +1,58 @@
+import os
+from pathlib import Path
+
+from utils.rendering import PDFRenderer
+
+
+def test_renderer_caches_by_markdown():
+    calls = []
+
+    def fake_render(markdown):
+        calls.append(markdown)
+        return markdown.encode()
+
+    renderer = PDFRenderer(workers=0, render_func=fake_render, initializer=None)
+    first = renderer.submit("# Rapport")
+    assert first.result() == b"# Rapport"
+    assert renderer.render("# Rapport") == b"# Rapport"
+    assert renderer.render("# Ander rapport") == b"# Ander rapport"
+    assert calls == ["# Rapport", "# Ander rapport"]
+    assert renderer.cache.stats()["hits"] == 1
+
+
+def test_renderer_runs_in_worker_process():
+    renderer = PDFRenderer(workers=1, render_func=str.encode, initializer=None)
+    try:
+        renderer.warm_up()
+        futures = [renderer.submit(f"rapport {i}") for i in range(3)]
+        assert [f.result(timeout=30) for f in futures] == [
+            b"rapport 0",
+            b"rapport 1",
+            b"rapport 2",
+        ]
+    finally:
+        renderer.shutdown()
+
+
+def _crash_once(markdown):
+    # Eerste aanroep: de worker sterft zoals bij een OOM-kill.
+    marker = Path(markdown)
+    if not marker.exists():
+        marker.touch()
+        os._exit(1)
+    return b"pdf"
+
+
+def test_renderer_rebuilds_broken_pool_and_retries(tmp_path):
+    renderer = PDFRenderer(workers=1, render_func=_crash_once, initializer=None)
+    try:
+        renderer.warm_up()
+        broken = renderer._pool
+        assert renderer.render(str(tmp_path / "crash")) == b"pdf"
+        assert renderer._pool is not broken
+        # De nieuwe pool blijft gewoon bruikbaar.
+        (tmp_path / "heel").touch()
+        assert renderer.render(str(tmp_path / "heel")) == b"pdf"
+        assert renderer.cache.stats()["entries"] == 2
+    finally:
+        renderer.shutdown()
@@ -0,0 +1,80 @@
+from fastapi.testclient import TestClient
+
+import agents
+from main import app
+from utils.results import RESULT_CACHE, RULESET_VERSION, ResultCache, SQLiteStore, result_key
+
+client = TestClient(app)
+
+
+def test_memory_and_sqlite_tiers_with_ttl(tmp_path):
+    store = SQLiteStore(str(tmp_path / "results.db"))
+    cache = ResultCache(store=store, ttl=60, enabled=True)
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return {"risico": "laag", "bronnen": [("a", "b")]}
+
+    key = result_key("legal", {"sha256": "abc"})
+    first = cache.get_or_compute(key, compute)
+    first["risico"] = "gewijzigd"
+    assert cache.get_or_compute(key, compute)["risico"] == "laag"
+
+    # Nieuwe cache op hetzelfde bestand: treffer uit de SQLite-laag.
+    warm = ResultCache(store=SQLiteStore(str(tmp_path / "results.db")), ttl=60, enabled=True)
+    assert warm.get(key)["bronnen"] == [["a", "b"]]
+    assert warm.stats()["hits_store"] == 1
+    assert len(calls) == 1
+
+    cache.ttl = -1  # direct verlopen
+    cache.set(key, {"risico": "oud"})
+    assert cache.get(key) is None
+    assert cache.stats()["expired"] == 1
+    assert result_key("legal", {"sha256": "abc"}, version=RULESET_VERSION + "-nieuw") != key
+
+
+def test_routes_reuse_results_and_honour_bypass(monkeypatch):
+    calls = []
+    original = agents.compliance_check
+
+    def counting(**kwargs):
+        calls.append(kwargs)
+        return original(**kwargs)
+
+    monkeypatch.setattr(agents, "compliance_check", counting)
+    RESULT_CACHE.clear()
+    files = {"file": ("beleid.txt", b"Privacybeleid met contact dpo@voorbeeld.nl", "text/plain")}
+
+    for _ in range(3):
+        response = client.post("/compliance/", files=files)
+        assert response.json()["gevonden_pii"] == ["dpo@voorbeeld.nl"]
+    assert len(calls) == 1
+
+    client.post("/compliance/", files=files, headers={"Cache-Control": "no-cache"})
+    assert len(calls) == 2
+    stats = RESULT_CACHE.stats()
+    assert stats["hits_memory"] == 2 and stats["bypasses"] == 1
+
+
+def test_cached_batch_results_match_sequential_analysis(tmp_path):
+    import sys
+    from io import BytesIO
+
+    from fastapi import UploadFile
+
+    from Agents.Analysisagent.analysis import analyse_verzuim
+
+    bestanden = [(f"verzuim{i}.txt", b"x" * (i + 1)) for i in range(200)]
+    expected = [analyse_verzuim(name, data, periode="2024Q1") for name, data in bestanden]
+    absence = agents.MainAgent(memory_path=tmp_path / "mem.jsonl").absence
+    RESULT_CACHE.clear()
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        for _ in range(2):  # eerst berekend (parallel), daarna uit de cache
+            uploads = [UploadFile(file=BytesIO(data), filename=name) for name, data in bestanden]
+            assert absence.analyse_batch(uploads, periode="2024Q1") == expected
+    finally:
+        sys.setswitchinterval(interval)
+    assert RESULT_CACHE.stats()["hits_memory"] >= len(bestanden)
@@ -59,14 +59,14 @@ def test_legalcheck_route_with_keywords(tmp_path):
 
 def test_legalcheck_accepts_msg_file(monkeypatch):
     from types import SimpleNamespace
-    from Agents.Legalagent import legalcheck
+    from utils import extraction
 
     class DummyMsg:
         def __init__(self, path):
             self.subject = "Test"
             self.body = "Dit bericht noemt ontslag en is lang genoeg."
 
-    monkeypatch.setattr(legalcheck, "extract_msg", SimpleNamespace(Message=DummyMsg))
+    monkeypatch.setattr(extraction, "extract_msg", SimpleNamespace(Message=DummyMsg))
     response = client.post(
         "/legalcheck/",
         files={"file": ("dummy.msg", b"binary", "application/vnd.ms-outlook")},
@@ -133,3 +133,24 @@ def test_compliance_route_detects_terms():
     assert "privacy" in data["gevonden_termen"] or "avg" in data["gevonden_termen"]
     assert data["gevonden_pii"]
 
+
+
+def test_batch_upload_stream_returns_ndjson():
+    import json
+
+    files = [("files", (f"dummy{i}.txt", f"data{i}".encode(), "text/plain")) for i in range(5)]
+    files.append(("files", ("leeg.txt", b"", "text/plain")))
+    response = client.post("/batch_upload/?stream=true", files=files)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    items = [json.loads(line) for line in response.text.splitlines()]
+    assert sorted(i["filename"] for i in items) == [f"dummy{i}.txt" for i in range(5)]
+
+
+def test_batch_upload_stream_respects_queue_limit(monkeypatch):
+    import main
+
+    monkeypatch.setattr(main.pool, "_pending", main.pool.max_queue)
+    files = [("files", ("dummy.txt", b"data", "text/plain"))]
+    response = client.post("/batch_upload/?stream=true", files=files)
+    assert response.status_code == 503
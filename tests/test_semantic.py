@@ -18,3 +18,38 @@ def test_detects_compliance_agent():
     text = "Ons privacybeleid moet voldoen aan de AVG regels"
     result = agent.detect_agent(text)
     assert result is agent.compliance
+
+
+def test_trigger_index_matches_all_groups_in_one_pass():
+    from utils import TriggerIndex
+
+    index = TriggerIndex({"a": {"log"}, "b": {"logging", "data breach"}, "c": {"data"}})
+    assert index.matches("Het LOGGING van een Data Breach") == {"a", "b", "c"}
+    assert index.matches("logboek") == {"a"}
+    assert index.matches("niets") == set()
+
+
+def test_matching_agents_agrees_with_match_terms():
+    agent = MainAgent()
+    text = "Feedback over ontslag, verzuim en de AVG in dit rapport"
+    expected = [a for a in agent.agents if a.match_terms(text)]
+    assert agent.matching_agents(text) == expected
+    assert len(expected) == 5
+
+
+def test_trigger_index_scans_each_text_once(monkeypatch):
+    from utils import TRIGGER_INDEX, TriggerIndex
+
+    index = TriggerIndex({"x": {"ab"}, "y": {"bc"}, "z": {"abcd", "a"}})
+    # Overlappende en in elkaar liggende triggers tellen allemaal mee.
+    assert index.matches("ABC") == {"x", "y", "z"}
+    assert index.matched_terms("abcd") == {"a", "ab", "bc", "abcd"}
+
+    scans = []
+    original = TRIGGER_INDEX._scan
+    monkeypatch.setattr(TRIGGER_INDEX, "_scan", lambda *a, **k: scans.append(1) or original(*a, **k))
+    agent = MainAgent()
+    text = "Een nieuwe tekst over verzuim en de AVG " * 1000
+    agent.matching_agents(text)
+    assert [a.name for a in agent.agents if a.match_terms(text)] == ["absence", "compliance"]
+    assert len(scans) == 1
@@ -0,0 +1,56 @@
+from Agents.Analysisagent import spp
+from Agents.Analysisagent.analysis import analyse_spp
+
+
+def test_row_level_labels_and_members():
+    csv = (
+        "Medewerker,Prestatie,Potentieel\n"
+        "Anna,hoog,hoog\n"
+        "Bram,laag,laag\n"
+        "Cees,normaal,Hoog\n"
+        "Dirk,onbekend,laag\n"
+    )
+    data = analyse_spp(text=csv)
+    assert data["grid"]["ster"] == 1
+    assert data["grid"]["onderpresteerder"] == 1
+    assert data["grid"]["talent"] == 1
+    assert data["leden"]["ster"] == ["Anna"]
+    assert data["leden"]["talent"] == ["Cees"]
+    assert data["leden"]["topper"] == []
+    assert data["ongeclassificeerd"] == 1
+
+
+def test_row_level_numeric_scales():
+    csv = "naam,performance score,potential (1-5)\nA,5,1\nB,3,3\nC,1,5\n"
+    data = analyse_spp(text=csv)
+    assert data["leden"]["specialist"] == ["A"]
+    assert data["leden"]["professional"] == ["B"]
+    assert data["leden"]["starter"] == ["C"]
+
+    # Dezelfde score valt in dezelfde cel, ongeacht de andere rijen.
+    alleen_drieen = analyse_spp(text="naam,prestatie,potentieel\nB,3,3\n")
+    assert alleen_drieen["leden"]["professional"] == ["B"]
+
+    # Nederlandse export: ``;`` als scheidingsteken en komma als decimaal.
+    komma = analyse_spp(text="naam;prestatie;potentieel\nB;3,5;2\n")
+    assert komma["ongeclassificeerd"] == 0
+    assert sum(len(leden) for leden in komma["leden"].values()) == 1
+
+
+def test_numeric_score_boundaries_are_configurable():
+    import pandas as pd
+
+    scores = pd.Series([2, 5, 8])
+    assert spp.niveaus(scores).tolist() == [0, 2, 2]
+    assert spp.niveaus(scores, (4.5, 7.5)).tolist() == [0, 1, 2]
+    assert spp._parse_grenzen("7.5,4.5") == (4.5, 7.5)
+
+
+def test_column_mapping_cached_per_header():
+    spp.kolom_mapping.cache_clear()
+    header = ("Medewerker", "Prestatie", "Potentieel")
+    first = spp.kolom_mapping(header)
+    assert spp.kolom_mapping(header) is first
+    assert spp.kolom_mapping.cache_info().hits == 1
+    assert first["modus"] == "rij"
+    assert spp.kolom_mapping(("laag_potentieel_lage_prestatie",))["modus"] == "grid"
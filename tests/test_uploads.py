@@ -0,0 +1,91 @@
+from io import BytesIO
+
+import pytest
+
+from fastapi import FastAPI, File, UploadFile
+from fastapi.testclient import TestClient
+
+from utils.extraction import read_upload
+from utils.uploads import SharedUpload, UploadLimitMiddleware
+
+
+def _limited_client():
+    app = FastAPI()
+    app.add_middleware(UploadLimitMiddleware, max_bytes=0, route_limits={"klein": 1000})
+
+    @app.post("/klein/")
+    async def klein(file: UploadFile = File(...)):
+        return {"grootte": len(await file.read())}
+
+    @app.post("/vrij/")
+    async def vrij(file: UploadFile = File(...)):
+        return {"grootte": len(await file.read())}
+
+    return TestClient(app)
+
+
+def test_route_limit_rejects_large_uploads():
+    client = _limited_client()
+    small = {"file": ("a.txt", b"x" * 100, "text/plain")}
+    large = {"file": ("a.txt", b"x" * 5000, "text/plain")}
+    assert client.post("/klein/", files=small).json() == {"grootte": 100}
+    response = client.post("/klein/", files=large)
+    assert response.status_code == 413
+    assert client.post("/vrij/", files=large).status_code == 200
+
+
+def test_limit_enforced_while_streaming_without_content_length():
+    client = _limited_client()
+
+    def body():
+        yield (
+            b'--grens\r\nContent-Disposition: form-data; name="file"; filename="a.txt"\r\n'
+            b"Content-Type: text/plain\r\n\r\n"
+        )
+        for _ in range(10):
+            yield b"x" * 500
+        yield b"\r\n--grens--\r\n"
+
+    headers = {"content-type": "multipart/form-data; boundary=grens"}
+    response = client.post("/klein/", content=body(), headers=headers)
+    assert "content-length" not in response.request.headers
+    assert response.status_code == 413
+
+
+def test_shared_upload_is_read_once_and_not_copied():
+    source = BytesIO(b"verzuim en ontslag" * 10)
+    shared = SharedUpload.from_upload(UploadFile(file=source, filename="dossier.txt"))
+    assert source.tell() == 0
+    assert read_upload(shared) is shared.data
+    assert shared.view.obj is shared.data
+    first, second = shared.file, shared.file
+    first.read(5)
+    assert second.read(7) == b"verzuim"
+
+
+def test_large_upload_shares_the_spooled_file(monkeypatch, tmp_path):
+    from tempfile import SpooledTemporaryFile
+
+    from Agents.Complianceagent.compliance import compliance_check
+    from utils import extraction, uploads
+
+    monkeypatch.setattr(uploads, "STREAM_MIN_BYTES", 1024)
+    monkeypatch.setattr(extraction, "STREAM_MIN_BYTES", 1024)
+    monkeypatch.setattr(extraction, "read_upload", lambda f: pytest.fail("niet streamend"))
+    spooled = SpooledTemporaryFile(max_size=1024, dir=tmp_path)
+    spooled.write(b"naam;email\n")
+    for i in range(2000):
+        spooled.write(b"mw%d;mw%d@voorbeeld.nl privacy\n" % (i, i))
+    size = spooled.tell()
+    spooled.seek(0)
+    shared = SharedUpload.from_upload(UploadFile(file=spooled, filename="export.csv"))
+    spooled.close()  # zoals FastAPI na de request
+
+    assert not shared.in_memory
+    first, second = shared.file, shared.file
+    assert first.read(11) == b"naam;email\n"
+    assert second.read(4) == b"naam"
+    assert shared.size == size
+    result = compliance_check(file=shared)
+    assert "mw0@voorbeeld.nl" in result["gevonden_pii"]
+    assert shared._data is None
@@ -1,3 +1,3 @@
-from .text_utils import text_matches
+from .text_utils import text_matches, TriggerIndex, TRIGGER_INDEX
 from .memory import Memory
 from .n8n import format_payload
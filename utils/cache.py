@@ -0,0 +1,123 @@
+"""Kleine, thread-safe LRU-cache met een limiet op aantal items en bytes."""
+from __future__ import annotations
+
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+def content_hash(data: bytes | bytearray | memoryview) -> str:
+    """Return the SHA-256 hex digest used as cache key for document contents."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def file_hash(fileobj, block_size: int = 1024 * 1024) -> str:
+    """SHA-256 of a binary file object, read in blocks and rewound afterwards."""
+    digest = hashlib.sha256()
+    fileobj.seek(0)
+    try:
+        for block in iter(lambda: fileobj.read(block_size), b""):
+            digest.update(block)
+    finally:
+        fileobj.seek(0)
+    return digest.hexdigest()
+
+
+class LRUCache:
+    """Least-recently-used cache bounded by entry count and total size.
+
+    ``sizeof`` bepaalt de grootte van een waarde (standaard ``len``). Hits,
+    misses en evictions worden bijgehouden en zijn op te vragen met
+    :meth:`stats`. Met :meth:`get_or_compute` wordt een waarde per sleutel
+    maar één keer berekend, ook als meerdere threads tegelijk vragen.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 128,
+        max_bytes: int = 64 * 1024 * 1024,
+        sizeof: Callable[[Any], int] = len,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self._data: "OrderedDict[Hashable, tuple[Any, int]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._inflight: Dict[Hashable, threading.Lock] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._data
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        size = self.sizeof(value)
+        with self._lock:
+            if key in self._data:
+                self._bytes -= self._data.pop(key)[1]
+            if size > self.max_bytes:
+                return
+            self._data[key] = (value, size)
+            self._bytes += size
+            while self._data and (
+                len(self._data) > self.max_entries or self._bytes > self.max_bytes
+            ):
+                _, (_, old_size) = self._data.popitem(last=False)
+                self._bytes -= old_size
+                self.evictions += 1
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """Return the cached value for ``key`` or compute and store it once."""
+        sentinel = object()
+        value = self.get(key, sentinel)
+        if value is not sentinel:
+            return value
+        with self._lock:
+            key_lock = self._inflight.setdefault(key, threading.Lock())
+        with key_lock:
+            with self._lock:
+                item = self._data.get(key)
+                if item is not None:
+                    self._data.move_to_end(key)
+                    return item[0]
+            try:
+                value = compute()
+                self.set(key, value)
+            finally:
+                with self._lock:
+                    self._inflight.pop(key, None)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> Dict[str, Optional[float]]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._data),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": self.hits / total if total else None,
+            }
@@ -0,0 +1,71 @@
+"""Grafieken renderen zonder pyplot: Agg-backend, herbruikbare figuren en cache."""
+from __future__ import annotations
+
+import threading
+from io import BytesIO
+from typing import TYPE_CHECKING, Sequence, Tuple
+
+from .cache import LRUCache
+
+if TYPE_CHECKING:
+    from matplotlib.figure import Figure
+
+CHART_LABELS = ("Intern", "Benchmark")
+CHART_TITLE = "Verzuim vs Benchmark"
+
+
+def bar_figure(values: Sequence[float], labels: Sequence[str] = CHART_LABELS, title: str = CHART_TITLE) -> Figure:
+    """Return a standalone bar chart ``Figure`` (not registered in pyplot)."""
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    fig = Figure()
+    FigureCanvasAgg(fig)
+    ax = fig.subplots()
+    ax.bar(list(labels), list(values))
+    ax.set_title(title)
+    return fig
+
+
+class ChartRenderer:
+    """Render bar charts to PNG, reusing one template figure per thread.
+
+    Alleen de hoogte van de staven en de as worden per aanroep aangepast, dus
+    er worden geen nieuwe ``Figure``-objecten aangemaakt en er blijft niets
+    achter in de globale toestand van pyplot. PNG's worden gecachet op basis
+    van de invoerwaarden; ``render`` is veilig vanuit meerdere threads.
+    """
+
+    def __init__(self, labels: Sequence[str] = CHART_LABELS, title: str = CHART_TITLE, cache: LRUCache | None = None):
+        self.labels = tuple(labels)
+        self.title = title
+        self.cache = cache if cache is not None else LRUCache(max_entries=1024, max_bytes=16 * 1024 * 1024)
+        self._local = threading.local()
+
+    def _template(self) -> Tuple[Figure, list]:
+        template = getattr(self._local, "template", None)
+        if template is None:
+            fig = bar_figure([0] * len(self.labels), self.labels, self.title)
+            bars = list(fig.axes[0].patches)
+            template = self._local.template = (fig, bars)
+        return template
+
+    def render(self, values: Sequence[float]) -> bytes:
+        key = tuple(float(v) for v in values)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+        fig, bars = self._template()
+        ax = fig.axes[0]
+        for bar, value in zip(bars, key):
+            bar.set_height(value)
+        ax.relim()
+        ax.autoscale_view()
+        buf = BytesIO()
+        fig.canvas.print_png(buf)
+        png = buf.getvalue()
+        self.cache.set(key, png)
+        return png
+
+
+CHART_RENDERER = ChartRenderer()
@@ -0,0 +1,192 @@
+"""Executorlaag om blokkerend werk buiten de event loop uit te voeren."""
+from __future__ import annotations
+
+import asyncio
+import os
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from functools import partial
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, Iterator, Optional, TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+def _parse_limits(spec: str) -> Dict[str, int]:
+    """Parse ``"upload=4,batch_upload=1"`` into a mapping."""
+    limits: Dict[str, int] = {}
+    for part in spec.split(","):
+        if "=" not in part:
+            continue
+        route, value = part.split("=", 1)
+        try:
+            limits[route.strip()] = int(value)
+        except ValueError:
+            continue
+    return limits
+
+
+CPU_COUNT = os.cpu_count() or 1
+THREAD_WORKERS = _env_int("HRCOPILOT_THREAD_WORKERS", min(32, CPU_COUNT + 4))
+MAX_QUEUE = _env_int("HRCOPILOT_MAX_QUEUE", 256)
+ROUTE_LIMITS = _parse_limits(os.environ.get("HRCOPILOT_ROUTE_LIMITS", ""))
+BATCH_WORKERS = _env_int("HRCOPILOT_BATCH_WORKERS", min(8, CPU_COUNT + 4))
+
+
+class ExecutorBusy(RuntimeError):
+    """Raised when the executor queue is full and no work can be accepted."""
+
+
+class WorkerPool:
+    """Dispatch blocking calls to a bounded thread pool.
+
+    Uploads lezen, parsen en CSV-logs gaan naar de threadpool; PDF-rendering
+    heeft een eigen processpool (:class:`utils.rendering.PDFRenderer`). Het
+    totaal aantal openstaande taken is begrensd door ``max_queue`` en per
+    route kan een maximum aantal gelijktijdige taken worden ingesteld.
+    """
+
+    def __init__(
+        self,
+        threads: int = THREAD_WORKERS,
+        max_queue: int = MAX_QUEUE,
+        route_limits: Optional[Dict[str, int]] = None,
+    ):
+        self.threads = max(1, threads)
+        self.max_queue = max_queue
+        self.route_limits = dict(ROUTE_LIMITS if route_limits is None else route_limits)
+        self._thread_pool: Optional[ThreadPoolExecutor] = None
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    @property
+    def pending(self) -> int:
+        """Number of tasks queued or running."""
+        return self._pending
+
+    def _threads(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._thread_pool is None:
+                self._thread_pool = ThreadPoolExecutor(
+                    max_workers=self.threads, thread_name_prefix="hrcopilot"
+                )
+            return self._thread_pool
+
+    def _semaphore(self, route: str) -> Optional[asyncio.Semaphore]:
+        limit = self.route_limits.get(route)
+        if not limit:
+            return None
+        if route not in self._semaphores:
+            self._semaphores[route] = asyncio.Semaphore(limit)
+        return self._semaphores[route]
+
+    def _acquire_slot(self) -> None:
+        with self._lock:
+            if self.max_queue and self._pending >= self.max_queue:
+                raise ExecutorBusy("te veel openstaande taken")
+            self._pending += 1
+
+    def _release_slot(self) -> None:
+        with self._lock:
+            self._pending -= 1
+
+    async def run(self, route: str, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """Run ``func`` in a worker thread and await its result.
+
+        Raises :class:`ExecutorBusy` when ``max_queue`` tasks are already
+        pending.
+        """
+        self._acquire_slot()
+        try:
+            executor = self._threads()
+            loop = asyncio.get_running_loop()
+            call = partial(func, *args, **kwargs)
+            semaphore = self._semaphore(route)
+            if semaphore is None:
+                return await loop.run_in_executor(executor, call)
+            async with semaphore:
+                return await loop.run_in_executor(executor, call)
+        finally:
+            self._release_slot()
+
+    async def iterate(self, route: str, items: Iterable[T]) -> AsyncIterator[T]:
+        """Iterate a blocking iterator with each ``next()`` in a worker thread.
+
+        Bij de eerste ``__anext__`` worden een plek in de wachtrij en de
+        routelimiet gereserveerd (``ExecutorBusy`` als de pool vol is) en pas
+        vrijgegeven als ``items`` is uitgeput of de iterator wordt gesloten,
+        net als bij :meth:`run` voor de duur van één aanroep.
+        """
+        self._acquire_slot()
+        try:
+            semaphore = self._semaphore(route)
+            if semaphore is not None:
+                await semaphore.acquire()
+            try:
+                loop = asyncio.get_running_loop()
+                source = iter(items)
+                done = object()
+                while True:
+                    item = await loop.run_in_executor(self._threads(), next, source, done)
+                    if item is done:
+                        return
+                    yield item
+            finally:
+                if semaphore is not None:
+                    semaphore.release()
+        finally:
+            self._release_slot()
+
+    def shutdown(self, wait: bool = True) -> None:
+        with self._lock:
+            pool, self._thread_pool = self._thread_pool, None
+        if pool is not None:
+            pool.shutdown(wait=wait)
+
+
+def bounded_map(
+    func: Callable[[T], R],
+    items: Iterable[T],
+    width: int = BATCH_WORKERS,
+    ordered: bool = False,
+) -> Iterator[R]:
+    """Apply ``func`` to ``items`` concurrently with at most ``width`` in flight.
+
+    Items worden pas uit ``items`` gehaald als er een worker vrij is, zodat het
+    geheugengebruik afhangt van ``width`` en niet van de lengte van de batch.
+    Met ``ordered=False`` komen resultaten terug zodra ze klaar zijn.
+    """
+    width = max(1, width)
+    source = iter(items)
+    with ThreadPoolExecutor(max_workers=width, thread_name_prefix="hrcopilot-batch") as ex:
+        inflight: deque = deque()
+
+        def fill() -> None:
+            while len(inflight) < width:
+                try:
+                    item = next(source)
+                except StopIteration:
+                    return
+                inflight.append(ex.submit(func, item))
+
+        fill()
+        while inflight:
+            if ordered:
+                future = inflight.popleft()
+                result = future.result()
+            else:
+                done, _ = wait(inflight, return_when=FIRST_COMPLETED)
+                future = next(f for f in inflight if f in done)
+                inflight.remove(future)
+                result = future.result()
+            fill()
+            yield result
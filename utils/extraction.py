@@ -0,0 +1,363 @@
+"""Gedeelde tekstextractie voor uploads, met een cache op inhoud.
+
+Alle agents halen de tekst van een geüpload document via deze module op. Het
+resultaat (de tekstblokken: pagina's, alinea's, rijen) wordt bewaard in een
+LRU-cache met de SHA-256 van de inhoud (plus het bestandstype) als sleutel,
+zodat een document per proces maar één keer wordt geparsed, ongeacht hoeveel
+agents het bekijken of hoe ze het lezen (volledig of blok voor blok).
+
+PDF's, DOCX-bestanden en spreadsheets worden bij een cache-miss live
+gestreamd: lezers krijgen ieder blok zodra het geparsed is, en de blokken gaan
+pas de cache in als het document helemaal gelezen is.
+"""
+from __future__ import annotations
+
+import os
+import threading
+import time
+from io import BytesIO
+from typing import Callable, Dict, Iterator, Optional, Sequence, Tuple
+
+from fastapi import UploadFile
+
+from .cache import LRUCache, content_hash
+from .formats import SNIFF_BYTES, detect_format, iter_table
+from .lazy import lazy_import
+from .uploads import STREAM_MIN_BYTES, SharedUpload
+
+# Parsers worden pas geladen bij het eerste bestand van het betreffende type.
+extract_msg = lazy_import("extract_msg")
+pd = lazy_import("pandas")
+pptx = lazy_import("pptx")
+
+# Grote (gescande) PDF's worden na dit aantal pagina's of seconden afgekapt.
+MAX_PAGES = int(os.environ.get("HRCOPILOT_MAX_PAGES", 500))
+TIME_BUDGET = float(os.environ.get("HRCOPILOT_EXTRACTION_BUDGET", 10.0))
+
+
+# Bijlagen van .msg-bestanden: maximale nestingdiepte en grootte per bijlage.
+MSG_MAX_DEPTH = int(os.environ.get("HRCOPILOT_MSG_MAX_DEPTH", 2))
+MSG_MAX_ATTACHMENT_BYTES = int(
+    os.environ.get("HRCOPILOT_MSG_MAX_ATTACHMENT_BYTES", 16 * 1024 * 1024)
+)
+
+
+def _text_size(blocks: Sequence[str]) -> int:
+    return sum(len(block) for block in blocks)
+
+
+# Begrensd op aantal documenten en op het totaal aantal tekens in de cache.
+EXTRACTION_CACHE = LRUCache(max_entries=256, max_bytes=64 * 1024 * 1024, sizeof=_text_size)
+
+# Formaat (zie :mod:`utils.formats`) -> extractor in deze module.
+FORMAT_KINDS = {
+    "pdf": "pdf",
+    "docx": "docx",
+    "msg": "msg",
+    "xlsx": "sheet",
+    "xls": "sheet",
+    "csv": "sheet",
+    "pptx": "slides",
+    "ppt": "slides",
+}
+
+
+def _kind(filename: str, data: bytes = b"") -> str:
+    return FORMAT_KINDS.get(detect_format(filename, data), "plain")
+
+
+def _msg_text(msg, depth: int) -> str:
+    text = f"{msg.subject}\n{msg.body}" if msg.body else msg.subject
+    parts = [text or ""]
+    if depth >= MSG_MAX_DEPTH:
+        return parts[0]
+    for attachment in getattr(msg, "attachments", None) or []:
+        name = getattr(attachment, "name", None) or ""
+        data = getattr(attachment, "data", None)
+        if isinstance(data, (bytes, bytearray)):
+            if len(data) > MSG_MAX_ATTACHMENT_BYTES:
+                continue
+            if _kind(name, data) == "msg":
+                body = _parse_msg(bytes(data), depth + 1)
+            else:
+                body = extract_bytes(name, bytes(data))
+        elif data is not None and hasattr(data, "subject"):
+            # Ingebedde e-mail: extract_msg levert die al als bericht aan.
+            body = _msg_text(data, depth + 1)
+        else:
+            continue
+        if body:
+            parts.append(f"[Bijlage: {name}]\n{body}")
+    return "\n".join(parts)
+
+
+def _parse_msg(data: bytes, depth: int) -> str:
+    msg = extract_msg.Message(BytesIO(data))
+    try:
+        return _msg_text(msg, depth)
+    finally:
+        close = getattr(msg, "close", None)
+        if close is not None:
+            close()
+
+
+def _extract_msg(data: bytes) -> str:
+    """Parse an Outlook ``.msg`` in memory, including its attachments.
+
+    Bijlagen gaan door dezelfde extractie als uploads (en dus ook door de
+    cache); ingebedde berichten worden tot ``MSG_MAX_DEPTH`` niveaus diep
+    gevolgd en bijlagen groter dan ``MSG_MAX_ATTACHMENT_BYTES`` overgeslagen.
+    """
+    return _parse_msg(data, 0)
+
+
+def iter_sheet(data: bytes) -> Iterator[str]:
+    """Yield the cells of a spreadsheet in blocks of rows."""
+    return iter_table(data, detect_format("", data))
+
+
+def _extract_slides(data: bytes) -> str:
+    prs = pptx.Presentation(BytesIO(data))
+    slides_text = []
+    for slide in prs.slides:
+        for shape in slide.shapes:
+            if hasattr(shape, "text"):
+                slides_text.append(shape.text)
+    return "\n".join(slides_text)
+
+
+def _extract_plain(data: bytes) -> str:
+    return data.decode("utf-8", errors="ignore")
+
+
+def iter_pdf(
+    data: bytes, max_pages: int = MAX_PAGES, budget: float = TIME_BUDGET
+) -> Iterator[str]:
+    """Yield the text of a PDF page by page.
+
+    Stopt na ``max_pages`` pagina's of zodra ``budget`` seconden verstreken
+    zijn, zodat een enorm gescand document een worker niet blokkeert.
+    """
+    from PyPDF2 import PdfReader
+
+    reader = PdfReader(BytesIO(data))
+    deadline = time.monotonic() + budget
+    for number, page in enumerate(reader.pages):
+        if number >= max_pages or time.monotonic() > deadline:
+            return
+        yield page.extract_text() or ""
+
+
+def iter_docx(data: bytes, budget: float = TIME_BUDGET) -> Iterator[str]:
+    """Yield the paragraphs and table cells of a DOCX document."""
+    from docx import Document
+
+    document = Document(BytesIO(data))
+    deadline = time.monotonic() + budget
+    for paragraph in document.paragraphs:
+        if time.monotonic() > deadline:
+            return
+        if paragraph.text:
+            yield paragraph.text
+    for table in document.tables:
+        for row in table.rows:
+            if time.monotonic() > deadline:
+                return
+            yield " ".join(cell.text for cell in row.cells)
+
+
+_EXTRACTORS: Dict[str, Callable[[bytes], str]] = {
+    "msg": _extract_msg,
+    "slides": _extract_slides,
+    "plain": _extract_plain,
+}
+
+# Documenttypen die stuk voor stuk (per pagina/alinea) gelezen worden.
+_STREAMERS: Dict[str, Callable[[bytes], Iterator[str]]] = {
+    "pdf": iter_pdf,
+    "docx": iter_docx,
+    "sheet": iter_sheet,
+}
+
+
+def _stream(kind: str, data: bytes) -> Iterator[str]:
+    """Yield text blocks; stops silently where the document cannot be parsed.
+
+    Een corrupt binair bestand (PDF, DOCX, xlsx) levert dus geen tekst op in
+    plaats van de ruwe bytes als tekst.
+    """
+    try:
+        yield from _STREAMERS[kind](data)
+    except Exception:
+        return
+
+
+def _parse(kind: str, data: bytes) -> Tuple[str, ...]:
+    try:
+        text = _EXTRACTORS[kind](data)
+    except Exception:
+        return ()
+    return (text,) if text else ()
+
+
+class _LiveParse:
+    """One running streamed parse, shared block by block by its readers.
+
+    De lezer die vooraan loopt haalt het volgende blok uit de parser; de
+    anderen lezen de blokken die er al zijn. Is de parser uitgeput, dan gaan
+    de blokken de cache in. Stoppen alle lezers eerder (bijv. na een vroege
+    exit in een scan), dan wordt de parser gesloten en niets gecachet.
+    """
+
+    def __init__(self, key: tuple, source: Iterator[str]):
+        self.key = key
+        self.source = source
+        self.blocks: list = []
+        self.done = False
+        self.readers = 0
+        self._lock = threading.Lock()
+
+    def read(self) -> Iterator[str]:
+        index = 0
+        try:
+            while True:
+                if index < len(self.blocks):
+                    index += 1
+                    yield self.blocks[index - 1]
+                    continue
+                with self._lock:
+                    if index < len(self.blocks):
+                        continue
+                    if self.done:
+                        return
+                    try:
+                        self.blocks.append(next(self.source))
+                    except StopIteration:
+                        self.done = True
+                        with _LIVE_LOCK:
+                            EXTRACTION_CACHE.set(self.key, tuple(self.blocks))
+                            _LIVE.pop(self.key, None)
+                        return
+        finally:
+            with _LIVE_LOCK:
+                self.readers -= 1
+                abandoned = not self.readers and not self.done
+                if abandoned and _LIVE.get(self.key) is self:
+                    del _LIVE[self.key]
+            if abandoned:
+                self.source.close()
+
+
+# Lopende gestreamde parses per cachesleutel.
+_LIVE: Dict[tuple, _LiveParse] = {}
+_LIVE_LOCK = threading.Lock()
+
+
+def extract_bytes(filename: str, data: bytes) -> str:
+    """Return the text of a document, parsing it at most once per process."""
+    if not data:
+        return ""
+    return "\n".join(iter_text(filename, data))
+
+
+def iter_text(filename: str, data: bytes) -> Iterator[str]:
+    """Yield the text of a document in blocks (pages, paragraphs).
+
+    De blokken komen uit dezelfde cache als :func:`extract_bytes`. Bij een
+    cache-miss wordt het document live geparsed; agents die het tegelijk
+    lezen (``/auto/``) delen die ene parse. Wie vroeg stopt, breekt de parse
+    af zodra er geen andere lezers meer zijn.
+    """
+    if not data:
+        return
+    kind = _kind(filename or "", data)
+    key = (kind, content_hash(data))
+    if kind not in _STREAMERS:
+        yield from EXTRACTION_CACHE.get_or_compute(key, lambda: _parse(kind, data))
+        return
+    with _LIVE_LOCK:
+        cached = EXTRACTION_CACHE.get(key)
+        if cached is None:
+            live = _LIVE.get(key)
+            if live is None:
+                live = _LIVE[key] = _LiveParse(key, _stream(kind, data))
+            live.readers += 1
+    if cached is not None:
+        yield from cached
+        return
+    yield from live.read()
+
+
+def read_upload(file: UploadFile) -> bytes:
+    """Read an ``UploadFile`` completely and rewind it for the next reader.
+
+    Een :class:`~utils.uploads.SharedUpload` is al ingelezen; dan komt de
+    gedeelde buffer terug zonder te lezen of te kopiëren.
+    """
+    if isinstance(file, SharedUpload):
+        return file.data
+    try:
+        data = file.file.read()
+    except Exception:
+        data = b""
+    finally:
+        try:
+            file.file.seek(0)
+        except Exception:
+            pass
+    return data or b""
+
+
+def extract_upload(file: Optional[UploadFile]) -> str:
+    """Return the text of an uploaded file (empty string without a file)."""
+    if file is None:
+        return ""
+    return extract_bytes(file.filename or "", read_upload(file))
+
+
+def _upload_size(file: UploadFile) -> int:
+    try:
+        size = file.file.seek(0, os.SEEK_END)
+        file.file.seek(0)
+        return size
+    except Exception:
+        return 0
+
+
+def _iter_large_sheet(file: UploadFile, fmt: str) -> Iterator[str]:
+    try:
+        yield from iter_table(file.file, fmt)
+    finally:
+        file.file.seek(0)
+
+
+def iter_upload(file: Optional[UploadFile]) -> Iterator[str]:
+    """Stream the text of an uploaded file in blocks, see :func:`iter_text`.
+
+    Spreadsheets vanaf ``STREAM_MIN_BYTES`` worden rechtstreeks uit het
+    uploadbestand gelezen, blok voor blok en buiten de cache om, zodat ook
+    een zeer grote personeelsexport binnen een vast geheugenplafond blijft.
+    """
+    if file is None:
+        return iter(())
+    filename = file.filename or ""
+    if _upload_size(file) >= STREAM_MIN_BYTES:
+        head = file.file.read(SNIFF_BYTES)
+        file.file.seek(0)
+        fmt = detect_format(filename, head)
+        if FORMAT_KINDS.get(fmt) == "sheet":
+            return _iter_large_sheet(file, fmt)
+    return iter_text(filename, read_upload(file))
+
+
+def preload() -> None:
+    """Import all document parsers now (used by the warm-up hook)."""
+    for module in (extract_msg, pd, pptx):
+        module.load()
+    import docx  # noqa: F401
+    import PyPDF2  # noqa: F401
+
+
+def cache_stats() -> dict:
+    """Hit/miss/eviction counters of the extraction cache."""
+    return EXTRACTION_CACHE.stats()
@@ -1,17 +1,187 @@
+import atexit
 import csv
+import io
+import logging
+import os
+import queue
+import threading
 from pathlib import Path
 from datetime import datetime
+from typing import Dict, List
+
+from .metrics import stage
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
 
 UTILS_DIR = Path(__file__).resolve().parent
 FEEDBACK_FILE = UTILS_DIR / "feedback.csv"
 LOG_FILE = UTILS_DIR / "usage_log.csv"
 
+FLUSH_INTERVAL = float(os.environ.get("HRCOPILOT_LOG_FLUSH_INTERVAL", 1.0))
+FLUSH_ROWS = int(os.environ.get("HRCOPILOT_LOG_FLUSH_ROWS", 100))
+MAX_LOG_BYTES = int(os.environ.get("HRCOPILOT_LOG_MAX_BYTES", 10 * 1024 * 1024))
+LOG_BACKUPS = int(os.environ.get("HRCOPILOT_LOG_BACKUPS", 5))
+
+logger = logging.getLogger(__name__)
+
+
+def _header(row: list) -> list:
+    return ["timestamp"] + [f"col{i}" for i in range(1, len(row) + 1)]
+
+
+class _FileLock:
+    """Exclusive lock on ``<path>.lock`` so several processes can share a log."""
+
+    def __init__(self, path: Path):
+        self.path = path.with_name(path.name + ".lock")
+
+    def __enter__(self):
+        self._fh = self.path.open("a")
+        if fcntl is not None:
+            fcntl.flock(self._fh, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if fcntl is not None:
+            fcntl.flock(self._fh, fcntl.LOCK_UN)
+        self._fh.close()
+
+
+class LogWriter:
+    """Background CSV writer for feedback and usage logs.
+
+    ``append`` zet een regel alleen in een wachtrij; een achtergrondthread
+    schrijft de wachtrij weg zodra ``flush_rows`` regels klaarstaan of na
+    ``flush_interval`` seconden. Schrijven gebeurt onder een bestandslock,
+    zodat meerdere workers veilig hetzelfde bestand delen, en een bestand
+    groter dan ``max_bytes`` wordt geroteerd (``.1`` t/m ``.<backups>``).
+    Met :meth:`flush` wordt alles direct en synchroon weggeschreven.
+
+    Mislukt het schrijven (volle schijf, rechten), dan wordt de fout gelogd
+    en komen de regels terug voor de volgende flush; regels die ook de
+    tweede keer niet weggeschreven kunnen worden, worden als CSV-tekst
+    gelogd (``logger.error``) in plaats van stil te verdwijnen.
+    """
+
+    def __init__(
+        self,
+        flush_interval: float = FLUSH_INTERVAL,
+        flush_rows: int = FLUSH_ROWS,
+        max_bytes: int = MAX_LOG_BYTES,
+        backups: int = LOG_BACKUPS,
+    ):
+        self.flush_interval = flush_interval
+        self.flush_rows = flush_rows
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self._queue: "queue.SimpleQueue[tuple[Path, list]]" = queue.SimpleQueue()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._write_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._thread = None
+        self._retry: Dict[Path, List[list]] = {}
+
+    def append(self, path: Path, row: list) -> None:
+        """Queue ``row`` for ``path``; the timestamp is taken now."""
+        self._queue.put((path, [datetime.utcnow().isoformat()] + list(row)))
+        self._ensure_thread()
+        if self._queue.qsize() >= self.flush_rows:
+            self._wake.set()
+
+    def pending(self) -> int:
+        return self._queue.qsize() + sum(len(rows) for rows in self._retry.values())
+
+    def _ensure_thread(self) -> None:
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="hrcopilot-logwriter", daemon=True
+                )
+                self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("logwriter: flush mislukt")
+
+    def flush(self) -> None:
+        """Write every queued row to disk before returning."""
+        with self._write_lock:
+            retried = {path: len(rows) for path, rows in self._retry.items()}
+            batches, self._retry = self._retry, {}
+            while True:
+                try:
+                    path, row = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                batches.setdefault(path, []).append(row)
+            for path, rows in batches.items():
+                try:
+                    with stage("csv_log", "write"):
+                        self._write(path, rows)
+                except Exception:
+                    logger.exception("logwriter: %d regels niet geschreven naar %s", len(rows), path)
+                    done = retried.get(path, 0)
+                    if done:
+                        self._dump(path, rows[:done])
+                    if rows[done:]:
+                        self._retry[path] = rows[done:]
+
+    def _dump(self, path: Path, rows: List[list]) -> None:
+        """Last resort: log rows that could not be written, as CSV text."""
+        buf = io.StringIO()
+        csv.writer(buf).writerows(rows)
+        logger.error("logwriter: %d regels voor %s niet weggeschreven:\n%s", len(rows), path, buf.getvalue())
+
+    def _write(self, path: Path, rows: List[list]) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with _FileLock(path):
+            if self.max_bytes and path.exists() and path.stat().st_size >= self.max_bytes:
+                self._rotate(path)
+            new_file = not path.exists() or path.stat().st_size == 0
+            with path.open("a", newline="") as f:
+                writer = csv.writer(f)
+                if new_file:
+                    writer.writerow(_header(rows[0][1:]))
+                writer.writerows(rows)
+
+    def _rotate(self, path: Path) -> None:
+        for i in range(self.backups - 1, 0, -1):
+            src = path.with_name(f"{path.name}.{i}")
+            if src.exists():
+                os.replace(src, path.with_name(f"{path.name}.{i + 1}"))
+        if self.backups:
+            os.replace(path, path.with_name(f"{path.name}.1"))
+        else:
+            path.unlink()
+
+    def close(self) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        self.flush()
+        with self._write_lock:
+            retry, self._retry = self._retry, {}
+        for path, rows in retry.items():
+            self._dump(path, rows)
+
+
+LOG_WRITER = LogWriter()
+atexit.register(LOG_WRITER.flush)
+
 
-def append_row(path: Path, row: list[str]):
-    path.parent.mkdir(parents=True, exist_ok=True)
-    new_file = not path.exists()
-    with path.open("a", newline="") as f:
-        writer = csv.writer(f)
-        if new_file:
-            writer.writerow(["timestamp"] + [f"col{i}" for i in range(1, len(row)+1)])
-        writer.writerow([datetime.utcnow().isoformat()] + row)
+def log_row(path: Path, row: list[str]) -> None:
+    """Queue a CSV row via the shared :data:`LOG_WRITER`."""
+    LOG_WRITER.append(path, row)
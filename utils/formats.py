@@ -0,0 +1,189 @@
+"""Bestandsformaat herkennen op magic bytes en extensie.
+
+Uploads worden niet meer "op de gok" met ``read_excel`` geopend om bij een
+fout terug te vallen op ``read_csv``: :func:`detect_format` bepaalt vooraf
+welk formaat het is en :func:`read_table` kiest direct de juiste parser en
+engine.
+"""
+from __future__ import annotations
+
+import os
+import zipfile
+from io import BytesIO
+from typing import BinaryIO, Iterable, Iterator, Optional, Union
+
+from .lazy import lazy_import
+
+pd = lazy_import("pandas")
+
+ZIP_MAGIC = b"PK\x03\x04"
+OLE2_MAGIC = b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1"
+PDF_MAGIC = b"%PDF-"
+
+# Hoeveel bytes bekeken worden om tekst van binaire data te onderscheiden.
+SNIFF_BYTES = 4096
+
+EXTENSION_FORMATS = {
+    ".pdf": "pdf",
+    ".docx": "docx",
+    ".doc": "doc",
+    ".xlsx": "xlsx",
+    ".xls": "xls",
+    ".csv": "csv",
+    ".pptx": "pptx",
+    ".ppt": "ppt",
+    ".msg": "msg",
+    ".txt": "text",
+    ".eml": "text",
+}
+
+SHEET_FORMATS = ("xlsx", "xls", "csv")
+
+# Eerste map in een OOXML-archief -> formaat.
+_OOXML_PREFIXES = (("xl/", "xlsx"), ("word/", "docx"), ("ppt/", "pptx"))
+
+EXCEL_ENGINES = {"xlsx": "openpyxl", "xls": "xlrd"}
+
+# Aantal rijen per tekstblok bij het stroomsgewijs lezen van spreadsheets.
+CHUNK_ROWS = int(os.environ.get("HRCOPILOT_SHEET_CHUNK_ROWS", 5000))
+CSV_DELIMITERS = ",;\t|"
+
+
+def _extension(filename: str) -> str:
+    dot = filename.rfind(".")
+    return filename[dot:].lower() if dot >= 0 else ""
+
+
+def _zip_format(data: bytes) -> str:
+    try:
+        names = zipfile.ZipFile(BytesIO(data)).namelist()
+    except zipfile.BadZipFile:
+        return "binary"
+    for name in names:
+        for prefix, fmt in _OOXML_PREFIXES:
+            if name.startswith(prefix):
+                return fmt
+    return "zip"
+
+
+def _is_text(head: bytes) -> bool:
+    return b"\x00" not in head
+
+
+def sniff(data: bytes) -> str:
+    """Return the format of ``data`` based on its leading bytes only."""
+    if data.startswith(PDF_MAGIC):
+        return "pdf"
+    if data.startswith(ZIP_MAGIC):
+        return _zip_format(data)
+    if data.startswith(OLE2_MAGIC):
+        return "ole"
+    return "text" if _is_text(data[:SNIFF_BYTES]) else "binary"
+
+
+def detect_format(filename: str, data: bytes) -> str:
+    """Combine extension and magic bytes into one format name.
+
+    De extensie is leidend voor documenttypen (``.msg``, ``.pdf``, ...). Voor
+    spreadsheets bepaalt de inhoud het formaat, zodat een CSV met extensie
+    ``.xlsx`` of een ``.xls`` dat eigenlijk OOXML is toch goed gelezen wordt.
+    Zonder bekende extensie beslissen de magic bytes.
+    """
+    fmt = EXTENSION_FORMATS.get(_extension(filename or ""))
+    if fmt is not None and fmt not in SHEET_FORMATS:
+        return fmt
+    sniffed = sniff(data)
+    if fmt is not None:
+        if sniffed == "xlsx" or (sniffed == "zip" and fmt == "xlsx"):
+            return "xlsx"
+        if sniffed == "ole":
+            return "xls"
+        return "csv" if sniffed == "text" else fmt
+    if sniffed == "ole":
+        # Zonder extensie is een OLE2-container meestal een oud Excel-bestand.
+        return "xls"
+    return sniffed
+
+
+def csv_delimiter(data: bytes) -> str:
+    """Guess the CSV delimiter from the first line (``;`` for Dutch Excel)."""
+    first = data[:SNIFF_BYTES].split(b"\n", 1)[0]
+    counts = {sep: first.count(sep.encode()) for sep in CSV_DELIMITERS}
+    best = max(counts, key=counts.get)
+    return best if counts[best] else ","
+
+
+def read_table(data: bytes, filename: str = "", fmt: Optional[str] = None, **options):
+    """Read spreadsheet bytes into a ``DataFrame`` with the matching parser.
+
+    Extra ``options`` (bijv. ``dtype=str``) gaan ongewijzigd naar pandas.
+    Een CSV met ``;`` als scheidingsteken wordt gelezen met ``,`` als
+    decimaalteken, zoals Nederlandse Excel-exports dat schrijven.
+    """
+    fmt = fmt or detect_format(filename, data)
+    if fmt in EXCEL_ENGINES:
+        return pd.read_excel(BytesIO(data), engine=EXCEL_ENGINES[fmt], **options)
+    options.setdefault("sep", csv_delimiter(data))
+    if options["sep"] == ";":
+        # Nederlandse Excel-export: komma als decimaalteken (``3,5``).
+        options.setdefault("decimal", ",")
+    return pd.read_csv(BytesIO(data), engine="c", **options)
+
+
+def _join_cells(values: Iterable) -> str:
+    # Het afsluitende regeleinde houdt blokken gescheiden voor de scanners.
+    return " ".join(str(v) for v in values if v is not None and v != "") + "\n"
+
+
+def _iter_xlsx(source: BinaryIO, chunk_rows: int) -> Iterator[str]:
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(source, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(min_row=2, values_only=True)
+        block: list = []
+        for number, row in enumerate(rows, 1):
+            block.extend(row)
+            if number % chunk_rows == 0:
+                yield _join_cells(block)
+                block = []
+        if block:
+            yield _join_cells(block)
+    finally:
+        workbook.close()
+
+
+def iter_table(
+    source: Union[bytes, BinaryIO], fmt: str = "csv", chunk_rows: int = CHUNK_ROWS
+) -> Iterator[str]:
+    """Yield the cells of a spreadsheet as text, ``chunk_rows`` rows at a time.
+
+    CSV wordt gelezen met ``read_csv(chunksize=...)`` en ``.xlsx`` met
+    openpyxl in read-only modus, zodat het geheugengebruik per blok begrensd
+    blijft. ``source`` mag bytes of een (seekbaar) bestandsobject zijn; de
+    kopregel wordt net als bij :func:`read_table` niet meegenomen.
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = BytesIO(source)
+    if fmt == "xlsx":
+        yield from _iter_xlsx(source, chunk_rows)
+        return
+    if fmt in EXCEL_ENGINES:
+        # xlrd kent geen streaming-modus; oude .xls-bestanden zijn klein.
+        df = pd.read_excel(source, engine=EXCEL_ENGINES[fmt], dtype=str, keep_default_na=False)
+        yield _join_cells(df.to_numpy().ravel())
+        return
+    start = source.tell()
+    head = source.read(SNIFF_BYTES)
+    source.seek(start)
+    reader = pd.read_csv(
+        source,
+        sep=csv_delimiter(head),
+        engine="c",
+        dtype=str,
+        keep_default_na=False,
+        chunksize=chunk_rows,
+    )
+    with reader:
+        for chunk in reader:
+            yield _join_cells(chunk.to_numpy().ravel())
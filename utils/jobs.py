@@ -0,0 +1,414 @@
+"""Asynchrone jobs voor langlopende analyses.
+
+Een job wordt direct geaccepteerd (``202``) en daarna door een eigen,
+begrensde pool van workers uitgevoerd, los van de :class:`WorkerPool` van de
+interactieve routes. Status en resultaat staan in een SQLite-bestand, zodat
+ze via ``/jobs/{id}`` en ``/jobs/{id}/result`` op te halen zijn.
+
+* Jobs met een hogere ``priority`` gaan voor; bij gelijke prioriteit geldt
+  volgorde van binnenkomst.
+* Een wachtende job wordt bij annuleren niet meer gestart; van een lopende
+  job wordt het resultaat weggegooid. Starten en afronden zijn voorwaardelijke
+  updates in SQLite (``wachtend`` -> ``bezig`` -> ``klaar``), zodat een
+  annulering via een andere uvicorn-worker ook geldt.
+* Afgeronde jobs verlopen na ``ttl`` seconden.
+* De invoer (uploads) staat alleen in het geheugen, begrensd op
+  ``max_pending_bytes`` voor wachtende jobs; jobs die bij een herstart nog
+  wachtten of liepen worden als ``mislukt`` gemarkeerd.
+  Iedere job krijgt daarvoor de eigenaar (``host:pid:token``) mee; alleen
+  jobs van een proces dat niet meer draait worden hersteld, zodat meerdere
+  uvicorn-workers één databasebestand kunnen delen.
+"""
+from __future__ import annotations
+
+import heapq
+import itertools
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .executor import ExecutorBusy, _env_int
+
+UTILS_DIR = Path(__file__).resolve().parent
+JOBS_DB = os.environ.get("HRCOPILOT_JOBS_DB", str(UTILS_DIR / "jobs.db"))
+# Maximaal aantal jobs dat tegelijk draait.
+JOB_WORKERS = _env_int("HRCOPILOT_JOB_WORKERS", 2)
+# Maximaal aantal wachtende jobs; daarboven antwoordt de API met ``503``.
+MAX_JOBS = _env_int("HRCOPILOT_MAX_JOBS", 1000)
+# Maximale omvang (bytes) van de invoer die wachtende jobs in het geheugen houden.
+MAX_JOB_BYTES = _env_int("HRCOPILOT_MAX_JOB_BYTES", 256 * 1024 * 1024)
+# Hoe lang (seconden) een afgeronde job met resultaat bewaard blijft.
+JOB_TTL = float(os.environ.get("HRCOPILOT_JOB_TTL", 24 * 3600))
+
+WACHTEND = "wachtend"
+BEZIG = "bezig"
+KLAAR = "klaar"
+MISLUKT = "mislukt"
+GEANNULEERD = "geannuleerd"
+AFGEROND = frozenset({KLAAR, MISLUKT, GEANNULEERD})
+
+JSON_MEDIA = "application/json"
+_COLUMNS = ("id", "kind", "priority", "status", "created", "started", "finished", "expires", "media", "error")
+_HOST = socket.gethostname()
+_TOKEN = uuid.uuid4().hex[:8]
+
+
+def process_owner() -> str:
+    """Eigenaar van jobs uit dit proces; ook na ``fork`` uniek via de pid."""
+    return f"{_HOST}:{os.getpid()}:{_TOKEN}"
+
+
+def owner_alive(owner: Optional[str], current: str) -> bool:
+    """Draait het proces dat ``owner`` schreef nog?
+
+    Eigenaars op een andere host kunnen niet gecontroleerd worden en gelden
+    als levend. Dezelfde pid met een ander token is een eerdere incarnatie
+    (hergebruikte pid na een herstart).
+    """
+    if not owner:
+        return False
+    if owner == current:
+        return True
+    host, _, rest = owner.partition(":")
+    pid = rest.partition(":")[0]
+    if host != _HOST:
+        return True
+    try:
+        pid_value = int(pid)
+    except ValueError:
+        return False
+    if pid_value == os.getpid():
+        return False
+    try:
+        os.kill(pid_value, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class JobStore:
+    """Persistent job table in SQLite (status, timestamps and result)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, kind TEXT NOT NULL, priority INTEGER NOT NULL, "
+            "status TEXT NOT NULL, created REAL NOT NULL, started REAL, finished REAL, "
+            "expires REAL, media TEXT, error TEXT, result BLOB, owner TEXT)"
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        if "owner" not in columns:
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN owner TEXT")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_expires ON jobs (expires)")
+
+    def create(
+        self, job_id: str, kind: str, priority: int, created: float, owner: Optional[str] = None
+    ) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, kind, priority, status, created, owner) VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, kind, priority, WACHTEND, created, owner),
+            )
+
+    def update(self, job_id: str, only_if: Tuple[str, ...] = (), **fields: Any) -> bool:
+        """Update ``fields``; met ``only_if`` alleen vanuit een van die statussen.
+
+        Geeft ``True`` als de rij is bijgewerkt. De controle en de update zijn
+        één statement, dus ook tussen processen op hetzelfde bestand atomair.
+        """
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        where = "id = ?"
+        if only_if:
+            where += f" AND status IN ({', '.join('?' for _ in only_if)})"
+        with self._lock:
+            cursor = self._conn.execute(
+                f"UPDATE jobs SET {assignments} WHERE {where}",
+                (*fields.values(), job_id, *only_if),
+            )
+        return cursor.rowcount == 1
+
+    def position(self, job_id: str) -> int:
+        """Aantal wachtende jobs (van alle processen) dat vóór ``job_id`` gaat."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT COUNT(*) FROM jobs AS other, jobs AS job "
+                "WHERE job.id = ? AND other.status = ? AND ("
+                "other.priority > job.priority OR (other.priority = job.priority AND "
+                "(other.created < job.created OR "
+                "(other.created = job.created AND other.rowid < job.rowid))))",
+                (job_id, WACHTEND),
+            ).fetchone()
+        return row[0]
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        return dict(zip(_COLUMNS, row)) if row else None
+
+    def result(self, job_id: str) -> Optional[Tuple[str, bytes]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT media, result FROM jobs WHERE id = ? AND status = ?", (job_id, KLAAR)
+            ).fetchone()
+        return (row[0], bytes(row[1])) if row else None
+
+    def delete(self, job_id: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+
+    def purge_expired(self, now: Optional[float] = None) -> int:
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM jobs WHERE expires IS NOT NULL AND expires <= ?",
+                (now if now is not None else time.time(),),
+            )
+        return cursor.rowcount
+
+    def interrupt_unfinished(
+        self, now: float, expires: Optional[float], alive: Callable[[Optional[str]], bool]
+    ) -> int:
+        """Mark jobs left waiting or running by a process that is gone as failed.
+
+        ``alive(owner)`` beslist per eigenaar; jobs van processen die nog
+        draaien (andere workers op hetzelfde bestand) blijven ongemoeid.
+        """
+        with self._lock:
+            owners = [
+                row[0]
+                for row in self._conn.execute(
+                    "SELECT DISTINCT owner FROM jobs WHERE status IN (?, ?)", (WACHTEND, BEZIG)
+                )
+            ]
+            dead = [owner for owner in owners if not alive(owner)]
+            count = 0
+            for owner in dead:
+                cursor = self._conn.execute(
+                    "UPDATE jobs SET status = ?, error = ?, finished = ?, expires = ? "
+                    "WHERE status IN (?, ?) AND owner IS ?",
+                    (MISLUKT, "onderbroken door herstart", now, expires, WACHTEND, BEZIG, owner),
+                )
+                count += cursor.rowcount
+        return count
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def _encode(output: Tuple[str, Any]) -> Tuple[str, bytes]:
+    media, payload = output
+    if isinstance(payload, (bytes, bytearray, memoryview)):
+        return media, bytes(payload)
+    return JSON_MEDIA, json.dumps(payload).encode()
+
+
+class JobQueue:
+    """Priority queue with a fixed number of worker threads.
+
+    ``submit`` krijgt een functie die ``(media_type, payload)`` teruggeeft;
+    ``payload`` is bytes (PDF, Excel, PNG) of iets dat naar JSON kan.
+    De store wordt pas bij het eerste gebruik geopend.
+    """
+
+    def __init__(
+        self,
+        path: str = JOBS_DB,
+        workers: int = JOB_WORKERS,
+        ttl: float = JOB_TTL,
+        max_pending: int = MAX_JOBS,
+        owner: Optional[str] = None,
+        max_pending_bytes: int = MAX_JOB_BYTES,
+    ):
+        self.path = path
+        self.workers = max(1, workers)
+        self.ttl = ttl
+        self.max_pending = max_pending
+        self.max_pending_bytes = max_pending_bytes
+        self.owner = owner
+        self._store: Optional[JobStore] = None
+        self._heap: List[Tuple[int, int, str]] = []
+        self._calls: Dict[str, Callable[[], Tuple[str, Any]]] = {}
+        self._running: set = set()
+        # Geheugengebruik van de invoer per wachtende job (zie ``nbytes``).
+        self._sizes: Dict[str, int] = {}
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._threads: List[threading.Thread] = []
+        self._stop = False
+
+    @property
+    def store(self) -> JobStore:
+        with self._cond:
+            if self._store is None:
+                self._store = JobStore(self.path)
+                now = time.time()
+                current = self._owner()
+                self._store.interrupt_unfinished(
+                    now, self._expires(now), lambda owner: owner_alive(owner, current)
+                )
+            return self._store
+
+    def _owner(self) -> str:
+        return self.owner or process_owner()
+
+    def _expires(self, now: float) -> Optional[float]:
+        return now + self.ttl if self.ttl else None
+
+    def _ensure_workers(self) -> None:
+        if self._threads:
+            return
+        self._stop = False
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"hrcopilot-job-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    @property
+    def queued(self) -> int:
+        return len(self._calls)
+
+    @property
+    def running(self) -> int:
+        return len(self._running)
+
+    @property
+    def pending_bytes(self) -> int:
+        return sum(self._sizes.values())
+
+    def submit(
+        self,
+        kind: str,
+        func: Callable[..., Tuple[str, Any]],
+        *args: Any,
+        priority: int = 0,
+        nbytes: int = 0,
+        **kwargs: Any,
+    ) -> str:
+        """Queue ``func(*args, **kwargs)`` and return the job id.
+
+        ``nbytes`` is het geheugen dat de argumenten (uploads) innemen tot de
+        job start. Raises :class:`ExecutorBusy` when ``max_pending`` jobs are
+        waiting or their input would exceed ``max_pending_bytes``.
+        """
+        store = self.store
+        now = time.time()
+        store.purge_expired(now)
+        job_id = uuid.uuid4().hex
+        with self._cond:
+            if self.max_pending and len(self._calls) >= self.max_pending:
+                raise ExecutorBusy("te veel wachtende jobs")
+            if self.max_pending_bytes and self.pending_bytes + nbytes > self.max_pending_bytes:
+                raise ExecutorBusy("te veel invoer voor wachtende jobs")
+            store.create(job_id, kind, priority, now, self._owner())
+            self._calls[job_id] = lambda: func(*args, **kwargs)
+            if nbytes:
+                self._sizes[job_id] = nbytes
+            heapq.heappush(self._heap, (-priority, next(self._seq), job_id))
+            self._ensure_workers()
+            self._cond.notify()
+        return job_id
+
+    def status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Status van een job, of ``None`` als hij onbekend of verlopen is."""
+        job = self.store.get(job_id)
+        if job is None:
+            return None
+        if job["expires"] is not None and job["expires"] <= time.time():
+            self.store.delete(job_id)
+            return None
+        if job["status"] == WACHTEND:
+            job["positie"] = self.store.position(job_id)
+        return job
+
+    def result(self, job_id: str) -> Optional[Tuple[str, bytes]]:
+        if self.status(job_id) is None:
+            return None
+        return self.store.result(job_id)
+
+    def cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Annuleer een wachtende of lopende job; afgeronde jobs blijven staan.
+
+        Werkt ook voor jobs van een andere worker op hetzelfde bestand: die
+        start de job dan niet meer of bewaart zijn resultaat niet.
+        """
+        job = self.status(job_id)
+        if job is None or job["status"] in AFGEROND:
+            return job
+        now = time.time()
+        with self._cond:
+            # Wacht de job hier, dan ook de invoer direct vrijgeven.
+            self._calls.pop(job_id, None)
+            self._sizes.pop(job_id, None)
+        self.store.update(
+            job_id, only_if=(WACHTEND, BEZIG),
+            status=GEANNULEERD, finished=now, expires=self._expires(now),
+        )
+        return self.status(job_id)
+
+    def _next(self) -> Optional[Tuple[str, Callable[[], Tuple[str, Any]]]]:
+        with self._cond:
+            while not self._stop:
+                while self._heap:
+                    _, _, job_id = heapq.heappop(self._heap)
+                    call = self._calls.pop(job_id, None)
+                    self._sizes.pop(job_id, None)
+                    if call is not None:
+                        self._running.add(job_id)
+                        return job_id, call
+                self._cond.wait()
+        return None
+
+    def _work(self) -> None:
+        while True:
+            item = self._next()
+            if item is None:
+                return
+            job_id, call = item
+            store = self.store
+            # Alleen een job die nog wacht wordt gestart: een ``cancel`` (ook
+            # vanuit een ander proces) na ``_next`` blijft zo staan.
+            if not store.update(job_id, only_if=(WACHTEND,), status=BEZIG, started=time.time()):
+                with self._cond:
+                    self._running.discard(job_id)
+                continue
+            fields: Dict[str, Any]
+            try:
+                media, data = _encode(call())
+                fields = {"status": KLAAR, "media": media, "result": data}
+            except Exception as exc:
+                fields = {"status": MISLUKT, "error": f"{type(exc).__name__}: {exc}"}
+            now = time.time()
+            # Tijdens het draaien geannuleerd: het resultaat vervalt.
+            store.update(job_id, only_if=(BEZIG,), finished=now, expires=self._expires(now), **fields)
+            with self._cond:
+                self._running.discard(job_id)
+
+    def shutdown(self, wait: bool = True) -> None:
+        with self._cond:
+            self._stop = True
+            self._cond.notify_all()
+            threads, self._threads = self._threads, []
+        if not wait:
+            return
+        for thread in threads:
+            thread.join()
+        with self._cond:
+            if self._store is not None:
+                self._store.close()
+                self._store = None
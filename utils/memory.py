@@ -1,40 +1,666 @@
 from __future__ import annotations
 
+import hashlib
 import json
+import os
+import threading
+import time
+import uuid
+import weakref
+from collections import Counter
+from contextlib import contextmanager
 from pathlib import Path
-from datetime import datetime
+from datetime import datetime, timezone
+
+from .metrics import stage
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
 
 UTILS_DIR = Path(__file__).resolve().parent
-MEMORY_FILE = UTILS_DIR / "memory.json"
+MEMORY_FILE = UTILS_DIR / "memory.jsonl"
+LEGACY_MEMORY_FILE = UTILS_DIR / "memory.json"
+
+# Compacteer zodra minstens dit aantal bytes onbruikbaar is en dat meer dan de
+# helft van het logbestand beslaat.
+COMPACT_MIN_BYTES = 1 << 20
+COMPACT_RATIO = 0.5
+
+# Bewaarbeleid per gebruiker (0 = geen limiet): maximaal aantal entries,
+# maximaal aantal bytes en maximale leeftijd in seconden. Standaard staat het
+# uit; wie het aanzet verwijdert bij de volgende start ook bestaande historie
+# die buiten de limieten valt.
+MAX_ENTRIES = int(os.environ.get("HRCOPILOT_MEMORY_MAX_ENTRIES", 0))
+MAX_BYTES = int(os.environ.get("HRCOPILOT_MEMORY_MAX_BYTES", 0))
+TTL = float(os.environ.get("HRCOPILOT_MEMORY_TTL", 0))
+# Interval (seconden) van de achtergrondopruiming; 0 = alleen bij ``add``.
+SWEEP_INTERVAL = float(os.environ.get("HRCOPILOT_MEMORY_SWEEP_INTERVAL", 300))
+
+# Objecten en lijsten vanaf deze grootte (JSON, bytes) worden één keer als
+# blob opgeslagen en vanuit de entries met hun hash aangeduid; 0 = uit.
+BLOB_MIN_BYTES = int(os.environ.get("HRCOPILOT_MEMORY_BLOB_MIN_BYTES", 512))
+BLOB_KEY = "__blob__"
+_REF_SIZE = len(json.dumps({BLOB_KEY: "0" * 64}, separators=(",", ":")))
+
+
+def _canonical(value) -> str:
+    return json.dumps(value, separators=(",", ":"))
+
+
+def _blob_ref(value) -> str | None:
+    if isinstance(value, dict) and len(value) == 1:
+        ref = value.get(BLOB_KEY)
+        if isinstance(ref, str):
+            return ref
+    return None
+
+
+def _collect_refs(value, refs: set) -> None:
+    ref = _blob_ref(value)
+    if ref is not None:
+        refs.add(ref)
+    elif isinstance(value, dict):
+        for item in value.values():
+            _collect_refs(item, refs)
+    elif isinstance(value, list):
+        for item in value:
+            _collect_refs(item, refs)
+
+
+def _timestamp(entry) -> float:
+    """Epoch seconds of an entry's ``timestamp`` (UTC); now when unknown."""
+    try:
+        moment = datetime.fromisoformat(entry["timestamp"])
+    except (KeyError, TypeError, ValueError):
+        return time.time()
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp()
+
+
+def _sweep_loop(ref: "weakref.ref[Memory]", stop: threading.Event, interval: float) -> None:
+    # Alleen een zwakke referentie, zodat de thread stopt als het geheugen
+    # zelf wordt opgeruimd.
+    while not stop.wait(interval):
+        memory = ref()
+        if memory is None:
+            return
+        memory.sweep()
+        del memory
 
 
 class Memory:
-    """Simple persistent memory storage using a JSON file."""
+    """Persistent memory storage backed by an append-only JSONL log.
 
-    def __init__(self, path: Path | None = None):
-        self.path = path or MEMORY_FILE
-        self.data: dict[str, list[dict]] = {}
+    Every ``add`` appends a single line ``{"user": ..., "entry": ...}`` to the
+    log, so the write cost only depends on the size of the entry. A per-user
+    index of ``(offset, length, timestamp)`` tuples is kept in RAM; ``get`` reads just the
+    lines of that user. ``compact`` rewrites the log grouped per user and stores
+    the index in a sidecar ``.idx`` file so a restart only scans the new tail.
+
+    Grote resultaten (objecten en lijsten vanaf ``blob_min_bytes``) staan één
+    keer in het log als ``{"blob": hash, "value": ...}`` en worden in de
+    entries vervangen door ``{"__blob__": hash}``. Zo wordt een agentresultaat
+    dat zowel door de agent als in de ``/auto/``-historie wordt bewaard maar
+    één keer geschreven; ``get`` vult de verwijzingen weer in en ``compact``
+    houdt alleen blobs over waar nog naar verwezen wordt.
+
+    Per gebruiker gelden ``max_entries``, ``max_bytes`` en ``ttl``: bij ``add``
+    worden de oudste entries van die gebruiker uit de index verwijderd, en
+    een achtergrondthread (``sweep_interval``) ruimt verlopen entries van alle
+    gebruikers op. Verwijderde regels tellen als onbruikbaar en verdwijnen
+    bij de volgende compactie; :meth:`retention_stats` telt de evictions.
+    De blobs waarnaar een gebruiker verwijst tellen (één keer) mee voor zijn
+    ``max_bytes``; verdwijnt de laatste verwijzing, dan telt ook de blob als
+    onbruikbaar.
+
+    Meerdere processen (uvicorn-workers) kunnen hetzelfde log delen: elke
+    bewerking houdt een ``flock`` op ``<pad>.lock`` vast en leest eerst bij
+    wat andere processen hebben toegevoegd. Elke compactie schrijft een nieuw
+    generatietoken in het lockbestand; ziet een proces een ander token (of
+    een ander bestand), dan worden index en bestandshandle opnieuw
+    opgebouwd. Zonder ``fcntl`` (Windows) is alleen gebruik vanuit
+    één proces veilig.
+    """
+
+    def __init__(
+        self,
+        path: Path | None = None,
+        max_entries: int = MAX_ENTRIES,
+        max_bytes: int = MAX_BYTES,
+        ttl: float = TTL,
+        sweep_interval: float = SWEEP_INTERVAL,
+        blob_min_bytes: int = BLOB_MIN_BYTES,
+    ):
+        self.path = Path(path) if path else MEMORY_FILE
+        self.index_path = self.path.with_name(self.path.name + ".idx")
+        self.lock_path = self.path.with_name(self.path.name + ".lock")
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.sweep_interval = sweep_interval
+        self.blob_min_bytes = blob_min_bytes
+        # Per gebruiker: ``(offset, lengte, tijdstip, blobs)`` in volgorde van
+        # toevoegen; ``blobs`` zijn alle hashes waar de entry (ook via andere
+        # blobs) naar verwijst.
+        self._index: dict[str, list[tuple[int, int, float, tuple]]] = {}
+        # Bytes per gebruiker: de eigen regels plus elke blob waar nog een van
+        # zijn entries naar verwijst.
+        self._user_bytes: dict[str, int] = {}
+        self._user_refs: dict[str, Counter] = {}
+        # Blobs: hash -> ``(offset, lengte)`` van de blobregel, het aantal
+        # entries dat ernaar verwijst en de verwijzingen binnen de blob zelf.
+        self._blobs: dict[str, tuple[int, int]] = {}
+        self._refs: Counter = Counter()
+        self._nested: dict[str, tuple] = {}
+        # Blobs zonder verwijzingen; hun bytes zitten in ``_dead``.
+        self._orphans: set[str] = set()
+        self._size = 0
+        self._dead = 0
+        self._evicted: Counter = Counter()
+        self._evicted_bytes = 0
+        self._lock = threading.RLock()
+        self._fh = None
+        # Inode en compactiegeneratie van het ingelezen logbestand en de open
+        # ``flock``-handle.
+        self._inode: int | None = None
+        self._generation = ""
+        self._lock_fh = None
+        self._sweeper: threading.Thread | None = None
+        self._stop = threading.Event()
+        with self._exclusive():
+            if path is None and not self.path.exists() and LEGACY_MEMORY_FILE.exists():
+                self._migrate(LEGACY_MEMORY_FILE)
+                self._sync(self._generation)
+
+    # -- gedeeld gebruik door meerdere processen -----------------------------
+
+    @contextmanager
+    def _exclusive(self):
+        """Thread lock plus inter-process ``flock``; syncs with the file first."""
+        with self._lock:
+            if self._lock_fh is not None:  # al vastgehouden door deze thread
+                yield
+                return
+            self.lock_path.parent.mkdir(parents=True, exist_ok=True)
+            self._lock_fh = self.lock_path.open("a+")
+            try:
+                if fcntl is not None:
+                    fcntl.flock(self._lock_fh, fcntl.LOCK_EX)
+                self._lock_fh.seek(0)
+                self._sync(self._lock_fh.read().strip())
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(self._lock_fh, fcntl.LOCK_UN)
+                self._lock_fh.close()
+                self._lock_fh = None
+
+    def _sync(self, generation: str) -> None:
+        """Pick up what other processes did since our last operation."""
+        try:
+            stat = self.path.stat()
+        except FileNotFoundError:
+            return
+        if stat.st_ino != self._inode or generation != self._generation:
+            # Eerste keer, of een ander proces heeft gecompacteerd. Het token
+            # is nodig omdat een nieuw bestand een vrijgekomen inode kan krijgen.
+            self._generation = generation
+            self._reload()
+        elif stat.st_size > self._size:
+            users = self._scan(self._size)
+            self._orphan_unreferenced()
+            for user in users:
+                self._enforce(user)
+
+    def _reload(self) -> None:
+        self._close()
+        self._index = {}
+        self._user_bytes = {}
+        self._user_refs = {}
+        self._blobs = {}
+        self._refs = Counter()
+        self._nested = {}
+        self._orphans = set()
+        self._size = 0
+        self._dead = 0
         self._load()
+        self._inode = self.path.stat().st_ino
+        self._orphan_unreferenced()
+        # Ook na een herstart: regels die al verwijderd waren (maar nog niet
+        # gecompacteerd) vallen opnieuw af.
+        for user in list(self._index):
+            self._enforce(user)
+
+    # -- opbouw index -----------------------------------------------------
 
     def _load(self) -> None:
-        if self.path.exists():
-            try:
-                self.data = json.loads(self.path.read_text())
-            except Exception:
-                self.data = {}
+        if not self.path.exists():
+            return
+        if self._is_legacy(self.path):
+            self._migrate(self.path)
+        start = self._load_index_file()
+        self._scan(start)
+
+    @staticmethod
+    def _is_legacy(path: Path) -> bool:
+        """Return ``True`` for the old format: one JSON object ``{user: [...]}``."""
+        with path.open("rb") as f:
+            first = f.readline()
+            rest = f.read(1)
+        if not first.strip() or rest:
+            return False
+        try:
+            obj = json.loads(first)
+        except ValueError:
+            return False
+        return isinstance(obj, dict) and not {"user", "entry"} <= obj.keys() and "blob" not in obj
+
+    def _migrate(self, legacy: Path) -> None:
+        try:
+            data = json.loads(legacy.read_text())
+        except Exception:
+            data = {}
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        tmp.parent.mkdir(parents=True, exist_ok=True)
+        with tmp.open("wb") as f:
+            for user, entries in (data or {}).items():
+                for entry in entries:
+                    f.write(self._encode(user, entry))
+        os.replace(tmp, self.path)
+        if self.index_path.exists():
+            self.index_path.unlink()
+        if legacy != self.path:
+            legacy.unlink()
+
+    def _load_index_file(self) -> int:
+        if not self.index_path.exists():
+            return 0
+        try:
+            meta = json.loads(self.index_path.read_text())
+            size = int(meta["size"])
+            index = {u: [tuple(p) for p in ptrs] for u, ptrs in meta["users"].items()}
+        except Exception:
+            return 0
+        if size > self.path.stat().st_size:
+            return 0
+        if any(len(p) != 4 for ptrs in index.values() for p in ptrs):
+            # Index van vóór het bewaarbeleid (zonder tijdstip) of zonder
+            # blobverwijzingen: opnieuw scannen.
+            return 0
+        self._blobs = {h: tuple(p) for h, p in meta.get("blobs", {}).items()}
+        for user, ptrs in index.items():
+            pointers = self._index[user] = []
+            for offset, length, stamp, refs in ptrs:
+                pointers.append((offset, length, stamp, tuple(refs)))
+                self._track(user, length, tuple(refs))
+        self._size = size
+        self._dead = int(meta.get("dead", 0))
+        return size
+
+    def _scan(self, start: int) -> set[str]:
+        """Index the lines from ``start`` on; returns the users seen."""
+        users: set[str] = set()
+        with self.path.open("rb") as f, self.path.open("rb") as blobs:
+            f.seek(start)
+            offset = start
+            for line in f:
+                length = len(line)
+                record = self._decode(line)
+                if record is None:
+                    self._dead += length
+                elif "blob" in record:
+                    self._blobs[record["blob"]] = (offset, length)
+                    nested: set = set()
+                    _collect_refs(record["value"], nested)
+                    if nested:
+                        self._nested[record["blob"]] = tuple(nested)
+                else:
+                    user = record["user"]
+                    users.add(user)
+                    refs: set = set()
+                    _collect_refs(record.get("entry"), refs)
+                    refs = self._closure(refs, blobs)
+                    self._index.setdefault(user, []).append(
+                        (offset, length, _timestamp(record.get("entry")), refs)
+                    )
+                    self._track(user, length, refs)
+                offset += length
+        self._size = offset
+        return users
+
+    def _closure(self, refs: set, f) -> tuple:
+        """``refs`` plus every blob those blobs refer to (read from ``f``)."""
+        if not refs:
+            return ()
+        pending = list(refs)
+        seen = set(refs)
+        while pending:
+            digest = pending.pop()
+            nested = self._nested.get(digest)
+            if nested is None and digest in self._blobs:
+                offset, length = self._blobs[digest]
+                f.seek(offset)
+                record = self._decode(f.read(length))
+                found: set = set()
+                if record is not None:
+                    _collect_refs(record["value"], found)
+                nested = self._nested[digest] = tuple(found)
+            for ref in nested or ():
+                if ref not in seen:
+                    seen.add(ref)
+                    pending.append(ref)
+        return tuple(seen)
+
+    # -- codering ----------------------------------------------------------
+
+    @staticmethod
+    def _encode(user: str, entry: dict) -> bytes:
+        return (json.dumps({"user": user, "entry": entry}) + "\n").encode()
+
+    @staticmethod
+    def _decode(line: bytes) -> dict | None:
+        if not line.endswith(b"\n"):
+            return None
+        try:
+            record = json.loads(line)
+        except ValueError:
+            return None
+        if not isinstance(record, dict) or not ("user" in record or "blob" in record):
+            return None
+        return record
+
+    def _externalize(self, value, blobs: dict[str, str]):
+        """Replace large objects in ``value`` (bottom-up) by blob references."""
+        return self._externalize_sized(value, blobs)[0]
+
+    def _externalize_sized(self, value, blobs: dict[str, str]) -> tuple:
+        # Geeft ook het aantal verwijzingen binnen ``value`` terug: die tellen
+        # niet mee voor de drempel, zodat een object met alleen verwijzingen
+        # (zoals de ``output`` van ``/auto/``) gewoon in de entry blijft.
+        if isinstance(value, dict):
+            items = {k: self._externalize_sized(v, blobs) for k, v in value.items()}
+            value = {k: item[0] for k, item in items.items()}
+        elif isinstance(value, (list, tuple)):
+            items = dict(enumerate(self._externalize_sized(v, blobs) for v in value))
+            value = [item[0] for item in items.values()]
         else:
-            self.data = {}
+            return value, 0
+        refs = sum(item[1] for item in items.values())
+        text = _canonical(value)
+        if len(text) - refs * _REF_SIZE < self.blob_min_bytes:
+            return value, refs
+        digest = hashlib.sha256(text.encode()).hexdigest()
+        blobs[digest] = text
+        return {BLOB_KEY: digest}, 1
 
-    def _save(self) -> None:
-        self.path.parent.mkdir(parents=True, exist_ok=True)
-        self.path.write_text(json.dumps(self.data))
+    def _read_blob(self, f, digest: str, cache: dict):
+        if digest not in cache:
+            pointer = self._blobs.get(digest)
+            record = None
+            if pointer is not None:
+                f.seek(pointer[0])
+                record = self._decode(f.read(pointer[1]))
+            cache[digest] = record["value"] if record is not None else None
+        return cache[digest]
+
+    def _rehydrate(self, value, f, cache: dict):
+        ref = _blob_ref(value)
+        if ref is not None:
+            return self._rehydrate(self._read_blob(f, ref, cache), f, cache)
+        if isinstance(value, dict):
+            return {k: self._rehydrate(v, f, cache) for k, v in value.items()}
+        if isinstance(value, list):
+            return [self._rehydrate(v, f, cache) for v in value]
+        return value
+
+    # -- publieke API ------------------------------------------------------
 
     def add(self, user: str, entry: dict) -> None:
         """Add an entry for ``user`` and persist it."""
-        self.data.setdefault(user, []).append(
-            {"timestamp": datetime.utcnow().isoformat(), **entry}
+        now = time.time()
+        blobs: dict[str, str] = {}
+        if self.blob_min_bytes:
+            entry = {k: self._externalize(v, blobs) for k, v in entry.items()}
+        line = self._encode(
+            user, {"timestamp": datetime.utcnow().isoformat(), **entry}
         )
-        self._save()
+        with self._exclusive(), stage("memory", "add"):
+            if self._fh is None:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                self._fh = self.path.open("ab")
+                self._inode = os.fstat(self._fh.fileno()).st_ino
+                self._size = self._fh.tell()
+                if self._size and not self._ends_with_newline():
+                    # Een afgebroken laatste regel wordt afgesloten en als
+                    # onbruikbaar meegeteld.
+                    self._fh.write(b"\n")
+                    self._size += 1
+                    self._dead += 1
+            for digest, text in blobs.items():
+                if digest in self._blobs:
+                    continue
+                blob = f'{{"blob": "{digest}", "value": {text}}}\n'.encode()
+                self._fh.write(blob)
+                self._blobs[digest] = (self._size, len(blob))
+                self._size += len(blob)
+            self._fh.write(line)
+            self._fh.flush()
+            # ``blobs`` bevat ook de geneste blobs: precies de afsluiting.
+            refs = tuple(blobs)
+            self._index.setdefault(user, []).append((self._size, len(line), now, refs))
+            self._track(user, len(line), refs)
+            self._size += len(line)
+            self._enforce(user, now)
+            self._maybe_compact()
+        self._ensure_sweeper()
+
+    def _ends_with_newline(self) -> bool:
+        with self.path.open("rb") as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b"\n"
 
     def get(self, user: str) -> list[dict]:
-        return self.data.get(user, [])
+        entries = []
+        with self._exclusive():
+            pointers = self._index.get(user)
+            if not pointers:
+                return []
+            with self.path.open("rb") as f:
+                cache: dict = {}
+                for offset, length, _, _ in pointers:
+                    f.seek(offset)
+                    record = self._decode(f.read(length))
+                    if record is not None:
+                        entries.append(self._rehydrate(record["entry"], f, cache))
+        return entries
+
+    def users(self) -> list[str]:
+        with self._exclusive():
+            return list(self._index)
+
+    def size_bytes(self) -> int:
+        """Return the current size of the log file in bytes."""
+        return self._size
+
+    # -- bewaarbeleid --------------------------------------------------------
+
+    def _track(self, user: str, length: int, refs: tuple) -> None:
+        """Count a new entry of ``user`` and its blob references."""
+        counts = self._user_refs.setdefault(user, Counter())
+        added = length
+        for digest in refs:
+            size = self._blobs.get(digest, (0, 0))[1]
+            if not counts[digest]:
+                added += size
+            counts[digest] += 1
+            if digest in self._orphans:
+                # Opnieuw gebruikt vóór de compactie: weer levend.
+                self._orphans.discard(digest)
+                self._dead -= size
+            self._refs[digest] += 1
+        self._user_bytes[user] = self._user_bytes.get(user, 0) + added
+
+    def _untrack(self, user: str, length: int, refs: tuple) -> int:
+        """Drop an entry of ``user``; returns the bytes it freed for the user."""
+        counts = self._user_refs[user]
+        freed = length
+        self._dead += length
+        for digest in refs:
+            size = self._blobs.get(digest, (0, 0))[1]
+            counts[digest] -= 1
+            if not counts[digest]:
+                del counts[digest]
+                freed += size
+            self._refs[digest] -= 1
+            if not self._refs[digest]:
+                del self._refs[digest]
+                if digest in self._blobs:
+                    self._orphans.add(digest)
+                    self._dead += size
+        self._user_bytes[user] -= freed
+        return freed
+
+    def _orphan_unreferenced(self) -> None:
+        # Blobs zonder enige verwijzing, bijvoorbeeld na een afgebroken ``add``.
+        for digest, (_, length) in self._blobs.items():
+            if not self._refs[digest] and digest not in self._orphans:
+                self._orphans.add(digest)
+                self._dead += length
+
+    def _evict(self, user: str, count: int, reason: str) -> None:
+        pointers = self._index[user]
+        freed = sum(self._untrack(user, length, refs) for _, length, _, refs in pointers[:count])
+        del pointers[:count]
+        self._evicted[reason] += count
+        self._evicted_bytes += freed
+        if not pointers:
+            del self._index[user]
+            del self._user_bytes[user]
+            del self._user_refs[user]
+
+    def _enforce(self, user: str, now: float | None = None) -> None:
+        """Drop the oldest entries of ``user`` that violate the policy."""
+        pointers = self._index.get(user)
+        if not pointers:
+            return
+        if self.ttl:
+            cutoff = (now or time.time()) - self.ttl
+            expired = 0
+            while expired < len(pointers) and pointers[expired][2] < cutoff:
+                expired += 1
+            if expired:
+                self._evict(user, expired, "ttl")
+        if self.max_entries and user in self._index and len(pointers) > self.max_entries:
+            self._evict(user, len(pointers) - self.max_entries, "entries")
+        # Per entry, omdat een gedeelde blob pas vrijkomt bij de laatste
+        # verwijzing van de gebruiker.
+        while self.max_bytes and user in self._index and self._user_bytes[user] > self.max_bytes:
+            self._evict(user, 1, "bytes")
+
+    def sweep(self) -> None:
+        """Apply the retention policy to every user and compact if needed."""
+        now = time.time()
+        with self._exclusive(), stage("memory", "sweep"):
+            for user in list(self._index):
+                self._enforce(user, now)
+            self._maybe_compact()
+
+    def _ensure_sweeper(self) -> None:
+        if self._sweeper is not None or not self.sweep_interval or not self.ttl:
+            return
+        with self._lock:
+            if self._sweeper is None:
+                self._sweeper = threading.Thread(
+                    target=_sweep_loop,
+                    args=(weakref.ref(self), self._stop, self.sweep_interval),
+                    name="hrcopilot-memory-sweeper",
+                    daemon=True,
+                )
+                self._sweeper.start()
+
+    def retention_stats(self) -> dict:
+        with self._lock:
+            return {
+                "users": len(self._index),
+                "entries": sum(len(p) for p in self._index.values()),
+                "live_bytes": sum(self._user_bytes.values()),
+                "dead_bytes": self._dead,
+                "blobs": len(self._blobs),
+                "blob_bytes": sum(length for _, length in self._blobs.values()),
+                "evicted_entries": sum(self._evicted.values()),
+                "evicted_bytes": self._evicted_bytes,
+                "evicted_by": dict(self._evicted),
+            }
+
+    def compact(self) -> None:
+        """Rewrite the log grouped per user and drop unreadable lines.
+
+        Blobs waar geen entry meer naar verwijst worden daarbij verwijderd.
+        """
+        with self._exclusive():
+            if not self.path.exists():
+                return
+            self._close()
+            tmp = self.path.with_name(self.path.name + ".tmp")
+            index: dict[str, list[tuple[int, int, float, tuple]]] = {}
+            blobs: dict[str, tuple[int, int]] = {}
+            offset = 0
+            with self.path.open("rb") as src, tmp.open("wb") as dst:
+                for digest in [d for d in self._blobs if self._refs[d]]:
+                    old_offset, length = self._blobs[digest]
+                    src.seek(old_offset)
+                    dst.write(src.read(length))
+                    blobs[digest] = (offset, length)
+                    offset += length
+                for user, pointers in self._index.items():
+                    for old_offset, length, stamp, refs in pointers:
+                        src.seek(old_offset)
+                        line = src.read(length)
+                        if self._decode(line) is None:
+                            self._untrack(user, length, refs)
+                            continue
+                        dst.write(line)
+                        index.setdefault(user, []).append((offset, length, stamp, refs))
+                        offset += length
+            os.replace(tmp, self.path)
+            self._inode = self.path.stat().st_ino
+            self._generation = uuid.uuid4().hex
+            self._lock_fh.truncate(0)
+            self._lock_fh.write(self._generation)
+            self._lock_fh.flush()
+            for user in self._index.keys() - index.keys():
+                del self._user_bytes[user], self._user_refs[user]
+            self._index = index
+            self._blobs = blobs
+            self._nested = {d: n for d, n in self._nested.items() if d in blobs}
+            self._orphans = set()
+            self._size = offset
+            self._dead = 0
+            self._orphan_unreferenced()
+            self._write_index_file()
+
+    def _write_index_file(self) -> None:
+        tmp = self.index_path.with_name(self.index_path.name + ".tmp")
+        tmp.write_text(
+            json.dumps(
+                {"size": self._size, "dead": self._dead, "users": self._index, "blobs": self._blobs}
+            )
+        )
+        os.replace(tmp, self.index_path)
+
+    def _maybe_compact(self) -> None:
+        if self._dead >= COMPACT_MIN_BYTES and self._dead > self._size * COMPACT_RATIO:
+            self.compact()
+
+    def _close(self) -> None:
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+
+    def close(self) -> None:
+        self._stop.set()
+        with self._lock:
+            self._close()
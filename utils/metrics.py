@@ -0,0 +1,365 @@
+"""In-process metrics in het Prometheus-tekstformaat.
+
+Histogrammen en tellers worden in het geheugen bijgehouden (één lock en een
+``bisect`` per waarneming); gauges zoals cachetreffers, wachtrijlengte en
+geheugengrootte worden pas bij het uitlezen van ``/metrics`` opgehaald.
+
+* :data:`REQUEST_SECONDS` – latency per route (:class:`MetricsMiddleware`).
+* :data:`AGENT_SECONDS` – looptijd van ``handle`` per agent in ``/auto/``.
+* :data:`STAGE_SECONDS` – stappen binnen een analyse, via :func:`stage` en
+  :func:`timed_blocks`.
+* :data:`LOOP_LAG_SECONDS` – hoe veel later dan gepland de event loop een
+  taak oppakt (:func:`monitor_loop_lag`).
+
+Met ``HRCOPILOT_METRICS=0`` worden geen waarnemingen meer vastgelegd.
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+import threading
+from bisect import bisect_left
+from time import perf_counter
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+METRICS_ENABLED = os.environ.get("HRCOPILOT_METRICS", "1") != "0"
+# Meetinterval (seconden) voor de vertraging van de event loop; 0 = uit.
+LOOP_LAG_INTERVAL = float(os.environ.get("HRCOPILOT_LOOP_LAG_INTERVAL", 0.1))
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+Samples = Iterable[Tuple[Dict[str, str], float]]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Timer:
+    __slots__ = ("histogram", "labels", "exclude", "start")
+
+    def __init__(self, histogram: "Histogram", labels: Tuple[str, ...], exclude=None):
+        self.histogram = histogram
+        self.labels = labels
+        self.exclude = exclude
+
+    def __enter__(self) -> "_Timer":
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        elapsed = perf_counter() - self.start
+        if self.exclude is not None:
+            elapsed -= self.exclude.elapsed
+        self.histogram.observe(elapsed, *self.labels)
+
+
+class Counter:
+    """Monotone teller per combinatie van labelwaarden."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        if not METRICS_ENABLED:
+            return
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0)
+
+    def collect(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [
+            f"{self.name}{_labels(dict(zip(self.labelnames, key)))} {_number(value)}"
+            for key, value in items
+        ]
+
+
+class Histogram:
+    """Histogram met vaste bucketgrenzen per combinatie van labelwaarden."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per labelcombinatie: [telling per bucket (+Inf als laatste), som].
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str) -> None:
+        if not METRICS_ENABLED:
+            return
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def time(self, *labels: str) -> _Timer:
+        """Context manager that observes the elapsed time of its block."""
+        return _Timer(self, labels)
+
+    def count(self, *labels: str) -> int:
+        series = self._series.get(labels)
+        return sum(series[0]) if series else 0
+
+    def total(self, *labels: str) -> float:
+        series = self._series.get(labels)
+        return series[1] if series else 0.0
+
+    def collect(self) -> List[str]:
+        with self._lock:
+            items = [(key, list(counts), total) for key, (counts, total) in self._series.items()]
+        lines = []
+        for key, counts, total in items:
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                bucket = _labels({**labels, "le": _number(bound)})
+                lines.append(f"{self.name}_bucket{bucket} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(labels)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(labels)} {cumulative}")
+        return lines
+
+
+class Gauge:
+    """Waarde die bij het uitlezen door ``collect`` wordt opgehaald."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, collect: Callable[[], Samples]):
+        self.name = name
+        self.help = help
+        self._collect = collect
+
+    def collect(self) -> List[str]:
+        try:
+            samples = list(self._collect())
+        except Exception:
+            return []
+        return [
+            f"{self.name}{_labels(labels)} {_number(value)}"
+            for labels, value in samples
+            if value is not None
+        ]
+
+
+class Registry:
+    """Verzameling metrics die samen als tekst worden geëxporteerd."""
+
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def _add(self, metric):
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def histogram(
+        self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self._add(Histogram(name, help, labelnames, buckets))
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._add(Counter(name, help, labelnames))
+
+    def gauge(self, name: str, help: str, collect: Callable[[], Samples]) -> Gauge:
+        """Register (or replace) a gauge whose samples come from ``collect``."""
+        gauge = Gauge(name, help, collect)
+        with self._lock:
+            self._metrics[name] = gauge
+        return gauge
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for metric in metrics:
+            samples = metric.collect()
+            if not samples:
+                continue
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(samples)
+        return "\n".join(lines) + "\n"
+
+
+METRICS = Registry()
+
+REQUEST_SECONDS = METRICS.histogram(
+    "hrcopilot_request_seconds", "Latency per route.", ("route", "method", "status")
+)
+AGENT_SECONDS = METRICS.histogram(
+    "hrcopilot_agent_seconds", "Duration of agent handle calls in /auto/.", ("agent",)
+)
+AGENT_TIMEOUTS = METRICS.counter(
+    "hrcopilot_agent_timeouts_total", "Agents that exceeded their timeout in /auto/.", ("agent",)
+)
+STAGE_SECONDS = METRICS.histogram(
+    "hrcopilot_stage_seconds", "Duration of stages within an analysis.", ("component", "stage")
+)
+LOOP_LAG_SECONDS = METRICS.histogram(
+    "hrcopilot_event_loop_lag_seconds",
+    "Delay of the event loop beyond the scheduled wake-up.",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+
+_CACHES: Dict[str, object] = {}
+
+
+async def monitor_loop_lag(
+    interval: float = LOOP_LAG_INTERVAL, histogram: Histogram = LOOP_LAG_SECONDS
+) -> None:
+    """Meet iedere ``interval`` seconden hoe laat de event loop wakker wordt.
+
+    Blokkerend werk op de loop (of een overvolle loop) verschijnt als lag;
+    draai als achtergrondtaak en annuleer bij het afsluiten.
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        histogram.observe(max(0.0, loop.time() - start - interval))
+
+
+def stage(component: str, name: str, exclude: Optional["timed_blocks"] = None) -> _Timer:
+    """``with stage("legalcheck", "scan"): ...`` legt de duur van het blok vast.
+
+    Met ``exclude`` wordt de tijd die in die :class:`timed_blocks`-bron is
+    doorgebracht (bijv. extractie) van de duur afgetrokken.
+    """
+    return _Timer(STAGE_SECONDS, (component, name), exclude)
+
+
+class timed_blocks:
+    """Iterator over ``blocks`` die de tijd in de bron zelf meet.
+
+    Zo is bij gestreamde verwerking de extractie (het produceren van de
+    blokken) te scheiden van het scannen. ``elapsed`` bevat de tijd tot nu
+    toe; bij uitputten van de bron wordt die als stap vastgelegd.
+    """
+
+    def __init__(self, blocks: Iterable[str], component: str, name: str):
+        self._blocks = iter(blocks)
+        self.component = component
+        self.name = name
+        self.elapsed = 0.0
+        self._done = False
+
+    def __iter__(self) -> Iterator[str]:
+        return self
+
+    def __next__(self) -> str:
+        start = perf_counter()
+        try:
+            return next(self._blocks)
+        except StopIteration:
+            if not self._done:
+                self._done = True
+                STAGE_SECONDS.observe(self.elapsed + perf_counter() - start, self.component, self.name)
+            raise
+        finally:
+            self.elapsed += perf_counter() - start
+
+    def close(self) -> None:
+        """Stop early: close the source and record the time spent so far."""
+        close = getattr(self._blocks, "close", None)
+        if close is not None:
+            close()
+        if not self._done:
+            self._done = True
+            STAGE_SECONDS.observe(self.elapsed, self.component, self.name)
+
+
+def register_cache(name: str, cache) -> None:
+    """Exporteer de ``stats()`` van ``cache`` (LRUCache of ResultCache)."""
+    _CACHES[name] = cache
+
+
+def _cache_samples(field: str) -> Samples:
+    for name, cache in list(_CACHES.items()):
+        yield {"cache": name}, cache.stats().get(field)
+
+
+for _field, _kind, _help in (
+    ("hits", "hits", "Cache hits."),
+    ("misses", "misses", "Cache misses."),
+    ("hit_ratio", "hit_ratio", "Share of lookups answered from the cache."),
+    ("entries", "entries", "Entries currently cached."),
+    ("bytes", "bytes", "Bytes currently cached."),
+):
+    METRICS.gauge(f"hrcopilot_cache_{_kind}", _help, lambda field=_field: _cache_samples(field))
+
+
+def value_gauge(name: str, help: str, func: Callable[[], Optional[float]]) -> Gauge:
+    """Gauge zonder labels waarvan de waarde bij het uitlezen wordt berekend."""
+    return METRICS.gauge(name, help, lambda: [({}, func())])
+
+
+def route_label(scope) -> str:
+    """Het routepatroon (``/upload/``) in plaats van het pad, om het aantal
+    labelwaarden begrensd te houden."""
+    route = scope.get("route")
+    return getattr(route, "path", None) or "onbekend"
+
+
+class MetricsMiddleware:
+    """ASGI middleware die de latency per route en statuscode vastlegt."""
+
+    def __init__(self, app, histogram: Histogram = REQUEST_SECONDS):
+        self.app = app
+        self.histogram = histogram
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+        status = "500"
+
+        async def record_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        start = perf_counter()
+        try:
+            await self.app(scope, receive, record_status)
+        finally:
+            self.histogram.observe(
+                perf_counter() - start, route_label(scope), scope.get("method", ""), status
+            )
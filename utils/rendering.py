@@ -0,0 +1,180 @@
+"""Voorverwarmde procespool voor het renderen van PDF-rapporten."""
+from __future__ import annotations
+
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Optional
+
+from .cache import LRUCache, content_hash
+
+RENDER_WORKERS = int(os.environ.get("HRCOPILOT_RENDER_WORKERS", 2))
+
+_HTML = None
+_STYLESHEETS: list = []
+_FONT_CONFIG = None
+
+BASE_CSS = "body { font-family: sans-serif; font-size: 11pt; }"
+
+
+def _init_worker() -> None:
+    """Import WeasyPrint once per worker and keep fonts and CSS loaded."""
+    global _HTML, _STYLESHEETS, _FONT_CONFIG
+    try:
+        from weasyprint import CSS, HTML
+        from weasyprint.text.fonts import FontConfiguration
+
+        _FONT_CONFIG = FontConfiguration()
+        _STYLESHEETS = [CSS(string=BASE_CSS, font_config=_FONT_CONFIG)]
+        _HTML = HTML
+        # Eén kleine render laadt fonts en layoutcaches alvast in.
+        render_pdf("warm-up")
+    except Exception:
+        # Bijv. ontbrekende systeembibliotheken; de fout volgt bij de render.
+        _HTML = None
+
+
+def markdown_to_html(markdown: str) -> str:
+    return markdown.replace("\n", "<br>")
+
+
+def render_pdf(markdown: str) -> bytes:
+    """Render markdown to PDF bytes in the current process."""
+    global _HTML
+    if _HTML is None:
+        from weasyprint import HTML
+
+        _HTML = HTML
+    html = _HTML(string=markdown_to_html(markdown))
+    return html.write_pdf(stylesheets=_STYLESHEETS or None, font_config=_FONT_CONFIG)
+
+
+class PDFRenderer:
+    """Render PDFs in dedicated, pre-warmed worker processes.
+
+    :meth:`submit` geeft een ``Future`` terug; identieke markdown wordt uit
+    een LRU-cache (sleutel: hash van de markdown) geserveerd zonder opnieuw te
+    renderen. Met ``workers=0`` wordt in het aanroepende proces gerenderd.
+    Sterft een worker (bijv. OOM-kill), dan raakt de hele pool onbruikbaar;
+    de renderer bouwt hem dan opnieuw op en probeert de render één keer
+    opnieuw.
+    """
+
+    def __init__(
+        self,
+        workers: int = RENDER_WORKERS,
+        render_func: Callable[[str], bytes] = render_pdf,
+        initializer: Optional[Callable[[], None]] = _init_worker,
+        cache: Optional[LRUCache] = None,
+    ):
+        self.workers = max(0, workers)
+        self.render_func = render_func
+        self.initializer = initializer
+        self.cache = cache if cache is not None else LRUCache(max_entries=256, max_bytes=32 * 1024 * 1024)
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=self.initializer,
+                )
+            return self._pool
+
+    def _discard(self, pool: ProcessPoolExecutor) -> None:
+        """Forget a broken pool so the next :meth:`_executor` builds a new one."""
+        with self._lock:
+            if self._pool is pool:
+                self._pool = None
+        pool.shutdown(wait=False)
+
+    def _pool_submit(self, markdown: str, retry: bool = True) -> "Future[bytes]":
+        pool = self._executor()
+        try:
+            inner = pool.submit(self.render_func, markdown)
+        except BrokenProcessPool:
+            self._discard(pool)
+            if not retry:
+                raise
+            return self._pool_submit(markdown, retry=False)
+        if not retry:
+            return inner
+
+        outer: Future = Future()
+
+        def relay(f: Future) -> None:
+            if f.cancelled():
+                outer.cancel()
+                return
+            exc = f.exception()
+            if isinstance(exc, BrokenProcessPool):
+                self._discard(pool)
+                try:
+                    f = self._pool_submit(markdown, retry=False)
+                except Exception as retry_exc:
+                    outer.set_exception(retry_exc)
+                    return
+                f.add_done_callback(lambda g: _copy_outcome(g, outer))
+            else:
+                _copy_outcome(f, outer)
+
+        inner.add_done_callback(relay)
+        return outer
+
+    def warm_up(self) -> None:
+        """Start all workers now instead of on the first request."""
+        if not self.workers:
+            return
+        pool = self._executor()
+        for future in [pool.submit(os.getpid) for _ in range(self.workers)]:
+            future.result()
+
+    def submit(self, markdown: str) -> "Future[bytes]":
+        key = content_hash(markdown.encode())
+        cached = self.cache.get(key)
+        if cached is not None:
+            done: Future = Future()
+            done.set_result(cached)
+            return done
+
+        if self.workers:
+            future = self._pool_submit(markdown)
+        else:
+            future = Future()
+            try:
+                future.set_result(self.render_func(markdown))
+            except Exception as exc:
+                future.set_exception(exc)
+
+        def store(f: Future) -> None:
+            if not f.cancelled() and f.exception() is None:
+                self.cache.set(key, f.result())
+
+        future.add_done_callback(store)
+        return future
+
+    def render(self, markdown: str) -> bytes:
+        return self.submit(markdown).result()
+
+    def shutdown(self, wait: bool = True) -> None:
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=wait)
+
+
+def _copy_outcome(source: Future, target: Future) -> None:
+    if source.cancelled():
+        target.cancel()
+    elif source.exception() is not None:
+        target.set_exception(source.exception())
+    else:
+        target.set_result(source.result())
+
+
+PDF_RENDERER = PDFRenderer()
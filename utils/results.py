@@ -0,0 +1,188 @@
+"""Resultaatcache voor deterministische analyses.
+
+Dezelfde beleids-PDF wordt door tientallen managers gecontroleerd; met deze
+cache wordt zo'n analyse maar één keer uitgevoerd. De sleutel bestaat uit de
+agent, de hash van de inhoud, de parameters en de versie van de regelset.
+Resultaten staan als JSON in een LRU-cache in het proces en optioneel in een
+SQLite-bestand dat gedeeld wordt tussen workers en herstarts overleeft.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from .cache import LRUCache
+
+RESULT_CACHE_ENABLED = os.environ.get("HRCOPILOT_RESULT_CACHE", "1") != "0"
+# Levensduur van een resultaat in seconden (0 = verloopt niet).
+RESULT_TTL = float(os.environ.get("HRCOPILOT_RESULT_TTL", 3600))
+# Pad naar de SQLite-laag; leeg betekent alleen de cache in het geheugen.
+RESULT_DB = os.environ.get("HRCOPILOT_RESULT_DB", "")
+# Ophogen zodra triggers, drempels of adviesteksten wijzigen. Versie 2:
+# verzuimadvies dat onder gelijktijdigheid fout kon zijn (gedeelde ``random``)
+# wordt niet meer uit een gedeelde SQLite-laag geserveerd.
+RULESET_VERSION = os.environ.get("HRCOPILOT_RULESET_VERSION", "2")
+
+
+def result_key(agent: str, params: Dict[str, Any], version: str = RULESET_VERSION) -> str:
+    """Return the cache key for ``agent`` with ``params`` (incl. content hashes)."""
+    payload = json.dumps([agent, version, params], sort_keys=True, default=str)
+    return f"{agent}:{hashlib.sha256(payload.encode()).hexdigest()}"
+
+
+class SQLiteStore:
+    """Persistent tier: ``key -> (json, expires)`` in one SQLite table."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS results "
+            "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL)"
+        )
+
+    def get(self, key: str) -> Optional[Tuple[str, Optional[float]]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires FROM results WHERE key = ?", (key,)
+            ).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def set(self, key: str, value: str, expires: Optional[float]) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results (key, value, expires) VALUES (?, ?, ?)",
+                (key, value, expires),
+            )
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM results WHERE key = ?", (key,))
+
+    def purge_expired(self, now: Optional[float] = None) -> int:
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM results WHERE expires IS NOT NULL AND expires <= ?",
+                (now if now is not None else time.time(),),
+            )
+        return cursor.rowcount
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM results")
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class ResultCache:
+    """Two-tier cache for analysis results with TTL and hit/miss counters.
+
+    Waarden worden als JSON opgeslagen, zodat iedere aanroeper een eigen kopie
+    krijgt en een resultaat achteraf aanpassen de cache niet beïnvloedt. De
+    persistente laag (``store``) is uitwisselbaar: alles met ``get``, ``set``,
+    ``delete`` en ``clear`` zoals :class:`SQLiteStore` volstaat.
+    """
+
+    def __init__(
+        self,
+        memory: Optional[LRUCache] = None,
+        store: Optional[SQLiteStore] = None,
+        ttl: float = RESULT_TTL,
+        enabled: bool = RESULT_CACHE_ENABLED,
+    ):
+        self.memory = memory if memory is not None else LRUCache(
+            max_entries=1024, max_bytes=32 * 1024 * 1024, sizeof=lambda item: len(item[0])
+        )
+        self.store = store
+        self.ttl = ttl
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._counters = {"hits_memory": 0, "hits_store": 0, "misses": 0, "bypasses": 0, "expired": 0}
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._counters[name] += 1
+
+    def _expires(self) -> Optional[float]:
+        return time.time() + self.ttl if self.ttl else None
+
+    def get(self, key: str) -> Any:
+        """Return the cached value for ``key`` or ``None``."""
+        now = time.time()
+        expired = False
+        item = self.memory.get(key)
+        if item is not None:
+            value, expires = item
+            if expires is None or expires > now:
+                self._count("hits_memory")
+                return json.loads(value)
+            expired = True
+        if self.store is not None:
+            row = self.store.get(key)
+            if row is not None:
+                value, expires = row
+                if expires is None or expires > now:
+                    self.memory.set(key, (value, expires))
+                    self._count("hits_store")
+                    return json.loads(value)
+                self.store.delete(key)
+                expired = True
+        self._count("expired" if expired else "misses")
+        return None
+
+    def set(self, key: str, value: Any) -> None:
+        encoded = json.dumps(value, default=str)
+        expires = self._expires()
+        self.memory.set(key, (encoded, expires))
+        if self.store is not None:
+            self.store.set(key, encoded, expires)
+
+    def get_or_compute(self, key: str, compute: Callable[[], Any], bypass: bool = False) -> Any:
+        """Return the cached result or compute and store it.
+
+        Met ``bypass`` wordt altijd opnieuw berekend en het resultaat in de
+        cache ververst (bijv. bij een ``Cache-Control: no-cache`` request).
+        """
+        if not self.enabled:
+            return compute()
+        if bypass:
+            self._count("bypasses")
+        else:
+            cached = self.get(key)
+            if cached is not None:
+                return cached
+        value = compute()
+        self.set(key, value)
+        return value
+
+    def clear(self) -> None:
+        self.memory.clear()
+        if self.store is not None:
+            self.store.clear()
+        with self._lock:
+            for name in self._counters:
+                self._counters[name] = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            counters = dict(self._counters)
+        hits = counters["hits_memory"] + counters["hits_store"]
+        total = hits + counters["misses"] + counters["expired"]
+        return {
+            **counters,
+            "hits": hits,
+            "hit_ratio": hits / total if total else None,
+            "entries": len(self.memory),
+        }
+
+
+RESULT_CACHE = ResultCache(store=SQLiteStore(RESULT_DB) if RESULT_DB else None)
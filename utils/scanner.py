@@ -0,0 +1,145 @@
+"""Gecompileerde scanner voor vaste termen (kernwoorden, begrippen, triggers)."""
+from __future__ import annotations
+
+import re
+import string
+from collections import Counter
+from typing import Dict, Iterable, List, Optional
+
+WORD_PATTERN = re.compile(r"[a-z]{4,}")
+
+# Per term bewaarde posities; ``counts`` blijft wel alle treffers tellen.
+MAX_POSITIONS = 10_000
+
+
+def _trie_pattern(terms: Iterable[str]) -> str:
+    """Build a regex in trie form, so every position costs one character test."""
+    trie: dict = {}
+    for term in terms:
+        node = trie
+        for char in term:
+            node = node.setdefault(char, {})
+        node[""] = True
+
+    def build(node: dict) -> str:
+        branches = [re.escape(c) + build(child) for c, child in sorted(node.items()) if c]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        # Een term die hier eindigt maakt de rest optioneel (greedy: langste eerst).
+        return f"(?:{body})?" if "" in node else body
+
+    return build(trie)
+
+
+class TermScanner:
+    """Find a fixed set of terms (as substrings) and count words.
+
+    Alle termen zitten in één regex in trievorm; de tekst wordt één keer naar
+    kleine letters omgezet en daarna doorzocht op termen (met posities) en
+    woordfrequenties. Gebruik :meth:`scan` voor een complete tekst of
+    :meth:`session` om tekst in stukken aan te bieden (bijv. per pagina).
+    """
+
+    def __init__(
+        self,
+        terms: Iterable[str],
+        count_words: bool = True,
+        max_positions: Optional[int] = MAX_POSITIONS,
+    ):
+        self.count_words = count_words
+        self.max_positions = max_positions
+        self.terms = sorted({t.lower() for t in terms if t}, key=len, reverse=True)
+        self.max_len = max((len(t) for t in self.terms), default=1)
+        # De regex levert per positie alleen de langste term; kortere termen
+        # die daar ook beginnen zijn prefixen en worden hier vooraf gekoppeld.
+        self.prefixes: Dict[str, List[str]] = {
+            term: [t for t in self.terms if term.startswith(t)] for term in self.terms
+        }
+        self.pattern = re.compile(_trie_pattern(self.terms) if self.terms else r"(?!x)x")
+
+    def session(self) -> "ScanSession":
+        return ScanSession(self)
+
+    def scan(self, text: str) -> "ScanSession":
+        session = self.session()
+        session.feed(text)
+        session.finish()
+        return session
+
+
+class ScanSession:
+    """Incrementele scan; houdt een overlap aan tussen opeenvolgende stukken.
+
+    Posities verwijzen naar de tekst in kleine letters. Een term of woord dat
+    over de grens van twee stukken loopt wordt precies één keer geteld. Per
+    term worden maximaal ``max_positions`` posities bewaard, zodat een lange
+    stroom het geheugen niet laat groeien; ``counts`` telt alle treffers.
+    """
+
+    def __init__(self, scanner: TermScanner):
+        self.scanner = scanner
+        self.hits: Dict[str, List[int]] = {}
+        self.counts: Counter = Counter()
+        self.words: Counter = Counter()
+        self.length = 0
+        self._seen: set = set()
+        self._carry = ""
+        self._word_from = 0
+        self._finished = False
+
+    def feed(self, chunk: str) -> None:
+        buf = self._carry + chunk.lower()
+        base = self.length - len(self._carry)
+        # Een woord aan het eind van het stuk kan in het volgende doorlopen.
+        trailing = len(buf.rstrip(string.ascii_lowercase))
+        cut = max(0, min(len(buf) - (self.scanner.max_len - 1), trailing))
+
+        self._find_terms(buf, base, len(self._carry), cut)
+        if self.scanner.count_words:
+            self.words.update(WORD_PATTERN.findall(buf, self._word_from, trailing))
+
+        self._carry = buf[cut:]
+        self._word_from = trailing - cut
+        self.length = base + len(buf)
+
+    def finish(self) -> "ScanSession":
+        if not self._finished:
+            if self.scanner.count_words:
+                self.words.update(WORD_PATTERN.findall(self._carry, self._word_from))
+            self._carry = ""
+            self._finished = True
+        return self
+
+    def _find_terms(self, buf: str, base: int, overlap: int, cut: int) -> None:
+        prefixes = self.scanner.prefixes
+        search = self.scanner.pattern.search
+        limit = self.scanner.max_positions
+        seen, self._seen = self._seen, set()
+        match = search(buf)
+        while match is not None:
+            start = match.start()
+            for term in prefixes[match.group()]:
+                key = (term, base + start)
+                # Treffers in de overlap met het vorige stuk zijn mogelijk al
+                # geteld; treffers vanaf ``cut`` komen in de volgende overlap.
+                if start >= cut:
+                    self._seen.add(key)
+                if start < overlap and key in seen:
+                    continue
+                self.counts[term] += 1
+                positions = self.hits.setdefault(term, [])
+                if limit is None or len(positions) < limit:
+                    positions.append(base + start)
+            # Verder zoeken vanaf het volgende teken: termen mogen overlappen.
+            match = search(buf, start + 1)
+
+    def found(self, term: str) -> bool:
+        return term.lower() in self.hits
+
+    def positions(self, term: str) -> List[int]:
+        return self.hits.get(term.lower(), [])
+
+    def most_common_word(self, default: str = "algemeen") -> str:
+        common = self.words.most_common(1)
+        return common[0][0] if common else default
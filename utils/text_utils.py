@@ -1,7 +1,98 @@
-from typing import Iterable
+import threading
+from typing import Dict, FrozenSet, Iterable, Optional, Set, Tuple
+
+from .cache import LRUCache
+from .scanner import TermScanner
+
+# Aantal recente teksten waarvan de gevonden groepen bewaard blijven.
+RECENT_TEXTS = 16
 
 
 def text_matches(text: str, triggers: Iterable[str]) -> bool:
     """Return True if any trigger is present in lowercase ``text``."""
     lower = text.lower()
     return any(t in lower for t in triggers)
+
+
+class TriggerIndex:
+    """Single-pass matcher for the triggers of several groups (agents).
+
+    Alle triggers zitten in één :class:`~utils.scanner.TermScanner` (regex in
+    trievorm). De tekst wordt één keer naar kleine letters gezet en
+    doorzocht; het resultaat is de verzameling groepen waarvan minstens één
+    trigger als substring voorkomt, net als bij :func:`text_matches`. Het
+    resultaat wordt per tekst bewaard, zodat de ``match_terms`` van iedere
+    agentmodule de scan van ``matching_agents`` hergebruikt.
+    """
+
+    def __init__(self, groups: Optional[Dict[str, Iterable[str]]] = None):
+        self._groups: Dict[str, FrozenSet[str]] = {}
+        self._lock = threading.Lock()
+        self._scanner: Optional[TermScanner] = None
+        self._owners: Dict[str, FrozenSet[str]] = {}
+        self._recent = LRUCache(max_entries=RECENT_TEXTS)
+        for name, triggers in (groups or {}).items():
+            self.register(name, triggers)
+
+    def register(self, group: str, triggers: Iterable[str]) -> None:
+        """Register (or replace) the triggers of ``group``."""
+        with self._lock:
+            self._groups[group] = frozenset(t.lower() for t in triggers if t)
+            self._scanner = None
+            self._recent.clear()
+
+    @property
+    def groups(self) -> Dict[str, FrozenSet[str]]:
+        return dict(self._groups)
+
+    def _compile(self) -> Tuple[TermScanner, Dict[str, FrozenSet[str]]]:
+        with self._lock:
+            if self._scanner is None:
+                terms = {t for ts in self._groups.values() for t in ts}
+                self._owners = {
+                    term: frozenset(g for g, ts in self._groups.items() if term in ts)
+                    for term in terms
+                }
+                self._scanner = TermScanner(terms, count_words=False)
+            return self._scanner, self._owners
+
+    def matched_terms(self, text: str) -> Set[str]:
+        """Return every trigger that occurs in ``text``."""
+        return self._scan(text.lower(), stop_when_complete=False)[0]
+
+    def _scan(self, lower: str, stop_when_complete: bool = True) -> Tuple[Set[str], Set[str]]:
+        # De trie-regex levert per positie de langste term; ``prefixes`` geeft
+        # de kortere termen die daar ook beginnen. Zoeken vanaf het volgende
+        # teken vindt ook overlappende termen.
+        scanner, owners = self._compile()
+        search = scanner.pattern.search
+        prefixes = scanner.prefixes
+        every_group = set(self._groups) if stop_when_complete else None
+        terms: Set[str] = set()
+        found: Set[str] = set()
+        match = search(lower)
+        while match is not None:
+            term = match.group()
+            if term not in terms:
+                for prefix in prefixes[term]:
+                    terms.add(prefix)
+                    found |= owners[prefix]
+                if found == every_group:
+                    break
+            match = search(lower, match.start() + 1)
+        return terms, found
+
+    def matches(self, text: str) -> FrozenSet[str]:
+        """Return the names of all groups with at least one trigger in ``text``."""
+        found = self._recent.get(text)
+        if found is None:
+            found = frozenset(self._scan(text.lower())[1])
+            self._recent.set(text, found)
+        return found
+
+    def match(self, text: str, group: str) -> bool:
+        return group in self.matches(text)
+
+
+# Gedeelde index waarin elke agentmodule zijn ``TRIGGERS`` registreert.
+TRIGGER_INDEX = TriggerIndex()
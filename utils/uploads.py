@@ -0,0 +1,226 @@
+"""Grenzen en buffers voor uploads.
+
+* :class:`UploadLimitMiddleware` weigert requests boven de limiet per route
+  met ``413`` (op basis van ``Content-Length`` of tijdens het inlezen).
+* Multipart-bestanden worden boven ``SPOOL_MAX_BYTES`` naar schijf gespoold
+  (zie :func:`configure_spooling`).
+* :class:`SharedUpload` leest een upload één keer in; alle agents delen
+  daarna dezelfde onveranderlijke buffer in plaats van zelf te lezen en te
+  seeken. Uploads vanaf ``STREAM_MIN_BYTES`` blijven op schijf: dan delen de
+  agents het gespoolde bestand.
+"""
+from __future__ import annotations
+
+import io
+import os
+import threading
+import weakref
+from functools import cached_property
+from io import BytesIO
+from typing import Any, Dict, Optional
+
+from fastapi import HTTPException
+from starlette.formparsers import MultiPartParser
+from starlette.responses import JSONResponse
+
+from .cache import content_hash, file_hash
+from .executor import _parse_limits
+
+MAX_UPLOAD_BYTES = int(os.environ.get("HRCOPILOT_MAX_UPLOAD_BYTES", 200 * 1024 * 1024))
+# Per route, bijv. ``upload=20000000,batch_upload=200000000`` (bytes).
+UPLOAD_LIMITS = _parse_limits(os.environ.get("HRCOPILOT_UPLOAD_LIMITS", ""))
+# Uploads tot deze grootte blijven in het geheugen, grotere gaan naar schijf.
+SPOOL_MAX_BYTES = int(os.environ.get("HRCOPILOT_SPOOL_MAX_BYTES", 1024 * 1024))
+# Uploads vanaf deze grootte worden direct uit het (gespoolde) uploadbestand
+# gestreamd in plaats van eerst volledig in het geheugen gelezen.
+STREAM_MIN_BYTES = int(os.environ.get("HRCOPILOT_STREAM_MIN_BYTES", 8 * 1024 * 1024))
+
+TOO_LARGE = "upload te groot"
+
+
+def configure_spooling(max_bytes: int = SPOOL_MAX_BYTES) -> None:
+    """Spool multipart files above ``max_bytes`` to disk.
+
+    Starlette kent hiervoor alleen een klasse-attribuut, dus dit geldt voor
+    het hele proces; de app roept het bij het opbouwen expliciet aan.
+    """
+    MultiPartParser.spool_max_size = max_bytes
+
+
+def route_name(path: str) -> str:
+    """``/batch_upload/`` -> ``batch_upload`` (zelfde namen als de executor)."""
+    return path.strip("/").split("/", 1)[0]
+
+
+class UploadLimitMiddleware:
+    """ASGI middleware that caps the request body size per route."""
+
+    def __init__(
+        self,
+        app,
+        max_bytes: int = MAX_UPLOAD_BYTES,
+        route_limits: Optional[Dict[str, int]] = None,
+    ):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.route_limits = dict(UPLOAD_LIMITS if route_limits is None else route_limits)
+
+    def limit_for(self, path: str) -> int:
+        return self.route_limits.get(route_name(path), self.max_bytes)
+
+    async def __call__(self, scope, receive, send):
+        limit = self.limit_for(scope.get("path", "")) if scope["type"] == "http" else 0
+        if not limit:
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        length = headers.get(b"content-length")
+        if length is not None and length.isdigit() and int(length) > limit:
+            response = JSONResponse(
+                status_code=413, content={"error": TOO_LARGE, "limiet": limit}
+            )
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            # Zonder (juiste) Content-Length wordt tijdens het lezen geteld;
+            # FastAPI zet de HTTPException om in een 413-antwoord.
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    raise HTTPException(status_code=413, detail=TOO_LARGE)
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+class _SpoolReader(io.RawIOBase):
+    """Read-only view on a file descriptor with its own position.
+
+    Leest met ``os.pread``, zodat meerdere lezers tegelijk hetzelfde bestand
+    lezen zonder elkaars (gedeelde) offset te verschuiven.
+    """
+
+    def __init__(self, fd: int, size: int):
+        self._fd = fd
+        self._size = size
+        self._pos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        data = os.pread(self._fd, len(buffer), self._pos)
+        buffer[: len(data)] = data
+        self._pos += len(data)
+        return len(data)
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        base = {os.SEEK_SET: 0, os.SEEK_CUR: self._pos, os.SEEK_END: self._size}[whence]
+        self._pos = max(0, base + offset)
+        return self._pos
+
+    def tell(self) -> int:
+        return self._pos
+
+
+class SharedUpload:
+    """An upload read once into an immutable buffer and shared by agents.
+
+    Gedraagt zich voor de agents als een ``UploadFile``: ``filename``,
+    ``headers`` en ``content_type`` blijven gelijk. ``view`` is een
+    ``memoryview`` op de inhoud (hashen en slicen zonder kopie) en ``data``
+    de bytes zelf. Iedere toegang tot ``file`` geeft een nieuwe lezer op
+    dezelfde inhoud, zodat gelijktijdige lezers elkaars positie niet
+    verschuiven.
+
+    Met ``fd`` (uploads vanaf ``STREAM_MIN_BYTES``) blijft de inhoud in het
+    gespoolde bestand: ``file`` leest daar direct uit en ``data`` wordt pas
+    bij de eerste toegang ingelezen. De eigen kopie van de descriptor houdt
+    het bestand open nadat FastAPI de upload na de request sluit.
+    """
+
+    def __init__(
+        self,
+        filename: Optional[str],
+        data: bytes = b"",
+        headers: Any = None,
+        content_type: Optional[str] = None,
+        fd: Optional[int] = None,
+    ):
+        self.filename = filename
+        self.headers = headers
+        self.content_type = content_type
+        self._fd = fd
+        self._lock = threading.Lock()
+        if fd is None:
+            self._data: Optional[bytes] = bytes(data)
+            self.size = len(self._data)
+        else:
+            self._data = None
+            self.size = os.fstat(fd).st_size
+            weakref.finalize(self, os.close, fd)
+
+    @classmethod
+    def from_upload(cls, upload) -> "SharedUpload":
+        """Read ``upload`` (an ``UploadFile``) once, straight from its spool."""
+        if isinstance(upload, cls):
+            return upload
+        meta = {
+            "headers": getattr(upload, "headers", None),
+            "content_type": getattr(upload, "content_type", None),
+        }
+        source = upload.file
+        size = source.seek(0, os.SEEK_END)
+        source.seek(0)
+        if size >= STREAM_MIN_BYTES:
+            try:
+                source.flush()
+                return cls(upload.filename, fd=os.dup(source.fileno()), **meta)
+            except (AttributeError, OSError):
+                pass  # geen echt bestand (bijv. BytesIO): dan in het geheugen
+        data = source.read()
+        source.seek(0)
+        return cls(upload.filename, data, **meta)
+
+    @property
+    def in_memory(self) -> bool:
+        return self._fd is None
+
+    @property
+    def memory_bytes(self) -> int:
+        """Bytes die deze upload in het geheugen vasthoudt."""
+        return self.size if self._data is not None else 0
+
+    @property
+    def data(self) -> bytes:
+        if self._data is None:
+            with self._lock:
+                if self._data is None:
+                    self._data = self.file.read()
+        return self._data
+
+    @property
+    def view(self) -> memoryview:
+        return memoryview(self.data)
+
+    @cached_property
+    def sha256(self) -> str:
+        """Inhoudshash; bij een gespoolde upload zonder alles in te lezen."""
+        if self._data is not None:
+            return content_hash(self._data)
+        return file_hash(self.file)
+
+    @property
+    def file(self):
+        if self._data is not None:
+            return BytesIO(self._data)
+        return io.BufferedReader(_SpoolReader(self._fd, self.size))